@@ -0,0 +1,104 @@
+# bench_sampling.py (比較 ORDER BY RANDOM() 與 QuestionIndex 抽題的耗時)
+#
+# 用法：
+#   python benchmarks/bench_sampling.py                      # 只跑記憶體內的抽題
+#   python benchmarks/bench_sampling.py --dsn postgres://... # 另外在暫存表上跑兩種 SQL
+#
+# 不加 --dsn 時會讀 EXTERNAL_DATABASE_URL；兩者都沒有就只跑記憶體部分。
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.question_index import QuestionIndex
+
+
+def timed(func, repeats):
+    samples = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - start) * 1000)
+    return statistics.median(samples)
+
+
+def bench_memory(size, amount, repeats):
+    index = QuestionIndex()
+    index.load(range(1, size + 1))
+    ids = list(range(1, size + 1))
+    # 模擬 ORDER BY RANDOM() LIMIT k：每一列都要產生亂數再取前 k 名
+    order_by_random = timed(lambda: sorted(ids, key=lambda _: random.random())[:amount], repeats)
+    index_draw = timed(lambda: index.draw(amount), repeats)
+    return order_by_random, index_draw
+
+
+def bench_postgres(dsn, size, amount, repeats):
+    import psycopg2
+
+    conn = psycopg2.connect(dsn)
+    cur = conn.cursor()
+    cur.execute("""
+        CREATE TEMP TABLE bench_questions (
+            id SERIAL PRIMARY KEY,
+            question TEXT NOT NULL,
+            option1 TEXT NOT NULL,
+            option2 TEXT NOT NULL,
+            option3 TEXT NOT NULL,
+            option4 TEXT NOT NULL,
+            answer INTEGER NOT NULL
+        );
+    """)
+    cur.execute("""
+        INSERT INTO bench_questions (question, option1, option2, option3, option4, answer)
+        SELECT 'question ' || g, 'a' || g, 'b' || g, 'c' || g, 'd' || g, 1 + g %% 4
+        FROM generate_series(1, %s) AS g;
+    """, (size,))
+    cur.execute("ANALYZE bench_questions;")
+
+    index = QuestionIndex()
+    cur.execute("SELECT id FROM bench_questions")
+    index.load(row[0] for row in cur.fetchall())
+
+    def order_by_random():
+        cur.execute("SELECT * FROM bench_questions ORDER BY RANDOM() LIMIT %s", (amount,))
+        cur.fetchall()
+
+    def index_draw():
+        cur.execute("SELECT * FROM bench_questions WHERE id = ANY(%s)", (index.draw(amount),))
+        cur.fetchall()
+
+    try:
+        return timed(order_by_random, repeats), timed(index_draw, repeats)
+    finally:
+        conn.rollback()
+        cur.close()
+        conn.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="比較 ORDER BY RANDOM() 與索引抽題")
+    parser.add_argument("--sizes", default="1000,10000,50000", help="題庫大小 (逗號分隔)")
+    parser.add_argument("--amount", type=int, default=5, help="每次抽幾題")
+    parser.add_argument("--repeats", type=int, default=30, help="每種情況重複次數")
+    parser.add_argument("--dsn", default=os.getenv("EXTERNAL_DATABASE_URL"), help="Postgres 連線字串")
+    args = parser.parse_args()
+
+    sizes = [int(s) for s in args.sizes.split(",") if s.strip()]
+
+    print(f"{'backend':<10}{'bank size':>10}{'ORDER BY RANDOM() ms':>24}{'index draw ms':>16}{'speedup':>10}")
+    for size in sizes:
+        rows = [("memory", *bench_memory(size, args.amount, args.repeats))]
+        if args.dsn:
+            rows.append(("postgres", *bench_postgres(args.dsn, size, args.amount, args.repeats)))
+        for backend, old, new in rows:
+            speedup = old / new if new else float("inf")
+            print(f"{backend:<10}{size:>10}{old:>24.3f}{new:>16.3f}{speedup:>9.1f}x")
+
+
+if __name__ == "__main__":
+    main()
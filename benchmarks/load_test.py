@@ -0,0 +1,436 @@
+# load_test.py (壓力測試：模擬 N 個考生同時 /exam、一路作答 M 題到領取證書，不用連上 Discord)
+#
+# 用法：
+#   python benchmarks/load_test.py --users 200 --questions 10                 # 預設用暫存的 SQLite 檔案
+#   python benchmarks/load_test.py --dsn postgres://... --output after.json   # Postgres，結果存成 JSON
+#   python benchmarks/load_test.py --embedded                                 # 用 pgserver 起一個暫時的 Postgres
+#   python benchmarks/load_test.py --compare before.json                      # 跟上一次的結果比較
+#
+# Postgres 一定要明確給 --dsn (或 --embedded)，不會自己去讀 EXTERNAL_DATABASE_URL，避免一跑就打到正式資料庫。
+# 考試資料都寫在一個假的伺服器 (BENCH_GUILD_ID) 底下，跑完會清掉 (SQLite 直接刪掉暫存檔)。
+# 指令直接呼叫 Exam cog 的 callback；作答 / 領證書走 DynamicItem 的 from_custom_id → callback，
+# 跟 Discord 送來元件互動時的路徑相同。
+
+import argparse
+import asyncio
+import json
+import os
+import random
+import resource
+import shutil
+import sys
+import tempfile
+import time
+import tracemalloc
+import types
+from datetime import datetime, timezone
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+BENCH_GUILD_ID = 900000000000000001
+BENCH_CHANNEL_ID = 900000000000000002
+BENCH_ROLE_ID = 900000000000000003
+BENCH_USER_BASE = 910000000000000000
+
+
+# ---------------------------------------------------------
+# 🎭 假的 Discord 物件 (只做 Exam cog 用得到的部分)
+# ---------------------------------------------------------
+class FakeRole:
+    def __init__(self, role_id):
+        self.id = role_id
+        self.name = "bench graduate"
+        self.mention = f"<@&{role_id}>"
+
+
+class FakeGuild:
+    def __init__(self, guild_id):
+        self.id = guild_id
+        self.shard_id = 0
+
+    def get_role(self, role_id):
+        return FakeRole(role_id)
+
+
+class FakeUser:
+    def __init__(self, user_id):
+        self.id = user_id
+        self.mention = f"<@{user_id}>"
+        self.display_name = f"bench{user_id}"
+
+
+class FakeResponse:
+    def __init__(self, interaction):
+        self.interaction = interaction
+        self._done = False
+
+    def is_done(self):
+        return self._done
+
+    async def defer(self, **kwargs):
+        self._done = True
+
+    async def send_message(self, content=None, **kwargs):
+        self._done = True
+        self.interaction.record(content, kwargs)
+
+    async def edit_message(self, content=None, **kwargs):
+        self._done = True
+        self.interaction.record(content, kwargs)
+
+
+class FakeFollowup:
+    def __init__(self, interaction):
+        self.interaction = interaction
+
+    async def send(self, content=None, **kwargs):
+        self.interaction.record(content, kwargs)
+        return types.SimpleNamespace(id=0)
+
+
+class FakeInteraction:
+    def __init__(self, client, user, command=None):
+        import discord
+        self.client = client
+        self.user = user
+        self.guild = FakeGuild(BENCH_GUILD_ID)
+        self.guild_id = BENCH_GUILD_ID
+        self.channel = types.SimpleNamespace(id=BENCH_CHANNEL_ID)
+        self.channel_id = BENCH_CHANNEL_ID
+        self.command = command
+        self.created_at = discord.utils.utcnow()
+        self.extras = {"received_at": time.perf_counter()}
+        self.response = FakeResponse(self)
+        self.followup = FakeFollowup(self)
+        self.content = None
+        self.view = None
+
+    def record(self, content, kwargs):
+        self.content = content
+        if kwargs.get("view") is not None:
+            self.view = kwargs["view"]
+
+
+# ---------------------------------------------------------
+# 📏 量測
+# ---------------------------------------------------------
+def percentile(samples, q):
+    if not samples:
+        return None
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(q * len(ordered)))]
+
+
+def summarize(samples):
+    if not samples:
+        return {"count": 0}
+    return {
+        "count": len(samples),
+        "mean": round(sum(samples) / len(samples), 3),
+        "p50": round(percentile(samples, 0.50), 3),
+        "p95": round(percentile(samples, 0.95), 3),
+        "p99": round(percentile(samples, 0.99), 3),
+        "max": round(max(samples), 3),
+    }
+
+
+class LagSampler:
+    # 每 interval 秒 sleep 一次，醒來晚了多少就是 event loop 被卡住的時間；順便記錄進行中考試的記憶體高峰
+    def __init__(self, cog, interval):
+        self.cog = cog
+        self.interval = interval
+        self.samples = []
+        self.sessions_peak_bytes = 0
+
+    async def run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.samples.append((loop.time() - start - self.interval) * 1000)
+            self.sessions_peak_bytes = max(self.sessions_peak_bytes, self.cog.sessions.memory_bytes())
+
+
+def db_query_counts(registry):
+    # op -> 查詢次數 (utils.database 對每次查詢都記錄了 db_query_seconds)
+    counts = {}
+    for labels, (_, _, count) in registry.histograms["db_query_seconds"].series.items():
+        op = dict(labels).get("op", "-")
+        counts[op] = counts.get(op, 0) + count
+    return counts
+
+
+# ---------------------------------------------------------
+# 🧑‍🎓 一個考生
+# ---------------------------------------------------------
+async def click(latencies, name, coroutine):
+    start = time.perf_counter()
+    await coroutine
+    latencies[name].append((time.perf_counter() - start) * 1000)
+
+
+async def run_examinee(bot, cog, user_id, latencies, outcomes, fail_rate, think_time):
+    from cogs.exam import ExamAnswerSelect, ExamFinishButton
+
+    user = FakeUser(user_id)
+    interaction = FakeInteraction(bot, user, cog.exam_start)
+    await click(latencies, "exam", cog.exam_start.callback(cog, interaction))
+    view = interaction.view
+    if view is None:
+        outcomes["not_started"] += 1
+        return
+
+    bank = await cog.question_banks.get(BENCH_GUILD_ID)
+    while True:
+        if think_time:
+            await asyncio.sleep(random.uniform(0, think_time))
+        # view 裡放的是 DynamicItem，Discord 送回來的是底下的元件
+        item = view.children[0].item
+        custom_id = item.custom_id
+        interaction = FakeInteraction(bot, user)
+
+        if custom_id.startswith("exam:finish:"):
+            match = ExamFinishButton.__discord_ui_compiled_template__.fullmatch(custom_id)
+            dynamic = await ExamFinishButton.from_custom_id(interaction, item, match)
+            if await dynamic.interaction_check(interaction):
+                await click(latencies, "finish", dynamic.callback(interaction))
+            outcomes["passed"] += 1
+            return
+
+        match = ExamAnswerSelect.__discord_ui_compiled_template__.fullmatch(custom_id)
+        dynamic = await ExamAnswerSelect.from_custom_id(interaction, item, match)
+        session = await cog.sessions.get(dynamic.session_id)
+        question = bank.get(session.current_question_id)
+        answer = question.answer
+        if random.random() < fail_rate:
+            answer = answer % 4 + 1
+        # Discord 送來的 values 是選項的 value (原本的選項編號)
+        dynamic.item._refresh_state(interaction, {"component_type": 3, "custom_id": custom_id, "values": [str(answer)]})
+        if not await dynamic.interaction_check(interaction):
+            outcomes["errors"] += 1
+            return
+        await click(latencies, "answer", dynamic.callback(interaction))
+
+        if interaction.view is None:
+            outcomes["failed" if interaction.content and interaction.content.startswith("❌") else "errors"] += 1
+            return
+        view = interaction.view
+
+
+# ---------------------------------------------------------
+# 🏗️ 準備 / 清除測試資料
+# ---------------------------------------------------------
+async def seed(storage, bank_size, questions):
+    # 走 storage 介面，兩種後端都能用
+    from utils.question_bank import content_hash
+
+    for g in range(1, bank_size + 1):
+        options = (f"a{g}", f"b{g}", f"c{g}", f"d{g}")
+        text = f"bench question {g}"
+        await storage.add_question(BENCH_GUILD_ID, text, options, 1 + g % 4, content_hash(text, options))
+    for column, value in (
+        ("question_amount", questions),
+        ("failure_cooldown_minutes", 0),
+        ("exam_room_id", BENCH_CHANNEL_ID),
+        ("graduater_role_id", BENCH_ROLE_ID),
+    ):
+        await storage.update_setting(BENCH_GUILD_ID, column, value)
+
+
+def cleanup_postgres(dsn):
+    # cog 卸載後連線池已經關了，另外開一條連線
+    import psycopg2
+    conn = psycopg2.connect(dsn)
+    with conn, conn.cursor() as cur:
+        cleanup(cur)
+    conn.close()
+
+
+def cleanup(cur):
+    for table in ("questions", "exam_settings", "user_cooldowns", "exam_sessions", "role_grants", "question_stats", "exam_daily_stats", "exam_totals"):
+        cur.execute(f"DELETE FROM {table} WHERE guild_id = %s;", (BENCH_GUILD_ID,))
+
+
+def start_embedded_postgres():
+    try:
+        import pgserver
+    except ImportError:
+        sys.exit("❌ --embedded 需要先 pip install pgserver")
+    server = pgserver.get_server(tempfile.mkdtemp(prefix="exam_bench_"), cleanup_mode="delete")
+    return server, server.get_uri()
+
+
+async def run(args):
+    # cogs.exam 匯入時就會讀連線字串 / STORAGE_BACKEND，所以要先設好 (建表由 cog_load 的遷移負責)
+    from discord.ext import commands
+    import discord
+    from cogs.exam import Exam
+    from utils.metrics import registry
+
+    registry.enabled = True
+    bot = commands.Bot(command_prefix="!", intents=discord.Intents.none())
+    async with bot:
+        cog = Exam(bot)
+        await bot.add_cog(cog)
+        try:
+            if args.backend == "postgres":
+                await cog.storage.db.run(cleanup)
+            await seed(cog.storage, args.bank_size, args.questions)
+            # 題庫先載入，量的是穩定狀態而不是第一次載入
+            await cog.question_banks.get(BENCH_GUILD_ID)
+            await cog.get_settings(BENCH_GUILD_ID)
+
+            if args.tracemalloc:
+                tracemalloc.start()
+            sampler = LagSampler(cog, args.lag_interval)
+            sampler_task = asyncio.create_task(sampler.run())
+            queries_before = db_query_counts(registry)
+
+            latencies = {"exam": [], "answer": [], "finish": []}
+            outcomes = {"passed": 0, "failed": 0, "not_started": 0, "errors": 0}
+            start = time.perf_counter()
+            await asyncio.gather(*(
+                run_examinee(bot, cog, BENCH_USER_BASE + i, latencies, outcomes, args.fail_rate, args.think_time)
+                for i in range(args.users)
+            ))
+            wall = time.perf_counter() - start
+
+            sampler_task.cancel()
+            await asyncio.gather(sampler_task, return_exceptions=True)
+            tracemalloc_peak = tracemalloc.get_traced_memory()[1] if args.tracemalloc else None
+            if args.tracemalloc:
+                tracemalloc.stop()
+            queries_after = db_query_counts(registry)
+            pool_wait = registry.histograms["db_pool_wait_seconds"]
+        finally:
+            await bot.remove_cog(cog.qualified_name)
+            if args.backend == "postgres":
+                cleanup_postgres(os.environ["EXTERNAL_DATABASE_URL"])
+
+    exams = args.users - outcomes["not_started"]
+    by_op = {op: count - queries_before.get(op, 0) for op, count in queries_after.items() if count - queries_before.get(op, 0)}
+    total_queries = sum(by_op.values())
+    pool_wait_count = sum(count for _, _, count in pool_wait.series.values())
+    pool_wait_total = sum(total for _, total, _ in pool_wait.series.values())
+    return {
+        "label": args.label,
+        "timestamp": datetime.now(timezone.utc).isoformat(timespec="seconds"),
+        "config": {
+            "backend": args.backend,
+            "users": args.users,
+            "questions": args.questions,
+            "bank_size": args.bank_size,
+            "fail_rate": args.fail_rate,
+            "think_time": args.think_time,
+            "tracemalloc": args.tracemalloc,
+        },
+        "outcomes": outcomes,
+        "wall_s": round(wall, 3),
+        "exams_per_s": round(exams / wall, 2) if wall else None,
+        "latency_ms": {name: summarize(samples) for name, samples in latencies.items()},
+        "loop_lag_ms": summarize(sampler.samples),
+        "db": {
+            "queries": total_queries,
+            "queries_per_exam": round(total_queries / exams, 2) if exams else None,
+            "by_op": dict(sorted(by_op.items(), key=lambda item: item[1], reverse=True)),
+            "pool_wait_ms_mean": round(pool_wait_total / pool_wait_count * 1000, 3) if pool_wait_count else None,
+        },
+        "memory": {
+            # Linux 的 ru_maxrss 單位是 KB
+            "peak_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1),
+            "tracemalloc_peak_mb": round(tracemalloc_peak / 1024 / 1024, 2) if tracemalloc_peak is not None else None,
+            "sessions_peak_bytes": sampler.sessions_peak_bytes,
+        },
+    }
+
+
+# ---------------------------------------------------------
+# 🖨️ 輸出 / 比較
+# ---------------------------------------------------------
+def print_report(result, baseline=None):
+    def delta(new, old):
+        if old in (None, 0) or new is None:
+            return ""
+        return f" ({(new - old) / old:+.0%})"
+
+    print(f"👥 {result['config']['users']} 人 × {result['config']['questions']} 題，{result['wall_s']} 秒，{result['exams_per_s']} 場/秒 · {result['outcomes']}")
+    print(f"{'':<12}{'count':>8}{'p50 ms':>16}{'p95 ms':>16}{'p99 ms':>16}")
+    rows = list(result["latency_ms"].items()) + [("loop lag", result["loop_lag_ms"])]
+    for name, stats in rows:
+        if not stats["count"]:
+            continue
+        old = None
+        if baseline:
+            old = baseline["loop_lag_ms"] if name == "loop lag" else baseline["latency_ms"].get(name)
+        cells = []
+        for key in ("p50", "p95", "p99"):
+            cells.append(f"{stats[key]:.1f}{delta(stats[key], old.get(key) if old else None)}")
+        print(f"{name:<12}{stats['count']:>8}" + "".join(f"{cell:>16}" for cell in cells))
+
+    db = result["db"]
+    old_db = baseline["db"] if baseline else {}
+    print(f"🗄️ 每場考試 {db['queries_per_exam']} 次查詢{delta(db['queries_per_exam'], old_db.get('queries_per_exam'))} · 連線池平均排隊 {db['pool_wait_ms_mean']} ms")
+    print("   " + ", ".join(f"{op}={count}" for op, count in db["by_op"].items()))
+    memory = result["memory"]
+    old_memory = baseline["memory"] if baseline else {}
+    print(f"🧠 RSS 高峰 {memory['peak_rss_mb']} MB{delta(memory['peak_rss_mb'], old_memory.get('peak_rss_mb'))}"
+          f" · tracemalloc 高峰 {memory['tracemalloc_peak_mb']} MB · 進行中考試最多 {memory['sessions_peak_bytes'] / 1024:.1f} KB")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="模擬多人同時考試，量測指令延遲、event loop 延遲、查詢次數與記憶體")
+    parser.add_argument("--users", type=int, default=100, help="同時考試的人數")
+    parser.add_argument("--questions", type=int, default=10, help="每場考幾題")
+    parser.add_argument("--bank-size", type=int, default=500, help="題庫大小")
+    parser.add_argument("--fail-rate", type=float, default=0.0, help="每一題答錯的機率")
+    parser.add_argument("--think-time", type=float, default=0.0, help="每次作答前最多隨機等幾秒")
+    parser.add_argument("--lag-interval", type=float, default=0.01, help="量 event loop 延遲的間隔 (秒)")
+    parser.add_argument("--tracemalloc", action="store_true", help="用 tracemalloc 量 Python 物件的記憶體高峰 (會拖慢執行)")
+    parser.add_argument("--backend", choices=("postgres", "sqlite"), help="儲存後端 (預設 sqlite；給了 --dsn / --embedded 就是 postgres)")
+    parser.add_argument("--dsn", help="Postgres 連線字串 (要明確指定，不讀 EXTERNAL_DATABASE_URL)")
+    parser.add_argument("--embedded", action="store_true", help="用 pgserver 起一個暫時的 Postgres，不碰正式資料庫")
+    parser.add_argument("--label", default="", help="寫進結果的標籤 (例如 git commit)")
+    parser.add_argument("--output", help="結果 JSON 存檔位置")
+    parser.add_argument("--compare", help="上一次的結果 JSON，印出差異")
+    parser.add_argument("--seed", type=int, help="亂數種子")
+    args = parser.parse_args()
+
+    if args.seed is not None:
+        random.seed(args.seed)
+
+    server = None
+    sqlite_dir = None
+    if args.backend is None:
+        args.backend = "postgres" if args.dsn or args.embedded else "sqlite"
+    os.environ["STORAGE_BACKEND"] = args.backend
+    if args.backend == "sqlite":
+        sqlite_dir = tempfile.mkdtemp(prefix="exam_bench_")
+        os.environ["SQLITE_PATH"] = os.path.join(sqlite_dir, "bench.sqlite3")
+    else:
+        if args.embedded:
+            server, args.dsn = start_embedded_postgres()
+        if not args.dsn:
+            sys.exit("❌ Postgres 請用 --dsn 或 --embedded 指定資料庫")
+        os.environ["EXTERNAL_DATABASE_URL"] = args.dsn
+
+    try:
+        result = asyncio.run(run(args))
+    finally:
+        if server is not None:
+            server.cleanup()
+        if sqlite_dir is not None:
+            shutil.rmtree(sqlite_dir, ignore_errors=True)
+
+    baseline = None
+    if args.compare:
+        with open(args.compare, encoding="utf-8") as f:
+            baseline = json.load(f)
+    print_report(result, baseline)
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(result, f, ensure_ascii=False, indent=2)
+        print(f"💾 結果已存到 {args.output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,26 +1,90 @@
 import os
 import asyncio
+import hashlib
+import json
 import discord
 from discord.ext import commands
 from dotenv import load_dotenv
+
+# 專案裡的模組匯入時就會讀環境變數 (METRICS_ENABLED…)，要先載入 .env 再匯入
+load_dotenv()  # 確保讀取的是 bot.py 同目錄
+
 from keep_alive import keep_alive
+from utils.metrics import InstrumentedTree
 
 # 取得 bot.py 的所在目錄 
 BASE_DIR = os.path.dirname(os.path.abspath(__file__)) 
 COGS_DIR = os.path.join(BASE_DIR, "cogs")
 
-load_dotenv()  # 確保讀取的是 bot.py 同目錄
 TOKEN = os.getenv("DISCORD_BOT_TOKEN")
+# 上次同步的指令內容雜湊，指令沒變就不用再呼叫同步 API
+TREE_HASH_FILE = os.getenv("TREE_HASH_FILE", os.path.join(BASE_DIR, ".command_tree_hash"))
+
+# 分片設定：SHARD_COUNT 不設定 = 單一連線；auto = 交給 Discord 決定分片數；數字 = 固定分片數
+# SHARD_IDS (例如 0,1) 只跑其中幾個分片，其他分片交給同一台機器上的其他程序
+SHARD_COUNT = os.getenv("SHARD_COUNT", "").strip()
+SHARD_IDS = os.getenv("SHARD_IDS", "").strip()
+
+# 非全域限速要等超過這麼久時，discord.py 不自己睡而是丟 discord.RateLimited，
+# 讓失敗通知 / 身分組發放用自己的退避排程 (discord.py 規定最少 30 秒)
+MAX_RATELIMIT_TIMEOUT = float(os.getenv("MAX_RATELIMIT_TIMEOUT", "30"))
 
 intents = discord.Intents.all()
-bot = commands.Bot(command_prefix = "!", intents = intents)
+if SHARD_COUNT:
+    shard_ids = [int(i) for i in SHARD_IDS.split(",")] if SHARD_IDS else None
+    if SHARD_COUNT == "auto":
+        if shard_ids:
+            raise ValueError("SHARD_IDS 需要搭配固定的 SHARD_COUNT")
+        bot = commands.AutoShardedBot(command_prefix = "!", intents = intents, tree_cls = InstrumentedTree, max_ratelimit_timeout = MAX_RATELIMIT_TIMEOUT)
+    else:
+        bot = commands.AutoShardedBot(command_prefix = "!", intents = intents, shard_count = int(SHARD_COUNT), shard_ids = shard_ids, tree_cls = InstrumentedTree, max_ratelimit_timeout = MAX_RATELIMIT_TIMEOUT)
+else:
+    bot = commands.Bot(command_prefix = "!", intents = intents, tree_cls = InstrumentedTree, max_ratelimit_timeout = MAX_RATELIMIT_TIMEOUT)
+
+# ---------------------------------------------------------
+# 🔄 Slash 指令同步：只在指令內容有變的時候才呼叫 API
+# ---------------------------------------------------------
+def command_tree_hash():
+    payload = [command.to_dict(bot.tree) for command in bot.tree.get_commands()]
+    payload.sort(key=lambda command: (command.get("type", 1), command["name"]))
+    data = json.dumps({"application_id": bot.application_id, "commands": payload}, sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(data.encode()).hexdigest()
+
+def read_tree_hash():
+    try:
+        with open(TREE_HASH_FILE, encoding="utf-8") as f:
+            return f.read().strip()
+    except OSError:
+        return None
 
-# 當機器人完成啟動時
+async def sync_command_tree(force = False):
+    tree_hash = command_tree_hash()
+    if not force and tree_hash == read_tree_hash():
+        print("✅ Slash 指令沒有變更，略過同步。")
+        return
+    synced = await bot.tree.sync()
+    try:
+        with open(TREE_HASH_FILE, "w", encoding="utf-8") as f:
+            f.write(tree_hash)
+    except OSError as e:
+        print(f"⚠️ 無法記錄指令雜湊，下次啟動會再同步一次: {e}")
+    print(f"✅ 成功同步 {len(synced)} 個 Slash 指令。")
+
+# 登入後、連上 Gateway 前只跑一次 (斷線重連時的 on_ready 不會再跑)
+@bot.event
+async def setup_hook():
+    # 多個程序分攤分片時，只讓負責 0 號分片的程序同步指令
+    shard_ids = getattr(bot, "shard_ids", None)
+    if not shard_ids or 0 in shard_ids:
+        await sync_command_tree()
+
+# 當機器人完成啟動時 (重連後也會再觸發)
 @bot.event
 async def on_ready():
-    synced = await bot.tree.sync() 
-    print(f"✅ 成功同步 {len(synced)} 個 Slash 指令。")
+    shard_ids = getattr(bot, "shard_ids", None)
     print(f"目前登入身份 --> {bot.user}")
+    if shard_ids:
+        print(f"🧩 本程序負責分片 {sorted(shard_ids)} / 共 {bot.shard_count} 個，{len(bot.guilds)} 個伺服器")
 
 # 載入指令程式檔案
 @bot.command()
@@ -40,6 +104,13 @@ async def reload(ctx, extension):
     await bot.reload_extension(f"cogs.{extension}")
     await ctx.send(f"ReLoaded {extension} done.")
 
+# !reload 改了指令之後手動同步 (自動檢查只在啟動時跑一次)
+@bot.command()
+@commands.is_owner()
+async def sync(ctx):
+    await sync_command_tree(force = True)
+    await ctx.send("Synced slash commands.")
+
 # 一開始bot開機需載入全部程式檔案
 async def load_extensions(): 
     for filename in os.listdir(COGS_DIR): 
@@ -49,8 +120,11 @@ async def load_extensions():
 async def main():
     async with bot:
         await load_extensions()
-        keep_alive()
-        await bot.start(TOKEN)
+        web_runner = await keep_alive(bot)
+        try:
+            await bot.start(TOKEN)
+        finally:
+            await web_runner.cleanup()
 
 # 確定執行此py檔才會執行
 if __name__ == "__main__":
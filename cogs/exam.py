@@ -1,124 +1,234 @@
 # exam.py (UI 優化版 / 冷卻時間顯示為「具體時間點」)
 
+import asyncio
 import discord
 from discord import app_commands
 from discord.ext import commands
-import psycopg2
 import os
-import random
+import tempfile
 import time
-from datetime import datetime, timedelta
+from collections import OrderedDict
+from datetime import date, datetime, timedelta
 from dotenv import load_dotenv
 
-load_dotenv()
-
-DATABASE_URL = os.getenv("EXTERNAL_DATABASE_URL")
-
-# -----------------------------------------------
-# ✨ [功能更新] 修改 init_db
-# -----------------------------------------------
-def init_db():
-    conn = psycopg2.connect(DATABASE_URL)
-    cur = conn.cursor()
-    
-    # 1. 建立基礎 Tables (若不存在)
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS questions (
-            id SERIAL PRIMARY KEY,
-            question TEXT NOT NULL,
-            option1 TEXT NOT NULL,
-            option2 TEXT NOT NULL,
-            option3 TEXT NOT NULL,
-            option4 TEXT NOT NULL,
-            answer INTEGER NOT NULL
-        );
-    """)
-    
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS exam_settings (
-            id INT PRIMARY KEY,
-            question_amount INT NOT NULL DEFAULT 5,
-            failure_cooldown_minutes INT NOT NULL DEFAULT 0,
-            exam_room_id BIGINT,
-            add_exam_room_id BIGINT,
-            manage_exam_role_id BIGINT,
-            graduater_role_id BIGINT
-        );
-    """)
-    
-    cur.execute("""
-        CREATE TABLE IF NOT EXISTS user_cooldowns (
-            user_id BIGINT PRIMARY KEY,
-            cooldown_until TIMESTAMP
-        );
-    """)
-
-    # 2. 確保設定表有預設值
-    cur.execute("""
-        INSERT INTO exam_settings (id, question_amount, failure_cooldown_minutes)
-        VALUES (1, 5, 0)
-        ON CONFLICT (id) DO NOTHING;
-    """)
-
-    # 3. 資料庫遷移
-    new_columns = [
-        ("exam_room_id", "BIGINT"),
-        ("add_exam_room_id", "BIGINT"),
-        ("manage_exam_role_id", "BIGINT"),
-        ("graduater_role_id", "BIGINT"),
-        ("failure_cooldown_minutes", "INT NOT NULL DEFAULT 0")
-    ]
-    
-    for col_name, col_type in new_columns:
-        try:
-            cur.execute(f"ALTER TABLE exam_settings ADD COLUMN IF NOT EXISTS {col_name} {col_type};")
-        except Exception:
-            conn.rollback()
-        else:
-            conn.commit()
+from utils import metrics, question_import
+from utils.admission import AdmissionController, AdmissionRejected
+from utils.analytics import ExamAnalytics
+from utils.cooldowns import CooldownStore
+from utils.sessions import ExamSession, ExamSessionRegistry
+from utils.notifier import FailureNotifier
+from utils.role_grants import RoleGrantWorker
+from utils.question_bank import GuildQuestionBanks, content_hash
+from utils.question_render import RenderCache
+from utils.settings_cache import SettingsCache
+from utils.storage import Storage, create_storage
 
-    conn.commit()
-    cur.close()
-    conn.close()
+load_dotenv()
 
-init_db()
+LIST_PAGE_SIZE = 15
 
 
 class Exam(commands.Cog):
     def __init__(self, bot):
         self.bot = bot
+        # STORAGE_BACKEND 決定用 Postgres 還是 SQLite
+        self.storage = create_storage()
+        self.settings = SettingsCache(self.storage.load_settings)
+        self.cooldowns = CooldownStore(self.storage)
+        self.sessions = ExamSessionRegistry(self.storage)
+        self.render_cache = RenderCache()
+        self.notifier = FailureNotifier(bot)
+        self.role_grants = RoleGrantWorker(bot, self.storage)
+        self.analytics = ExamAnalytics(self.storage)
+        self.admission = AdmissionController()
+        self.question_banks = GuildQuestionBanks(self.load_question_bank)
+        # SQLite 沒有 LISTEN/NOTIFY，題目只會由管理指令修改
+        self.question_listener = self.storage.change_listener(self.on_question_change, self.reload_question_banks)
+        self._pending_question_ids = set()
+        self._question_refresh_task = None
+        self.has_legacy_data = False
+
+    # 載入 Cog 時建立連線池，卸載 (含 !reload) 時關閉；題庫在各伺服器第一次用到時才載入
+    async def cog_load(self):
+        # 開連線時順便把資料表升級到最新版本 (已經是最新的話只查一次版本號)
+        applied = await self.storage.open()
+        for version, description in applied:
+            print(f"🗃️ 已套用資料庫遷移 #{version}: {description}")
+        self.has_legacy_data = await self.storage.has_legacy_data()
+        if self.question_listener:
+            await self.question_listener.start()
+        await self.cooldowns.start(getattr(self.bot, "shard_ids", None), self.bot.shard_count)
+        await self.sessions.start()
+        await self.notifier.start()
+        await self.role_grants.start(getattr(self.bot, "shard_ids", None), self.bot.shard_count)
+        await self.analytics.start()
+        # 考試元件的 custom_id 帶著進度，重啟後按下去也認得
+        self.bot.add_dynamic_items(ExamAnswerSelect, ExamFinishButton)
+        metrics.registry.register_collector("exam", self.collect_metrics)
+        if self.bot.is_ready():
+            await self.claim_legacy_data_if_possible()
+
+    async def cog_unload(self):
+        metrics.registry.unregister_collector("exam")
+        if self.question_listener:
+            await self.question_listener.stop()
+        await self.cooldowns.stop()
+        self.bot.remove_dynamic_items(ExamAnswerSelect, ExamFinishButton)
+        await self.sessions.stop()
+        await self.notifier.stop()
+        await self.role_grants.stop()
+        await self.analytics.stop()
+        await self.storage.close()
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        # 所有設定、題庫、冷卻都以伺服器區分，私訊裡沒辦法使用
+        if interaction.guild_id is None:
+            await interaction.response.send_message("❌ 這個指令只能在伺服器中使用！", ephemeral=True)
+            return False
+        return True
+
+    def collect_metrics(self):
+        # /metrics 與 /bot_stats 用：快取命中率、進行中的考試、各種背景隊伍的長度
+        # 每次抓都在 event loop 上跑，只放計數；要掃過全部資料的記憶體估算留給 /exam_status
+        def gauge(name, help, value):
+            return (name, "gauge", help, [({}, value)])
+
+        def counter(name, help, value):
+            return (name, "counter", help, [({}, value)])
+
+        def ratio(hits, misses):
+            return hits / (hits + misses) if hits + misses else 0.0
+
+        render = self.render_cache.stats()
+        banks = self.question_banks.stats()
+        sessions = self.sessions.stats()
+        admission = self.admission.stats()
+        db = self.storage.stats()
+        return [
+            counter("exam_settings_cache_hits_total", "設定快取命中次數", self.settings.hits),
+            counter("exam_settings_cache_misses_total", "設定快取沒命中次數", self.settings.misses),
+            gauge("exam_settings_cache_hit_ratio", "設定快取命中率", ratio(self.settings.hits, self.settings.misses)),
+            counter("exam_render_cache_hits_total", "題目畫面快取命中次數", render["hits"]),
+            counter("exam_render_cache_misses_total", "題目畫面快取沒命中次數", render["misses"]),
+            gauge("exam_render_cache_hit_ratio", "題目畫面快取命中率", render["hit_rate"]),
+            gauge("exam_render_cache_entries", "題目畫面快取筆數", render["entries"]),
+            gauge("exam_question_banks_loaded", "已載入題庫的伺服器數", banks["guilds"]),
+            gauge("exam_questions_loaded", "記憶體題庫的總題數", banks["questions"]),
+            gauge("exam_sessions_active", "進行中的考試", sessions["active"]),
+            counter("exam_sessions_started_total", "開始的考試", sessions["started"]),
+            counter("exam_sessions_evicted_total", "逾時清掉的考試", sessions["evicted"]),
+            gauge("exam_cooldowns_active", "記憶體中的冷卻人數", len(self.cooldowns)),
+            gauge("exam_notifications_pending", "排隊中的失敗通知", self.notifier.stats()["pending"]),
+            gauge("exam_role_grants_pending", "等待發放的身分組", self.role_grants.pending()),
+            gauge("exam_analytics_pending_rows", "還沒寫回的統計列數", self.analytics.stats()["pending_rows"]),
+            gauge("exam_admission_active", "正在開考的數量", admission["active"]),
+            gauge("exam_admission_queue_depth", "開考排隊人數", admission["queue_depth"]),
+            counter("exam_admission_rejected_total", "隊伍滿被拒絕的次數", admission["rejected"]),
+            gauge("db_pool_in_flight", "已送出還沒完成的查詢 (含排隊)", db["in_flight"]),
+            gauge("db_pool_max_size", "連線池大小", db["max_size"]),
+        ]
 
     # ---------------------------------------------------------
-    # 🛠️ 輔助方法：讀取設定
+    # 🏠 多伺服器：舊資料認領、離開伺服器時清掉快取
     # ---------------------------------------------------------
-    def get_settings(self):
-        conn = psycopg2.connect(DATABASE_URL)
-        cur = conn.cursor()
-        cur.execute("""
-            SELECT question_amount, failure_cooldown_minutes, 
-                   exam_room_id, add_exam_room_id, 
-                   manage_exam_role_id, graduater_role_id 
-            FROM exam_settings WHERE id = 1;
-        """)
-        row = cur.fetchone()
-        cur.close()
-        conn.close()
-        
-        if row:
-            return {
-                "question_amount": row[0],
-                "failure_cooldown_minutes": row[1],
-                "exam_room_id": row[2],
-                "add_exam_room_id": row[3],
-                "manage_exam_role_id": row[4],
-                "graduater_role_id": row[5]
-            }
-        return None
+    @commands.Cog.listener()
+    async def on_ready(self):
+        await self.claim_legacy_data_if_possible()
+
+    @commands.Cog.listener()
+    async def on_guild_remove(self, guild: discord.Guild):
+        self.settings.discard(guild.id)
+        self.question_banks.discard(guild.id)
+
+    async def claim_legacy_data_if_possible(self):
+        if not self.has_legacy_data:
+            return
+        # 分片拆在多個程序時，這個程序只看得到部分伺服器，不能判斷是不是只有一個
+        shard_ids = getattr(self.bot, "shard_ids", None)
+        if len(self.bot.guilds) != 1 or (shard_ids is not None and len(shard_ids) < self.bot.shard_count):
+            print("⚠️ 資料庫有升級前的舊資料，但機器人在多個伺服器中，請設定 LEGACY_GUILD_ID 指定要歸給哪個伺服器。")
+            return
+        guild_id = self.bot.guilds[0].id
+        await self.storage.claim_legacy_data(guild_id)
+        self.has_legacy_data = False
+        self.settings.invalidate(guild_id)
+        self.question_banks.discard(guild_id)
+        self.cooldowns.move_guild(0, guild_id)
+        print(f"🏠 已將舊資料歸給伺服器 {self.bot.guilds[0].name} ({guild_id})")
+
+    # ---------------------------------------------------------
+    # 🛠️ 輔助方法：讀取設定 (走記憶體快取，過期才回資料庫)
+    # ---------------------------------------------------------
+    async def get_settings(self, guild_id: int):
+        return await self.settings.get(guild_id)
+
+    # ---------------------------------------------------------
+    # 📚 記憶體題庫：每個伺服器第一次用到時整批載入，之後靠管理指令 / NOTIFY 增量更新
+    # ---------------------------------------------------------
+    async def load_question_bank(self, guild_id: int):
+        questions, elapsed = await self.storage.fetch_all_questions(guild_id)
+        print(f"📚 伺服器 {guild_id} 的題庫已載入 {len(questions)} 題，耗時 {elapsed:.2f} 秒")
+        return questions, elapsed
+
+    async def reload_question_banks(self):
+        # LISTEN 重連後：已載入的題庫全部重讀一次 (斷線期間的通知收不到)
+        for guild_id, bank in list(self.question_banks.loaded()):
+            questions, elapsed = await self.storage.fetch_all_questions(guild_id)
+            bank.load(questions, elapsed)
+
+    def on_question_change(self, payload, pid: int):
+        # 自己連線池發出的修改，管理指令已經直接更新過了
+        if self.storage.owns_change(pid):
+            return
+        op = payload.get("op")
+        question_id = payload.get("id")
+        bank = self.question_banks.peek(payload.get("guild_id"))
+        if op == "TRUNCATE":
+            self.question_banks.clear()
+        elif op == "DELETE":
+            if bank is not None:
+                bank.remove(question_id)
+        elif op == "UPDATE" or (op == "INSERT" and bank is not None and question_id not in bank):
+            self._pending_question_ids.add(question_id)
+            if self._question_refresh_task is None or self._question_refresh_task.done():
+                self._question_refresh_task = asyncio.create_task(self.refresh_pending_questions())
+
+    async def refresh_pending_questions(self):
+        # 稍等一下，把短時間內的多筆通知合併成一次主鍵查詢
+        await asyncio.sleep(0.5)
+        while self._pending_question_ids:
+            ids, self._pending_question_ids = self._pending_question_ids, set()
+            try:
+                rows = await self.storage.fetch_questions(ids)
+            except Exception as e:
+                print(f"題庫增量更新失敗: {e}")
+                return
+            owners = {row[1]: row[0] for row in rows}
+            # 題目被刪掉或搬到別的伺服器：從原本的題庫移除
+            for guild_id, bank in self.question_banks.loaded():
+                for question_id in ids:
+                    if owners.get(question_id) != guild_id:
+                        bank.remove(question_id)
+            for row in rows:
+                bank = self.question_banks.peek(row[0])
+                if bank is not None:
+                    bank.upsert(row[1:])
+
+    async def update_setting(self, guild_id: int, column: str, value):
+        # 寫入後回傳的整份設定直接更新快取
+        settings = await self.storage.update_setting(guild_id, column, value)
+        if settings:
+            self.settings.set(guild_id, settings)
+        else:
+            self.settings.invalidate(guild_id)
 
     async def cog_app_command_error(self, interaction: discord.Interaction, error: app_commands.AppCommandError):
         send_method = interaction.followup.send if interaction.response.is_done() else interaction.response.send_message
         try:
-            if isinstance(error, app_commands.MissingPermissions):
+            if isinstance(error, app_commands.CheckFailure) and not isinstance(error, app_commands.MissingPermissions):
+                # interaction_check 已經回覆過了
+                pass
+            elif isinstance(error, app_commands.MissingPermissions):
                 await send_method(f"❌ 你需要管理員權限才能使用此指令！", ephemeral=True)
             elif "RangeError" in str(type(error)):
                  await send_method(f"❌ 數值超出允許範圍！", ephemeral=True)
@@ -134,75 +244,45 @@ class Exam(commands.Cog):
     @app_commands.command(name="set_exam_room", description="設定考試專用頻道")
     @app_commands.default_permissions(administrator=True)
     async def set_exam_room(self, interaction: discord.Interaction, channel: discord.TextChannel):
-        await interaction.response.defer(ephemeral=True)
-        conn = psycopg2.connect(DATABASE_URL)
-        cur = conn.cursor()
-        cur.execute("UPDATE exam_settings SET exam_room_id = %s WHERE id = 1;", (channel.id,))
-        conn.commit()
-        cur.close()
-        conn.close()
+        await metrics.defer(interaction, ephemeral=True)
+        await self.update_setting(interaction.guild_id, "exam_room_id", channel.id)
         await interaction.followup.send(f"✅ 已將 **考試頻道** 設定為：{channel.mention}")
 
     @app_commands.command(name="set_manage_room", description="設定新增/管理題目的頻道")
     @app_commands.default_permissions(administrator=True)
     async def set_manage_room(self, interaction: discord.Interaction, channel: discord.TextChannel):
-        await interaction.response.defer(ephemeral=True)
-        conn = psycopg2.connect(DATABASE_URL)
-        cur = conn.cursor()
-        cur.execute("UPDATE exam_settings SET add_exam_room_id = %s WHERE id = 1;", (channel.id,))
-        conn.commit()
-        cur.close()
-        conn.close()
+        await metrics.defer(interaction, ephemeral=True)
+        await self.update_setting(interaction.guild_id, "add_exam_room_id", channel.id)
         await interaction.followup.send(f"✅ 已將 **管理題目頻道** 設定為：{channel.mention}")
 
     @app_commands.command(name="set_manage_role", description="設定考官(管理題目)的身分組")
     @app_commands.default_permissions(administrator=True)
     async def set_manage_role(self, interaction: discord.Interaction, role: discord.Role):
-        await interaction.response.defer(ephemeral=True)
-        conn = psycopg2.connect(DATABASE_URL)
-        cur = conn.cursor()
-        cur.execute("UPDATE exam_settings SET manage_exam_role_id = %s WHERE id = 1;", (role.id,))
-        conn.commit()
-        cur.close()
-        conn.close()
+        await metrics.defer(interaction, ephemeral=True)
+        await self.update_setting(interaction.guild_id, "manage_exam_role_id", role.id)
         await interaction.followup.send(f"✅ 已將 **考官身分組** 設定為：{role.mention}")
 
     @app_commands.command(name="set_graduate_role", description="設定考試通過後給予的身分組")
     @app_commands.default_permissions(administrator=True)
     async def set_graduate_role(self, interaction: discord.Interaction, role: discord.Role):
-        await interaction.response.defer(ephemeral=True)
-        conn = psycopg2.connect(DATABASE_URL)
-        cur = conn.cursor()
-        cur.execute("UPDATE exam_settings SET graduater_role_id = %s WHERE id = 1;", (role.id,))
-        conn.commit()
-        cur.close()
-        conn.close()
+        await metrics.defer(interaction, ephemeral=True)
+        await self.update_setting(interaction.guild_id, "graduater_role_id", role.id)
         await interaction.followup.send(f"✅ 已將 **畢業身分組** 設定為：{role.mention}")
 
     @app_commands.command(name="set_exam_amount", description="設定考試題目數量")
     @app_commands.default_permissions(administrator=True)
     @app_commands.describe(amount="題目數量 (1-999)")
     async def set_exam_amount(self, interaction: discord.Interaction, amount: app_commands.Range[int, 1, 999]):
-        await interaction.response.defer(ephemeral=True)
-        conn = psycopg2.connect(DATABASE_URL)
-        cur = conn.cursor()
-        cur.execute("UPDATE exam_settings SET question_amount = %s WHERE id = 1;", (amount,))
-        conn.commit()
-        cur.close()
-        conn.close()
+        await metrics.defer(interaction, ephemeral=True)
+        await self.update_setting(interaction.guild_id, "question_amount", amount)
         await interaction.followup.send(f"✅ 考試題目數量已設為 **{amount}** 題。")
 
     @app_commands.command(name="set_exam_cooldown", description="設定考試失敗後的冷卻時間 (分鐘)")
     @app_commands.default_permissions(administrator=True)
     @app_commands.describe(minutes="冷卻分鐘數 (0 代表無冷卻)")
     async def set_exam_cooldown(self, interaction: discord.Interaction, minutes: app_commands.Range[int, 0, 1440]):
-        await interaction.response.defer(ephemeral=True)
-        conn = psycopg2.connect(DATABASE_URL)
-        cur = conn.cursor()
-        cur.execute("UPDATE exam_settings SET failure_cooldown_minutes = %s WHERE id = 1;", (minutes,))
-        conn.commit()
-        cur.close()
-        conn.close()
+        await metrics.defer(interaction, ephemeral=True)
+        await self.update_setting(interaction.guild_id, "failure_cooldown_minutes", minutes)
         await interaction.followup.send(f"✅ 考試失敗冷卻時間已設為 **{minutes}** 分鐘。(設為 0 可立即解除所有冷卻)")
 
     # ---------------------------------------------------------
@@ -237,9 +317,9 @@ class Exam(commands.Cog):
     @app_commands.command(name="add_question", description="新增一個考題")
     @app_commands.default_permissions(administrator=True)
     async def add_question(self, interaction: discord.Interaction, question: str, option1: str, option2: str, option3: str, option4: str, answer: int):
-        await interaction.response.defer(ephemeral=True)
+        await metrics.defer(interaction, ephemeral=True)
         
-        settings = self.get_settings()
+        settings = await self.get_settings(interaction.guild_id)
         if not await self.check_manager_access(interaction, settings):
             return
 
@@ -247,31 +327,193 @@ class Exam(commands.Cog):
             await interaction.followup.send("❌ 答案只能是 1~4！")
             return
         
-        conn = psycopg2.connect(DATABASE_URL)
-        cur = conn.cursor()
-        cur.execute("INSERT INTO questions (question, option1, option2, option3, option4, answer) VALUES (%s, %s, %s, %s, %s, %s)", 
-                    (question, option1, option2, option3, option4, answer))
-        conn.commit()
-        cur.close()
-        conn.close()
-        await interaction.followup.send(f"✅ 成功新增題目：{question}")
+        # 先查記憶體的雜湊表 (O(1))，資料庫的唯一索引再擋一次同時新增的情況
+        question_hash = content_hash(question, (option1, option2, option3, option4))
+        bank = await self.question_banks.get(interaction.guild_id)
+        duplicate_id = bank.find_duplicate(question_hash)
+        if duplicate_id is None:
+            row = await self.storage.add_question(interaction.guild_id, question, (option1, option2, option3, option4), answer, question_hash)
+            if row:
+                bank.upsert(row)
+                await interaction.followup.send(f"✅ 成功新增題目：{question}")
+                return
+            duplicate_id = await self.storage.find_question_by_hash(interaction.guild_id, question_hash) or "?"
+
+        await interaction.followup.send(f"⚠️ 題庫裡已經有相同的題目 (ID {duplicate_id})，沒有新增。")
+
+    @app_commands.command(name="find_duplicates", description="列出題庫中內容重複的題目")
+    @app_commands.default_permissions(administrator=True)
+    async def find_duplicates(self, interaction: discord.Interaction):
+        await metrics.defer(interaction, ephemeral=True)
+        
+        settings = await self.get_settings(interaction.guild_id)
+        if not await self.check_manager_access(interaction, settings):
+            return
+
+        bank = await self.question_banks.get(interaction.guild_id)
+        clusters = bank.duplicate_clusters()
+        if not clusters:
+            await interaction.followup.send("✅ 題庫裡沒有重複的題目。")
+            return
+
+        embed = discord.Embed(title=f"🧮 重複題目 (共 {len(clusters)} 組)", color=discord.Color.orange())
+        lines = []
+        for ids in clusters:
+            text = bank.get(ids[0]).question
+            text = text if len(text) <= 80 else text[:80] + "…"
+            line = f"**ID {', '.join(map(str, ids))}** - {text}"
+            if sum(len(l) + 1 for l in lines) + len(line) > 3900:
+                lines.append(f"... 還有 {len(clusters) - len(lines)} 組")
+                break
+            lines.append(line)
+        embed.description = "\n".join(lines)
+        embed.set_footer(text="保留一題，其餘用 /delete_question 刪除")
+        await interaction.followup.send(embed=embed)
+
+    @app_commands.command(name="import_questions", description="從 CSV / JSON 檔案大量匯入題目")
+    @app_commands.default_permissions(administrator=True)
+    @app_commands.describe(file="需要欄位：question, option1, option2, option3, option4, answer (.csv / .json / .jsonl)")
+    async def import_questions(self, interaction: discord.Interaction, file: discord.Attachment):
+        await metrics.defer(interaction, ephemeral=True)
+        
+        settings = await self.get_settings(interaction.guild_id)
+        if not await self.check_manager_access(interaction, settings):
+            return
+
+        fmt = question_import.detect_format(file.filename)
+        if not fmt:
+            await interaction.followup.send("❌ 只支援 `.csv`、`.json`、`.jsonl` 檔案！")
+            return
+        if file.size > question_import.IMPORT_MAX_BYTES:
+            await interaction.followup.send(f"❌ 檔案太大！上限為 {question_import.IMPORT_MAX_BYTES // (1024 * 1024)} MB。")
+            return
+
+        # 先串流存到暫存檔，再在資料庫執行緒裡邊讀邊寫入 (同一個 transaction)
+        fd, path = tempfile.mkstemp(suffix=f".{fmt}")
+        os.close(fd)
+        try:
+            await question_import.download_attachment(file.url, path)
+            result = await self.storage.import_questions(interaction.guild_id, path, fmt)
+        except ValueError as e:
+            await interaction.followup.send(f"❌ 匯入失敗，沒有寫入任何題目：{e}")
+            return
+        except Exception as e:
+            await interaction.followup.send(f"❌ 錯誤：{e}")
+            return
+        finally:
+            os.remove(path)
+
+        bank = await self.question_banks.get(interaction.guild_id)
+        for row in result.inserted_rows:
+            bank.upsert(row)
+
+        embed = discord.Embed(title="📥 匯入完成", color=discord.Color.green() if not result.invalid else discord.Color.orange())
+        embed.add_field(name="新增", value=str(len(result.inserted_rows)))
+        embed.add_field(name="略過 (空白/重複)", value=str(result.skipped))
+        embed.add_field(name="格式錯誤", value=str(result.invalid))
+        embed.add_field(name="耗時", value=f"{result.elapsed:.2f} 秒")
+        if result.errors:
+            embed.add_field(name="錯誤範例", value="\n".join(result.errors)[:1024], inline=False)
+        await interaction.followup.send(embed=embed)
+
+    @app_commands.command(name="export_questions", description="匯出整個題庫")
+    @app_commands.default_permissions(administrator=True)
+    @app_commands.describe(fmt="匯出格式")
+    @app_commands.rename(fmt="format")
+    @app_commands.choices(fmt=[
+        app_commands.Choice(name="CSV", value="csv"),
+        app_commands.Choice(name="JSON Lines", value="jsonl"),
+    ])
+    async def export_questions(self, interaction: discord.Interaction, fmt: str = "csv"):
+        await metrics.defer(interaction, ephemeral=True)
+        
+        settings = await self.get_settings(interaction.guild_id)
+        if not await self.check_manager_access(interaction, settings):
+            return
+
+        try:
+            path, count = await self.storage.export_questions(interaction.guild_id, fmt)
+        except Exception as e:
+            await interaction.followup.send(f"❌ 錯誤：{e}")
+            return
+
+        try:
+            size = os.path.getsize(path)
+            limit = interaction.guild.filesize_limit if interaction.guild else 8 * 1024 * 1024
+            if size > limit:
+                await interaction.followup.send(f"❌ 匯出檔 ({size / 1024 / 1024:.1f} MB) 超過此伺服器的上傳上限。")
+                return
+            filename = "questions.csv" if fmt == "csv" else "questions.jsonl"
+            if path.endswith(".gz"):
+                filename += ".gz"
+            await interaction.followup.send(
+                f"📤 已匯出 **{count}** 題。",
+                file=discord.File(path, filename=filename)
+            )
+        finally:
+            os.remove(path)
+
+    @app_commands.command(name="search_question", description="用關鍵字搜尋題目 (題目與選項)")
+    @app_commands.default_permissions(administrator=True)
+    @app_commands.describe(keyword="要搜尋的文字")
+    async def search_question(self, interaction: discord.Interaction, keyword: str):
+        await metrics.defer(interaction, ephemeral=True)
+        
+        settings = await self.get_settings(interaction.guild_id)
+        if not await self.check_manager_access(interaction, settings):
+            return
+
+        start = time.perf_counter()
+        results = await self.storage.search_questions(interaction.guild_id, keyword)
+        elapsed_ms = (time.perf_counter() - start) * 1000
+
+        if not results:
+            await interaction.followup.send(f"🔍 找不到和「{keyword}」相關的題目。")
+            return
+
+        embed = discord.Embed(title=f"🔍 搜尋：{keyword}", color=discord.Color.blue())
+        lines = []
+        for question_id, text, score in results:
+            text = text if len(text) <= 200 else text[:200] + "…"
+            lines.append(f"**ID: {question_id}** ({score:.0%}) - {text}")
+        embed.description = "\n".join(lines)
+        embed.set_footer(text=f"{elapsed_ms:.0f} ms · 在 /delete_question 的 ID 欄位輸入關鍵字即可直接選題")
+        await interaction.followup.send(embed=embed)
+
+    async def question_id_autocomplete(self, interaction: discord.Interaction, current: str):
+        # 輸入數字就先比對 ID，否則用搜尋結果當選項
+        choices = []
+        current = current.strip()
+        if current.isdigit():
+            bank = await self.question_banks.get(interaction.guild_id)
+            q = bank.get(int(current))
+            if q:
+                choices.append(app_commands.Choice(name=f"{q.id} · {q.question}"[:100], value=q.id))
+        if current:
+            results = await self.storage.search_questions(interaction.guild_id, current)
+            choices.extend(
+                app_commands.Choice(name=f"{question_id} · {text}"[:100], value=question_id)
+                for question_id, text, _ in results
+                if not choices or question_id != choices[0].value
+            )
+        return choices[:25]
 
     @app_commands.command(name="delete_question", description="刪除考題")
     @app_commands.default_permissions(administrator=True)
+    @app_commands.describe(question_id="題目 ID (也可以輸入關鍵字搜尋)")
+    @app_commands.autocomplete(question_id=question_id_autocomplete)
     async def delete_question(self, interaction: discord.Interaction, question_id: int):
-        await interaction.response.defer(ephemeral=True)
+        await metrics.defer(interaction, ephemeral=True)
         
-        settings = self.get_settings()
+        settings = await self.get_settings(interaction.guild_id)
         if not await self.check_manager_access(interaction, settings):
             return
         
-        conn = psycopg2.connect(DATABASE_URL)
-        cur = conn.cursor()
-        cur.execute("DELETE FROM questions WHERE id = %s RETURNING *", (question_id,))
-        deleted = cur.fetchone()
-        conn.commit()
-        cur.close()
-        conn.close()
+        deleted = await self.storage.delete_question(interaction.guild_id, question_id)
+        if deleted:
+            bank = self.question_banks.peek(interaction.guild_id)
+            if bank is not None:
+                bank.remove(question_id)
         
         if deleted:
             await interaction.followup.send(f"🗑️ 已刪除題目 ID {question_id}")
@@ -280,64 +522,298 @@ class Exam(commands.Cog):
 
     @app_commands.command(name="list_questions", description="查詢所有題目")
     @app_commands.default_permissions(administrator=True)
-    async def list_questions(self, interaction: discord.Interaction):
-        await interaction.response.defer(ephemeral=True)
+    @app_commands.describe(keyword="只列出題目包含此文字的題目 (可留空)")
+    async def list_questions(self, interaction: discord.Interaction, keyword: str = None):
+        await metrics.defer(interaction, ephemeral=True)
         
-        settings = self.get_settings()
+        settings = await self.get_settings(interaction.guild_id)
         if not await self.check_manager_access(interaction, settings):
             return
             
-        conn = psycopg2.connect(DATABASE_URL)
-        cur = conn.cursor()
-        cur.execute("SELECT id, question FROM questions ORDER BY id")
-        questions = cur.fetchall()
-        cur.close()
-        conn.close()
+        view = QuestionPagerView(self.storage, interaction.guild_id, interaction.user.id, keyword)
+        embed = await view.load_first_page()
         
-        if not questions:
-            await interaction.followup.send("目前題庫是空的！")
+        if embed is None:
+            await interaction.followup.send("找不到符合的題目！" if keyword else "目前題庫是空的！")
             return
             
-        embed = discord.Embed(title="📖 題庫列表", color=discord.Color.blue())
-        description_text = ""
-        for q in questions:
-            line = f"**ID: {q[0]}** - {q[1]}\n"
-            if len(description_text) + len(line) > 4096:
-                description_text += "\n... (題目過多，僅顯示部分)"
-                break
-            description_text += line
-        embed.description = description_text
-        await interaction.followup.send(embed=embed)
+        await interaction.followup.send(embed=embed, view=view)
 
     @app_commands.command(name="reset_questions", description="【危險】清空題庫")
     @app_commands.default_permissions(administrator=True)
     async def reset_questions(self, interaction: discord.Interaction):
-        await interaction.response.defer(ephemeral=True)
+        await metrics.defer(interaction, ephemeral=True)
         
-        settings = self.get_settings()
+        settings = await self.get_settings(interaction.guild_id)
         if not await self.check_manager_access(interaction, settings):
             return
             
         try:
-            conn = psycopg2.connect(DATABASE_URL)
-            cur = conn.cursor()
-            cur.execute("TRUNCATE TABLE questions RESTART IDENTITY;")
-            conn.commit()
-            cur.close()
-            conn.close()
+            # 只清這個伺服器的題目
+            await self.storage.delete_all_questions(interaction.guild_id)
+            bank = self.question_banks.peek(interaction.guild_id)
+            if bank is not None:
+                bank.clear()
             await interaction.followup.send("💥 題庫已重置。")
         except Exception as e:
             await interaction.followup.send(f"❌ 錯誤：{e}")
 
+    # ---------------------------------------------------------
+    # 📊 執行狀態
+    # ---------------------------------------------------------
+
+    @app_commands.command(name="role_grants", description="查看身分組發放的排隊與失敗紀錄")
+    @app_commands.default_permissions(administrator=True)
+    async def role_grants_status(self, interaction: discord.Interaction):
+        await metrics.defer(interaction, ephemeral=True)
+
+        counts, failed = await self.storage.grant_summary(interaction.guild_id)
+
+        color = discord.Color.orange() if failed else discord.Color.green()
+        embed = discord.Embed(title="🏅 身分組發放", color=color)
+        embed.add_field(name="等待發放", value=str(counts.get("pending", 0)))
+        embed.add_field(name="已發放", value=str(counts.get("granted", 0)))
+        embed.add_field(name="失敗", value=str(counts.get("failed", 0)))
+        if failed:
+            lines = []
+            for user_id, role_id, attempts, error, updated_at in failed:
+                lines.append(f"<@{user_id}> → <@&{role_id}> · 試了 {attempts} 次 · <t:{int(updated_at.timestamp())}:R>\n　`{error}`")
+            embed.add_field(name="最近的失敗", value="\n".join(lines)[:1024], inline=False)
+        worker = self.role_grants.stats()
+        embed.set_footer(text=f"本程序：排隊 {worker['pending']} · 重試 {worker['retries']} 次")
+        await interaction.followup.send(embed=embed)
+
+    @app_commands.command(name="exam_stats", description="查看考試統計：通過率、最難的題目、每天的考試數")
+    @app_commands.default_permissions(administrator=True)
+    @app_commands.describe(days="顯示最近幾天的考試數")
+    async def exam_stats(self, interaction: discord.Interaction, days: app_commands.Range[int, 1, 30] = 7):
+        await metrics.defer(interaction, ephemeral=True)
+
+        # 先把記憶體裡還沒寫回的計數併進去，查詢只讀預先彙總好的表
+        await self.analytics.flush()
+        stats = await self.storage.exam_stats(interaction.guild_id, date.today() - timedelta(days=days - 1))
+
+        started, passed, failed = stats["totals"]
+        finished = passed + failed
+        embed = discord.Embed(title="📈 考試統計", color=discord.Color.blurple())
+        pass_rate = f"**{passed / finished:.1%}** ({passed} / {finished} 場)" if finished else "還沒有考完的考試"
+        embed.add_field(
+            name="🎯 通過率",
+            value=f"{pass_rate}\n開考 {started} 場 · 通過 {passed} · 答錯 {failed} · 未完成 {max(0, started - finished)}",
+            inline=False
+        )
+
+        lines = []
+        for question_id, text, attempts, failures in stats["hardest"]:
+            text = text if len(text) <= 60 else text[:60] + "…"
+            lines.append(f"**ID {question_id}** · 答錯率 **{failures / attempts:.0%}** ({failures} / {attempts}) - {text}")
+        embed.add_field(name="🧗 最難的題目", value="\n".join(lines)[:1024] or "作答次數還不夠多", inline=False)
+
+        lines = [
+            f"`{day:%m-%d}` 開考 {day_started} · 通過 {day_passed} · 答錯 {day_failed}"
+            for day, day_started, day_passed, day_failed in stats["daily"]
+        ]
+        embed.add_field(name=f"📅 最近 {days} 天", value="\n".join(lines)[:1024] or "這段期間沒有考試", inline=False)
+        await interaction.followup.send(embed=embed)
+
+    @app_commands.command(name="exam_status", description="查看考試系統的執行狀態")
+    @app_commands.default_permissions(administrator=True)
+    async def exam_status(self, interaction: discord.Interaction):
+        await metrics.defer(interaction, ephemeral=True)
+
+        guild_bank = await self.question_banks.get(interaction.guild_id)
+        bank = guild_bank.stats()
+        banks = self.question_banks.stats()
+        embed = discord.Embed(title="📊 考試系統狀態", color=discord.Color.blurple())
+        embed.add_field(
+            name="📚 本伺服器題庫",
+            value=(
+                f"題數：**{bank['questions']}**\n"
+                f"版本：`{bank['version']}`\n"
+                f"記憶體：約 **{guild_bank.memory_bytes() / 1024:.0f} KB**\n"
+                f"上次整批載入：**{bank['last_load_seconds'] * 1000:.0f} ms**"
+            ),
+            inline=False
+        )
+        embed.add_field(
+            name="🏠 全部伺服器",
+            value=(
+                f"已載入題庫：**{banks['guilds']}** 個伺服器，共 **{banks['questions']}** 題\n"
+                f"記憶體：約 **{self.question_banks.memory_bytes() / 1024:.0f} KB**\n"
+                f"設定快取：**{len(self.settings)}** 個伺服器"
+            ),
+            inline=False
+        )
+        cooldowns = self.cooldowns.stats()
+        embed.add_field(
+            name="⏳ 冷卻",
+            value=(
+                f"冷卻中人數：**{cooldowns['active']}**\n"
+                f"待寫回：**{cooldowns['pending_writes']}**\n"
+                f"已寫回 / 已清除：{cooldowns['flushed_rows']} / {cooldowns['pruned_rows']} 筆"
+            ),
+            inline=False
+        )
+        notifier = self.notifier.stats()
+        embed.add_field(
+            name="📨 失敗通知",
+            value=(
+                f"排隊中：**{notifier['pending']}**，已送出 {notifier['sent_failures']} 筆 / {notifier['sent_messages']} 則摘要\n"
+                f"被限速：{notifier['rate_limited']} 次，丟棄：{notifier['dropped']} 筆"
+            ),
+            inline=False
+        )
+        render = self.render_cache.stats()
+        embed.add_field(
+            name="🖼️ 題目畫面快取",
+            value=(
+                f"快取：**{render['entries']} / {render['max_size']}** 題\n"
+                f"命中率：**{render['hit_rate']:.1%}** ({render['hits']} / {render['hits'] + render['misses']})"
+            ),
+            inline=False
+        )
+        admission = self.admission.stats()
+        embed.add_field(
+            name="🚦 開考排隊",
+            value=(
+                f"開考中：**{admission['active']} / {admission['max_concurrent']}**，排隊：**{admission['queue_depth']} / {admission['max_queue']}** (最多 {admission['max_depth']})\n"
+                f"平均 / 最長等待：{admission['avg_wait']:.1f} / {admission['max_wait']:.1f} 秒\n"
+                f"已放行 / 排過隊 / 隊伍滿被拒 / 等太久：{admission['admitted']} / {admission['queued']} / {admission['rejected']} / {admission['timed_out']}"
+            ),
+            inline=False
+        )
+        sessions = self.sessions.stats()
+        embed.add_field(
+            name="📝 進行中的考試",
+            value=(
+                f"進行中：**{sessions['active']}** 場，約 **{self.sessions.memory_bytes() / 1024:.1f} KB**\n"
+                f"已開始 / 已結束 / 逾時清除：{sessions['started']} / {sessions['completed']} / {sessions['evicted']}\n"
+                f"重啟後接回：{sessions['restored']} 場"
+            ),
+            inline=False
+        )
+        await interaction.followup.send(embed=embed)
+
     # ---------------------------------------------------------
     # 📝 考試核心指令
     # ---------------------------------------------------------
 
+    async def get_exam_session(self, interaction: discord.Interaction, session_id: int):
+        session = await self.sessions.get(session_id)
+        if session is None:
+            await interaction.response.edit_message(content="⌛ 這場考試已經逾時，請重新使用 `/exam`。", embed=None, view=None)
+        return session
+
+    async def answer_question(self, interaction: discord.Interaction, session_id: int, index: int, selected: int):
+        session = await self.get_exam_session(interaction, session_id)
+        if session is None:
+            return
+        if session.index != index:
+            # 舊訊息 / 重複送出：這題已經答過了
+            await interaction.response.send_message("⚠️ 這一題已經作答過了。", ephemeral=True)
+            return
+
+        bank = await self.question_banks.get(session.guild_id)
+        q = bank.get(session.current_question_id)
+        
+        # 作答途中題目被刪掉的話就當作跳過
+        if q is None or selected == q.answer:
+            if q is not None:
+                session.correct_count += 1
+                self.analytics.record_answer(session.guild_id, q.id, True)
+            session.index += 1
+            if session.finished:
+                self.analytics.record_result(session.guild_id, True)
+            embed, view = render_exam(session, bank, self.render_cache)
+            await interaction.response.edit_message(content=None, embed=embed, view=view)
+            await self.sessions.checkpoint(session)
+            return
+
+        await interaction.response.edit_message(content=f"❌ 答錯了！考試結束 😢", embed=None, view=None)
+        await self.sessions.end(session_id)
+        self.analytics.record_answer(session.guild_id, q.id, False)
+        self.analytics.record_result(session.guild_id, False)
+
+        settings = await self.get_settings(session.guild_id)
+        cooldown_minutes = settings['failure_cooldown_minutes']
+        if cooldown_minutes > 0:
+            cooldown_until = datetime.now() + timedelta(minutes=cooldown_minutes)
+            self.cooldowns.set(session.guild_id, interaction.user.id, cooldown_until)
+
+        # 失敗通知只排進隊伍，由背景合併成摘要送到管理頻道
+        manage_channel_id = settings['add_exam_room_id']
+        if manage_channel_id:
+            retry_at = int(cooldown_until.timestamp()) if cooldown_minutes > 0 else None
+            self.notifier.enqueue(manage_channel_id, interaction.user.mention, q.question, retry_at)
+
+    async def finish_exam(self, interaction: discord.Interaction, session_id: int):
+        session = await self.get_exam_session(interaction, session_id)
+        if session is None:
+            return
+        if not session.finished:
+            await interaction.response.send_message("⚠️ 考試還沒結束喔。", ephemeral=True)
+            return
+        await self.sessions.end(session_id)
+
+        settings = await self.get_settings(session.guild_id)
+        graduater_role_id = settings['graduater_role_id']
+        if not graduater_role_id:
+            await interaction.response.edit_message(content="❌ 系統錯誤：未設定畢業身分組 ID。", embed=None, view=None)
+            return
+
+        role = interaction.guild.get_role(graduater_role_id)
+        if role:
+            # 先寫進 role_grants 再回覆 (寫失敗就不能說發放中)；實際發放交給背景慢慢來，一次很多人通過時才不會被限速卡住
+            try:
+                await self.role_grants.submit(session.guild_id, interaction.user.id, role.id)
+            except Exception as e:
+                print(f"登記身分組發放失敗 (伺服器 {session.guild_id}，使用者 {interaction.user.id}): {e}")
+                await interaction.response.edit_message(content="❌ 你已通過考試，但身分組登記失敗，請聯絡管理員補發。", embed=None, view=None)
+                manage_channel = self.bot.get_channel(settings['add_exam_room_id']) if settings['add_exam_room_id'] else None
+                if manage_channel:
+                    try:
+                        await manage_channel.send(f"⚠️ {interaction.user.mention} 通過考試，但身分組 **{role.name}** 登記發放失敗，請手動補發。\n`{e}`")
+                    except discord.HTTPException as send_error:
+                        print(f"無法通知管理頻道: {send_error}")
+                return
+            await interaction.response.edit_message(content=f"🏅 恭喜通過！身分組 **{role.name}** 發放中，稍後就會出現。", embed=None, view=None)
+        else:
+            await interaction.response.edit_message(content=f"✅ 通過！但找不到 ID `{graduater_role_id}` 的身分組。", embed=None, view=None)
+
     @app_commands.command(name="exam", description="開始考試")
     async def exam_start(self, interaction: discord.Interaction):
-        await interaction.response.defer(ephemeral=True)
-        
-        settings = self.get_settings()
+        await metrics.defer(interaction, ephemeral=True)
+
+        # 同時只能考一場 (純記憶體，排隊前先擋)；考試訊息是只有自己看得到的，關掉了就重新送一次讓人接著考
+        session = self.sessions.active(interaction.guild_id, interaction.user.id)
+        if session is not None:
+            await self.resume_exam(interaction, session)
+            return
+
+        # 開考流量控制：同時開考的數量有上限，其他人依序排隊
+        async def on_wait(position: int, expected_wait: float):
+            await interaction.followup.send(
+                f"🚦 目前開考的人很多，你排在第 **{position}** 位，預計約 **{max(1, round(expected_wait))}** 秒後開始…",
+                ephemeral=True
+            )
+
+        try:
+            async with self.admission.slot(on_wait):
+                await self.open_exam(interaction)
+        except AdmissionRejected as e:
+            if e.reason == "full":
+                await interaction.followup.send("🚦 目前排隊的人數已滿，請稍後再試。", ephemeral=True)
+            else:
+                await interaction.followup.send("⌛ 排隊太久了，請稍後再試一次。", ephemeral=True)
+
+    async def resume_exam(self, interaction: discord.Interaction, session: ExamSession):
+        bank = await self.question_banks.get(session.guild_id)
+        embed, view = render_exam(session, bank, self.render_cache)
+        self.sessions.touch(session)
+        await interaction.followup.send("📘 你有一場進行中的考試，從上次的進度繼續。", embed=embed, view=view, ephemeral=True)
+
+    async def open_exam(self, interaction: discord.Interaction):
+        settings = await self.get_settings(interaction.guild_id)
         
         if not settings:
             await interaction.followup.send("❌ 系統錯誤：無法讀取設定。", ephemeral=True)
@@ -353,42 +829,20 @@ class Exam(commands.Cog):
             await interaction.followup.send(f"⚠️ 請到指定的考試房間 <#{settings['exam_room_id']}> 使用此指令！")
             return
 
-        conn = psycopg2.connect(DATABASE_URL)
-        cur = conn.cursor()
-        
-        # 1. 檢查是否在冷卻中
+        # 1. 檢查是否在冷卻中 (記憶體，不用查資料庫)
         if settings['failure_cooldown_minutes'] > 0:
-            cur.execute("SELECT cooldown_until FROM user_cooldowns WHERE user_id = %s", (interaction.user.id,))
-            cooldown_row = cur.fetchone()
+            remaining_seconds = self.cooldowns.remaining_seconds(interaction.guild_id, interaction.user.id)
             
-            if cooldown_row:
-                cooldown_until = cooldown_row[0]
-                remaining_seconds = (cooldown_until - datetime.now()).total_seconds()
-                
-                if remaining_seconds > 3:
-                    mins, secs = divmod(int(remaining_seconds), 60)
-                    time_str = f"{mins} 分 {secs} 秒" if mins > 0 else f"{secs} 秒"
-                    await interaction.followup.send(f"⏳ 考試正在冷卻中。\n請等待 **{time_str}** 後再試。", ephemeral=True)
-                    cur.close()
-                    conn.close()
-                    return
-
-        # 2. ✨ 寫入新的冷卻時間 (只要開始考試，就設定冷卻)
-        if settings['failure_cooldown_minutes'] > 0:
-            new_cooldown_until = datetime.now() + timedelta(minutes=settings['failure_cooldown_minutes'])
-            cur.execute("""
-                INSERT INTO user_cooldowns (user_id, cooldown_until) 
-                VALUES (%s, %s) 
-                ON CONFLICT (user_id) DO UPDATE SET cooldown_until = EXCLUDED.cooldown_until;
-            """, (interaction.user.id, new_cooldown_until))
-            conn.commit() # 立即存檔
-
-        # 3. 撈題目
+            if remaining_seconds > 3:
+                mins, secs = divmod(int(remaining_seconds), 60)
+                time_str = f"{mins} 分 {secs} 秒" if mins > 0 else f"{secs} 秒"
+                await interaction.followup.send(f"⏳ 考試正在冷卻中。\n請等待 **{time_str}** 後再試。", ephemeral=True)
+                return
+
+        # 2. 抽題目 (直接從記憶體題庫)
         amount_to_fetch = settings['question_amount']
-        cur.execute("SELECT * FROM questions ORDER BY RANDOM() LIMIT %s", (amount_to_fetch,))
-        questions = cur.fetchall()
-        cur.close()
-        conn.close()
+        bank = await self.question_banks.get(interaction.guild_id)
+        questions = bank.draw(amount_to_fetch)
 
         if not questions:
             await interaction.followup.send("目前題庫是空的！")
@@ -397,143 +851,219 @@ class Exam(commands.Cog):
             await interaction.followup.send(f"⚠️ 題目不足 (僅 {len(questions)} 題)！")
             return
 
+        # 3. 建立考試進度 (只存題目 ID)；上面等待題庫時可能又開了一場，這裡再擋一次
+        session = await self.sessions.begin(interaction.guild_id, interaction.user.id, [q.id for q in questions])
+        if session is None:
+            # 重啟前開的考試只在資料庫裡，接回來繼續
+            session = await self.sessions.find(interaction.guild_id, interaction.user.id)
+            if session is not None:
+                await self.resume_exam(interaction, session)
+            else:
+                await interaction.followup.send("⚠️ 你已經有一場進行中的考試，請先完成它。", ephemeral=True)
+            return
+        self.analytics.record_start(interaction.guild_id)
+
+        # 4. ✨ 寫入新的冷卻時間 (只要開始考試，就設定冷卻；背景批次寫回資料庫)
+        if settings['failure_cooldown_minutes'] > 0:
+            new_cooldown_until = datetime.now() + timedelta(minutes=settings['failure_cooldown_minutes'])
+            self.cooldowns.set(interaction.guild_id, interaction.user.id, new_cooldown_until)
+
         # 建立 View
-        view = QuizView(
-            self.bot, 
-            interaction.user, 
-            questions, 
-            settings['graduater_role_id'], 
-            settings['failure_cooldown_minutes'],
-            settings['add_exam_room_id']
-        ) 
+        embed, view = render_exam(session, bank, self.render_cache)
         
         await interaction.followup.send(
             f"📘 考試開始！共有 {len(questions)} 題。",
-            embed=view.current_embed, 
+            embed=embed, 
             view=view
         )
 
 
-# 👇 互動題目選單
-class QuizView(discord.ui.View):
-    def __init__(self, bot: commands.Bot, user: discord.User, questions, graduater_role_id: int, cooldown_minutes: int, manage_channel_id: int):
-        super().__init__(timeout=None)
-        self.bot = bot
-        self.user = user
-        self.questions = questions
-        self.graduater_role_id = graduater_role_id
-        self.cooldown_minutes = cooldown_minutes
-        self.manage_channel_id = manage_channel_id
-        self.index = 0
-        self.correct_count = 0
-        self.show_next()
-
-    def show_next(self):
-        self.clear_items()
-        if self.index < len(self.questions):
-            q = self.questions[self.index]
-            
-            options_to_shuffle = [
-                (q[2], "1"), (q[3], "2"), (q[4], "3"), (q[5], "4")
-            ]
-            random.shuffle(options_to_shuffle)
-            
-            embed = discord.Embed(title=f"第 {self.index + 1} / {len(self.questions)} 題", description=f"**{q[1]}**", color=discord.Color.green())
-            
-            select_options = []
-            for i, (text, original_value) in enumerate(options_to_shuffle):
-                embed.add_field(name=f"選項 {i+1}", value=text, inline=False)
-                select_options.append(discord.SelectOption(label=f"選項 {i+1}", value=original_value))
-
-            select = discord.ui.Select(
-                placeholder="請選擇一個選項...",
-                options=select_options
-            )
-            
-            select.callback = self.make_callback(int(q[6]), q[1])
-            self.add_item(select)
-            self.current_embed = embed
-            
+# 👇 題庫分頁瀏覽 (keyset 分頁：每頁只查 WHERE id > 上一頁最後 id)
+class QuestionPagerView(discord.ui.View):
+    def __init__(self, storage: Storage, guild_id: int, owner_id: int, keyword: str = None, page_size: int = LIST_PAGE_SIZE, cache_pages: int = 8):
+        super().__init__(timeout=600)
+        self.storage = storage
+        self.guild_id = guild_id
+        self.owner_id = owner_id
+        self.keyword = keyword
+        self.page_size = page_size
+        self.cache_pages = cache_pages
+        # 每一頁的起點 (查詢 id > 起點)，第 0 頁從 0 開始
+        self.anchors = [0]
+        self.page = 0
+        # 起點 -> (這頁的題目, 是否還有下一頁)，只留最近看過的幾頁
+        self._pages = OrderedDict()
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        if interaction.user.id != self.owner_id:
+            await interaction.response.send_message("這不是你的列表喔 😅", ephemeral=True)
+            return False
+        return True
+
+    async def fetch_page(self, anchor: int):
+        if anchor in self._pages:
+            self._pages.move_to_end(anchor)
+            return self._pages[anchor]
+
+        rows = await self.storage.list_questions(self.guild_id, self.keyword, anchor, self.page_size + 1)
+        page = (rows[:self.page_size], len(rows) > self.page_size)
+        self._pages[anchor] = page
+        while len(self._pages) > self.cache_pages:
+            self._pages.popitem(last=False)
+        return page
+
+    async def fetch_previous_anchor(self, anchor: int):
+        # 跳頁後往回翻：反向 keyset 找出前一頁的第一題
+        ids = await self.storage.list_question_ids_before(self.guild_id, self.keyword, anchor, self.page_size)
+        if len(ids) < self.page_size:
+            return 0
+        return ids[-1] - 1
+
+    async def load_first_page(self):
+        rows, has_next = await self.fetch_page(self.anchors[0])
+        if not rows:
+            return None
+        return self.build_embed(rows, has_next)
+
+    def build_embed(self, rows, has_next: bool):
+        title = "📖 題庫列表" if not self.keyword else f"📖 題庫列表 (搜尋：{self.keyword})"
+        embed = discord.Embed(title=title, color=discord.Color.blue())
+        lines = []
+        for q in rows:
+            text = q[1] if len(q[1]) <= 200 else q[1][:200] + "…"
+            lines.append(f"**ID: {q[0]}** - {text}")
+        embed.description = "\n".join(lines) if lines else "(這一頁沒有題目)"
+        if rows:
+            embed.set_footer(text=f"ID {rows[0][0]} ~ {rows[-1][0]} · 每頁 {self.page_size} 題")
+
+        self.previous_page.disabled = self.page == 0 and self.anchors[0] == 0
+        self.next_page.disabled = not has_next
+        return embed
+
+    async def show(self, interaction: discord.Interaction):
+        rows, has_next = await self.fetch_page(self.anchors[self.page])
+        await interaction.response.edit_message(embed=self.build_embed(rows, has_next), view=self)
+
+    @discord.ui.button(label="◀ 上一頁", style=discord.ButtonStyle.secondary)
+    async def previous_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        if self.page > 0:
+            self.page -= 1
         else:
-            button = discord.ui.Button(label="領取證書", style=discord.ButtonStyle.success)
-            button.callback = self.finish_exam
-            self.add_item(button)
-            self.current_embed = discord.Embed(title="🎉 考試結束", description="恭喜你全部答對！請點擊下方按鈕領取身分組。", color=discord.Color.gold())
-
-    def make_callback(self, correct_answer, question_text: str):
-        async def callback(interaction: discord.Interaction):
-            if interaction.user.id != self.user.id:
-                await interaction.response.send_message("這不是你的考試喔 😅", ephemeral=True)
-                return
-            
-            selected = int(interaction.data["values"][0])
-            
-            if selected == correct_answer:
-                self.correct_count += 1
-                self.index += 1
-                if self.index < len(self.questions):
-                    self.show_next()
-                    await interaction.response.edit_message(content=None, embed=self.current_embed, view=self)
-                else:
-                    self.show_next()
-                    await interaction.response.edit_message(content=None, embed=self.current_embed, view=self)
+            anchor = await self.fetch_previous_anchor(self.anchors[0])
+            if anchor == 0:
+                # 回到開頭：後面記的起點是從跳頁位置算的，接不上第一頁，要從頭重建
+                self.anchors = [0]
+                self.page = 0
             else:
-                await interaction.response.edit_message(content=f"❌ 答錯了！考試結束 😢", embed=None, view=None)
-                
-                if self.cooldown_minutes > 0:
-                    try:
-                        conn = psycopg2.connect(DATABASE_URL)
-                        cur = conn.cursor()
-                        cooldown_until = datetime.now() + timedelta(minutes=self.cooldown_minutes)
-                        cur.execute("""
-                            INSERT INTO user_cooldowns (user_id, cooldown_until) 
-                            VALUES (%s, %s) 
-                            ON CONFLICT (user_id) DO UPDATE SET cooldown_until = EXCLUDED.cooldown_until;
-                        """, (interaction.user.id, cooldown_until))
-                        conn.commit()
-                        cur.close()
-                        conn.close()
-                    except Exception as e:
-                        print(f"冷卻設定失敗: {e}")
-
-                if self.manage_channel_id:
-                    try:
-                        announce_channel = self.bot.get_channel(self.manage_channel_id)
-                        if not announce_channel:
-                             announce_channel = await self.bot.fetch_channel(self.manage_channel_id)
-
-                        if announce_channel:
-                            retry_msg = ""
-                            if self.cooldown_minutes > 0:
-                                future_ts = int((datetime.now() + timedelta(minutes=self.cooldown_minutes)).timestamp())
-                                # ✨ [格式優化] 這裡的通知也改成具體時間點
-                                retry_msg = f"\n⏳ 需等待至 <t:{future_ts}:t> 才能重考。"
-
-                            await announce_channel.send(
-                                f"😥 **考試失敗通知**\n"
-                                f"成員：{interaction.user.mention}\n"
-                                f"錯誤題目：**{question_text}**"
-                                f"{retry_msg}"
-                            )
-                    except Exception as e:
-                        print(f"無法傳送失敗訊息: {e}")
-                
-        return callback
-
-    async def finish_exam(self, interaction: discord.Interaction):
-        if not self.graduater_role_id:
-            await interaction.response.edit_message(content="❌ 系統錯誤：未設定畢業身分組 ID。", embed=None, view=None)
+                self.anchors.insert(0, anchor)
+        await self.show(interaction)
+
+    @discord.ui.button(label="下一頁 ▶", style=discord.ButtonStyle.secondary)
+    async def next_page(self, interaction: discord.Interaction, button: discord.ui.Button):
+        rows, has_next = await self.fetch_page(self.anchors[self.page])
+        if has_next:
+            if self.page + 1 == len(self.anchors):
+                self.anchors.append(rows[-1][0])
+            self.page += 1
+        await self.show(interaction)
+
+    @discord.ui.button(label="🔢 跳到 ID", style=discord.ButtonStyle.primary)
+    async def jump(self, interaction: discord.Interaction, button: discord.ui.Button):
+        await interaction.response.send_modal(JumpToQuestionModal(self))
+
+    async def jump_to(self, interaction: discord.Interaction, question_id: int):
+        # 從指定 ID 重新開始分頁 (舊的頁面快取還能沿用)
+        self.anchors = [max(0, question_id - 1)]
+        self.page = 0
+        await self.show(interaction)
+
+
+class JumpToQuestionModal(discord.ui.Modal, title="跳到指定題目 ID"):
+    question_id = discord.ui.TextInput(label="題目 ID", placeholder="例如：120", max_length=12)
+
+    def __init__(self, pager: QuestionPagerView):
+        super().__init__()
+        self.pager = pager
+
+    async def on_submit(self, interaction: discord.Interaction):
+        try:
+            question_id = int(self.question_id.value)
+        except ValueError:
+            await interaction.response.send_message("❌ 請輸入數字 ID！", ephemeral=True)
             return
+        await self.pager.jump_to(interaction, question_id)
 
-        role = interaction.guild.get_role(self.graduater_role_id)
-        if role:
-            try:
-                await interaction.user.add_roles(role)
-                await interaction.response.edit_message(content=f"🏅 恭喜！已獲得身分組：{role.name}", embed=None, view=None)
-            except discord.Forbidden:
-                await interaction.response.edit_message(content="✅ 通過！但我權限不足給予身分組，請通知管理員。", embed=None, view=None)
-        else:
-            await interaction.response.edit_message(content=f"✅ 通過！但找不到 ID `{self.graduater_role_id}` 的身分組。", embed=None, view=None)
+
+# 👇 互動題目選單：custom_id = exam:<動作>:<session_id>:<user_id>[:<題號>]
+# 訊息本身不用存在記憶體 (DynamicItem 依 custom_id 重建)，選項打亂後的順序就是 Select 的 value
+def render_exam(session: ExamSession, bank, render_cache: RenderCache):
+    view = discord.ui.View(timeout=None)
+    # 考試途中被刪掉的題目直接跳過
+    while not session.finished and bank.get(session.current_question_id) is None:
+        session.index += 1
+
+    if not session.finished:
+        # embed 欄位在快取裡依排列組好了，這裡只挑一個排列、補上題號
+        rendered = render_cache.get(bank.get(session.current_question_id))
+        embed, select_options = rendered.render(session.index + 1, len(session.question_ids))
+        view.add_item(ExamAnswerSelect(session.session_id, session.user_id, session.index, select_options))
+        return embed, view
+        
+    view.add_item(ExamFinishButton(session.session_id, session.user_id))
+    embed = discord.Embed(title="🎉 考試結束", description="恭喜你全部答對！請點擊下方按鈕領取身分組。", color=discord.Color.gold())
+    return embed, view
+
+
+async def check_exam_owner(interaction: discord.Interaction, user_id: int) -> bool:
+    if interaction.user.id != user_id:
+        await interaction.response.send_message("這不是你的考試喔 😅", ephemeral=True)
+        return False
+    return True
+
+
+class ExamAnswerSelect(discord.ui.DynamicItem[discord.ui.Select], template=r"exam:answer:(?P<session_id>\d+):(?P<user_id>\d+):(?P<index>\d+)"):
+    def __init__(self, session_id: int, user_id: int, index: int, options):
+        super().__init__(discord.ui.Select(
+            custom_id=f"exam:answer:{session_id}:{user_id}:{index}",
+            placeholder="請選擇一個選項...",
+            options=options
+        ))
+        self.session_id = session_id
+        self.user_id = user_id
+        self.index = index
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Select, match):
+        return cls(int(match["session_id"]), int(match["user_id"]), int(match["index"]), item.options)
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        return await check_exam_owner(interaction, self.user_id)
+
+    async def callback(self, interaction: discord.Interaction):
+        cog = interaction.client.get_cog("Exam")
+        await cog.answer_question(interaction, self.session_id, self.index, int(self.item.values[0]))
+
+
+class ExamFinishButton(discord.ui.DynamicItem[discord.ui.Button], template=r"exam:finish:(?P<session_id>\d+):(?P<user_id>\d+)"):
+    def __init__(self, session_id: int, user_id: int):
+        super().__init__(discord.ui.Button(
+            label="領取證書",
+            style=discord.ButtonStyle.success,
+            custom_id=f"exam:finish:{session_id}:{user_id}"
+        ))
+        self.session_id = session_id
+        self.user_id = user_id
+
+    @classmethod
+    async def from_custom_id(cls, interaction: discord.Interaction, item: discord.ui.Button, match):
+        return cls(int(match["session_id"]), int(match["user_id"]))
+
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        return await check_exam_owner(interaction, self.user_id)
+
+    async def callback(self, interaction: discord.Interaction):
+        cog = interaction.client.get_cog("Exam")
+        await cog.finish_exam(interaction, self.session_id)
 
 async def setup(bot):
     await bot.add_cog(Exam(bot))
\ No newline at end of file
@@ -0,0 +1,150 @@
+# status.py (分片健康狀態 / 延遲、效能指標)
+
+import math
+from datetime import datetime
+
+import discord
+from discord import app_commands
+from discord.ext import commands
+
+from utils import metrics
+
+
+# 👇 分片狀態：記錄每個分片最近一次連線 / 斷線，讓管理員查看延遲與健康狀況
+class Status(commands.Cog):
+    def __init__(self, bot):
+        self.bot = bot
+        # shard_id -> {"state", "since", "disconnects"}
+        self.shard_events = {}
+
+    # ---------------------------------------------------------
+    # 🧩 分片事件 (只有 AutoShardedBot 會觸發)
+    # ---------------------------------------------------------
+    def record_shard(self, shard_id: int, state: str):
+        event = self.shard_events.setdefault(shard_id, {"state": state, "since": datetime.now(), "disconnects": 0})
+        if state == "disconnected":
+            event["disconnects"] += 1
+        event["state"] = state
+        event["since"] = datetime.now()
+
+    @commands.Cog.listener()
+    async def on_shard_ready(self, shard_id: int):
+        self.record_shard(shard_id, "ready")
+
+    @commands.Cog.listener()
+    async def on_shard_resumed(self, shard_id: int):
+        self.record_shard(shard_id, "ready")
+
+    @commands.Cog.listener()
+    async def on_shard_disconnect(self, shard_id: int):
+        self.record_shard(shard_id, "disconnected")
+        print(f"⚠️ 分片 {shard_id} 斷線")
+
+    @commands.Cog.listener()
+    async def on_app_command_completion(self, interaction: discord.Interaction, command):
+        metrics.record_command(interaction, "ok")
+
+    # ---------------------------------------------------------
+    # 📊 狀態整理 (之後的健康檢查端點也會用到)
+    # ---------------------------------------------------------
+    def shard_rows(self):
+        guild_counts = {}
+        for guild in self.bot.guilds:
+            guild_counts[guild.shard_id] = guild_counts.get(guild.shard_id, 0) + 1
+
+        shards = getattr(self.bot, "shards", None)
+        if shards is None:
+            # 沒有分片的 commands.Bot：整個程序就是 0 號分片
+            shard_ids = [0]
+        else:
+            # 還沒連上的分片不會出現在 bot.shards，用設定的 shard_ids 補上
+            shard_ids = sorted(set(self.bot.shard_ids or []) | set(shards))
+
+        rows = []
+        for shard_id in shard_ids:
+            if shards is None:
+                latency, closed = self.bot.latency, self.bot.is_closed()
+            elif shard_id in shards:
+                latency, closed = shards[shard_id].latency, shards[shard_id].is_closed()
+            else:
+                latency, closed = float("nan"), True
+            event = self.shard_events.get(shard_id, {})
+            rows.append({
+                "id": shard_id,
+                "healthy": not closed and math.isfinite(latency) and event.get("state") != "disconnected",
+                "latency_ms": latency * 1000 if math.isfinite(latency) else None,
+                "guilds": guild_counts.get(shard_id, 0),
+                "disconnects": event.get("disconnects", 0),
+                "since": event.get("since"),
+            })
+        return rows
+
+    @app_commands.command(name="shard_status", description="查看這個程序負責的分片健康狀態與延遲")
+    @app_commands.default_permissions(administrator=True)
+    async def shard_status(self, interaction: discord.Interaction):
+        rows = self.shard_rows()
+        healthy = sum(1 for row in rows if row["healthy"])
+        color = discord.Color.green() if healthy == len(rows) else discord.Color.orange()
+        embed = discord.Embed(
+            title=f"🧩 分片狀態 ({healthy} / {len(rows)} 正常)",
+            description=f"總分片數：**{self.bot.shard_count or 1}**，本程序伺服器數：**{len(self.bot.guilds)}**",
+            color=color
+        )
+
+        lines = []
+        for row in rows:
+            mark = "🟢" if row["healthy"] else "🔴"
+            latency = f"{row['latency_ms']:.0f} ms" if row["latency_ms"] is not None else "—"
+            line = f"{mark} **#{row['id']}** · {latency} · {row['guilds']} 個伺服器"
+            if row["disconnects"]:
+                line += f" · 斷線 {row['disconnects']} 次"
+            if row["since"]:
+                line += f" · 狀態自 <t:{int(row['since'].timestamp())}:R>"
+            if interaction.guild and interaction.guild.shard_id == row["id"]:
+                line += " ← 目前伺服器"
+            lines.append(line)
+        embed.add_field(name="分片", value="\n".join(lines)[:1024], inline=False)
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+
+    @app_commands.command(name="bot_stats", description="查看指令延遲、資料庫時間與快取命中率")
+    @app_commands.default_permissions(administrator=True)
+    async def show_bot_stats(self, interaction: discord.Interaction):
+        registry = metrics.registry
+        if not registry.enabled:
+            await interaction.response.send_message("📉 效能量測已關閉 (METRICS_ENABLED=0)。", ephemeral=True)
+            return
+
+        embed = discord.Embed(title="📈 效能指標", color=discord.Color.blurple())
+        embed.add_field(name="⌨️ 指令 (次數 · 平均 · p95)", value=summarize(registry.histograms["discord_command_seconds"], "command"), inline=False)
+        embed.add_field(name="⏱️ 收到到 defer", value=summarize(registry.histograms["discord_defer_seconds"], "command"), inline=False)
+        embed.add_field(name="🗄️ 資料庫查詢", value=summarize(registry.histograms["db_query_seconds"], "op"), inline=False)
+        embed.add_field(name="🚥 連線池排隊", value=summarize(registry.histograms["db_pool_wait_seconds"], None), inline=False)
+
+        gauges = []
+        for name, kind, _, values in registry.collect():
+            if name.endswith("_ratio"):
+                gauges.append(f"`{name}` **{values[0][1]:.1%}**")
+            elif kind == "gauge":
+                gauges.append(f"`{name}` **{values[0][1]:g}**")
+        if gauges:
+            embed.add_field(name="🧮 快取 / 狀態", value="\n".join(gauges)[:1024], inline=False)
+        await interaction.response.send_message(embed=embed, ephemeral=True)
+
+
+def summarize(histogram, label: str, limit: int = 8) -> str:
+    # 依次數排序，只列最常用的幾個
+    rows = sorted(histogram.series.items(), key=lambda item: item[1][2], reverse=True)
+    lines = []
+    for labels, (_, total, count) in rows[:limit]:
+        name = dict(labels).get(label, "全部") if label else "全部"
+        if dict(labels).get("status") == "error":
+            name += " (錯誤)"
+        p95 = histogram.quantile(labels, 0.95)
+        p95_text = f"≤{p95 * 1000:.0f} ms" if p95 != float("inf") else f">{histogram.buckets[-1]:g} s"
+        lines.append(f"`{name}` · {count} · {total / count * 1000:.0f} ms · {p95_text}")
+    return "\n".join(lines)[:1024] if lines else "(還沒有資料)"
+
+
+async def setup(bot):
+    await bot.add_cog(Status(bot))
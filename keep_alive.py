@@ -1,15 +1,129 @@
-from flask import Flask
-from threading import Thread
+# keep_alive.py (保持運作 + 健康檢查：aiohttp 伺服器直接跑在 bot 的 event loop 上，不另開執行緒)
+import asyncio
+import math
+import os
+import time
 
-app = Flask('')
+from aiohttp import web
 
-@app.route('/')
-def main():
-    return '<h1>Bot is awake</h1>'
+from utils.metrics import registry
 
-def run():
-    app.run(host="0.0.0.0", port=8080, debug=True, use_reloader=False)
+METRICS_CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+STARTED_AT = time.monotonic()
 
-def keep_alive():
-    server = Thread(target=run)
-    server.start()
\ No newline at end of file
+
+class LoopLagMonitor:
+    # 每隔一段時間 sleep 一次，醒來晚了多少 = event loop 被卡住多久
+    def __init__(self, interval: float = 1.0, warn_ms: float = 250.0):
+        self.interval = interval
+        # 延遲超過這個值 (毫秒) 就回報 degraded
+        self.warn_ms = warn_ms
+        self.lag = 0.0
+        self.max_lag = 0.0
+        self._task = None
+
+    def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            start = loop.time()
+            await asyncio.sleep(self.interval)
+            self.lag = max(0.0, loop.time() - start - self.interval)
+            self.max_lag = max(self.max_lag, self.lag)
+
+
+# ---------------------------------------------------------
+# 🩺 健康狀態
+# ---------------------------------------------------------
+def health_report(bot, monitor: LoopLagMonitor):
+    status_cog = bot.get_cog("Status")
+    shards = status_cog.shard_rows() if status_cog else []
+    for row in shards:
+        row.pop("since", None)
+
+    exam_cog = bot.get_cog("Exam")
+    db = exam_cog.storage.stats() if exam_cog else None
+
+    latency = bot.latency
+    lag_ms = monitor.lag * 1000
+    ready = bot.is_ready() and not bot.is_closed()
+    problems = []
+    if not ready:
+        problems.append("not_ready")
+    if any(not row["healthy"] for row in shards):
+        problems.append("shard_down")
+    # 超過 1 代表有查詢在排隊等連線 (SQLite 只有一個連線，剛好 1 是正常的)
+    if db and db["saturation"] > 1:
+        problems.append("db_saturated")
+    if lag_ms >= monitor.warn_ms:
+        problems.append("loop_lag")
+
+    return {
+        "status": "ok" if not problems else "degraded",
+        "problems": problems,
+        "ready": ready,
+        "uptime_s": round(time.monotonic() - STARTED_AT, 1),
+        "latency_ms": round(latency * 1000, 1) if math.isfinite(latency) else None,
+        "guilds": len(bot.guilds),
+        "shards": shards,
+        "db": db,
+        "loop_lag_ms": round(lag_ms, 1),
+        "loop_lag_max_ms": round(monitor.max_lag * 1000, 1),
+    }
+
+
+# ---------------------------------------------------------
+# 🌐 路由
+# ---------------------------------------------------------
+async def index(request):
+    # 給外部 ping 服務用，只要程序活著就回 200
+    return web.Response(text="Bot is awake")
+
+async def health(request):
+    report = health_report(request.app["bot"], request.app["monitor"])
+    # 還沒連上 / 分片斷線回 503，讓監控服務判斷要不要重啟
+    status = 503 if "not_ready" in report["problems"] or "shard_down" in report["problems"] else 200
+    return web.json_response(report, status=status)
+
+async def prometheus_metrics(request):
+    return web.Response(body=registry.render().encode(), headers={"Content-Type": METRICS_CONTENT_TYPE})
+
+
+async def keep_alive(bot):
+    # 回傳 runner，關機時要 await runner.cleanup()
+    # 環境變數在這裡才讀 (匯入 keep_alive 時 .env 可能還沒載入)
+    monitor = LoopLagMonitor(
+        float(os.getenv("LOOP_LAG_INTERVAL", "1")),
+        float(os.getenv("LOOP_LAG_WARN_MS", "250")),
+    )
+    monitor.start()
+    registry.register_collector("event_loop", lambda: [
+        ("event_loop_lag_seconds", "gauge", "event loop 最近一次量到的延遲", [({}, monitor.lag)]),
+        ("event_loop_lag_max_seconds", "gauge", "event loop 啟動以來最大的延遲", [({}, monitor.max_lag)]),
+    ])
+
+    app = web.Application()
+    app["bot"] = bot
+    app["monitor"] = monitor
+    app.router.add_get("/", index)
+    app.router.add_get("/health", health)
+    app.router.add_get("/metrics", prometheus_metrics)
+
+    async def stop_monitor(app):
+        registry.unregister_collector("event_loop")
+        await monitor.stop()
+    app.on_cleanup.append(stop_monitor)
+
+    runner = web.AppRunner(app, access_log=None)
+    await runner.setup()
+    # 同一台機器跑多個分片程序時，每個程序要用不同的 PORT
+    await web.TCPSite(runner, "0.0.0.0", int(os.getenv("PORT", "8080"))).start()
+    return runner
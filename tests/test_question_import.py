@@ -0,0 +1,95 @@
+# test_question_import.py (分段解析 JSON / JSON Lines：用很小的 chunk_size 測試被切斷的情況)
+
+import json
+import os
+import sys
+import tempfile
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.question_import import iter_json_records
+
+RECORDS = [
+    {"question": "1 + 1 = ?", "option1": "1", "option2": "2", "option3": "3", "option4": "4", "answer": 2},
+    {"question": "中文題目，含\"引號\"與 [括號]", "option1": "甲", "option2": "乙", "option3": "丙", "option4": "丁", "answer": 4},
+    {"question": "q3", "option1": "a", "option2": "b", "option3": "c", "option4": "d", "answer": "1"},
+]
+
+CHUNK_SIZES = (1, 2, 3, 5, 8, 64 * 1024)
+
+
+class IterJsonRecordsTest(unittest.TestCase):
+    def setUp(self):
+        self.paths = []
+
+    def tearDown(self):
+        for path in self.paths:
+            os.remove(path)
+
+    def write(self, text: str) -> str:
+        fd, path = tempfile.mkstemp(suffix=".json")
+        with os.fdopen(fd, "w", encoding="utf-8") as f:
+            f.write(text)
+        self.paths.append(path)
+        return path
+
+    def parse(self, text: str, chunk_size: int):
+        return list(iter_json_records(self.write(text), chunk_size=chunk_size))
+
+    def test_array(self):
+        text = json.dumps(RECORDS, ensure_ascii=False, indent=2)
+        for chunk_size in CHUNK_SIZES:
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(self.parse(text, chunk_size), RECORDS)
+
+    def test_compact_array(self):
+        text = json.dumps(RECORDS, ensure_ascii=False, separators=(",", ":"))
+        for chunk_size in CHUNK_SIZES:
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(self.parse(text, chunk_size), RECORDS)
+
+    def test_json_lines(self):
+        text = "\n".join(json.dumps(record, ensure_ascii=False) for record in RECORDS) + "\n\n"
+        for chunk_size in CHUNK_SIZES:
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(self.parse(text, chunk_size), RECORDS)
+
+    def test_empty(self):
+        for text in ("", "  \n", "[]", " [ \n ] \n"):
+            for chunk_size in CHUNK_SIZES:
+                with self.subTest(text=text, chunk_size=chunk_size):
+                    self.assertEqual(self.parse(text, chunk_size), [])
+
+    def test_scalars_split_across_chunks(self):
+        # 數字 / true 被切在兩段之間時不能拆成兩個值
+        for chunk_size in CHUNK_SIZES:
+            with self.subTest(chunk_size=chunk_size):
+                self.assertEqual(self.parse("12345\n678\ntrue", chunk_size), [12345, 678, True])
+                self.assertEqual(self.parse("[123456, 7, -0.5e10]", chunk_size), [123456, 7, -0.5e10])
+
+    def test_trailing_comma_rejected(self):
+        text = json.dumps(RECORDS[:1]).replace("}]", "},]")
+        for chunk_size in CHUNK_SIZES:
+            with self.subTest(chunk_size=chunk_size):
+                with self.assertRaises(ValueError):
+                    self.parse(text, chunk_size)
+
+    def test_malformed_array_rejected(self):
+        record = json.dumps(RECORDS[0])
+        for text in (f"[{record}", f"[{record},", f"[{record} {record}]", f"[,{record}]", f"[{record}] x", "[1,,2]"):
+            for chunk_size in CHUNK_SIZES:
+                with self.subTest(text=text, chunk_size=chunk_size):
+                    with self.assertRaises(ValueError):
+                        self.parse(text, chunk_size)
+
+    def test_truncated_json_lines_rejected(self):
+        text = json.dumps(RECORDS[0]) + "\n" + json.dumps(RECORDS[1])[:-3]
+        for chunk_size in CHUNK_SIZES:
+            with self.subTest(chunk_size=chunk_size):
+                with self.assertRaises(ValueError):
+                    self.parse(text, chunk_size)
+
+
+if __name__ == "__main__":
+    unittest.main()
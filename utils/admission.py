@@ -0,0 +1,120 @@
+# admission.py (開考流量控制：同時開考的數量有上限，超過的依序排隊，隊伍滿了直接拒絕)
+
+import asyncio
+import math
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+
+EXAM_START_CONCURRENCY = int(os.getenv("EXAM_START_CONCURRENCY", "10"))
+EXAM_START_QUEUE = int(os.getenv("EXAM_START_QUEUE", "200"))
+EXAM_START_MAX_WAIT = float(os.getenv("EXAM_START_MAX_WAIT", "120"))
+
+
+class AdmissionRejected(Exception):
+    # reason: "full" (隊伍滿了) / "timeout" (等太久)
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class AdmissionController:
+    def __init__(self, max_concurrent: int = EXAM_START_CONCURRENCY, max_queue: int = EXAM_START_QUEUE, max_wait: float = EXAM_START_MAX_WAIT):
+        self.max_concurrent = max_concurrent
+        self.max_queue = max_queue
+        self.max_wait = max_wait
+        self._active = 0
+        # 排隊中的 future，先來先放行
+        self._waiters = deque()
+        self.admitted = 0
+        self.queued = 0
+        self.rejected = 0
+        self.timed_out = 0
+        self.max_depth = 0
+        # 真的排過隊才放行的人數 / 總等待時間
+        self.waited = 0
+        self.total_wait = 0.0
+        self.max_wait_seen = 0.0
+        # 每次開考花的時間 (指數移動平均)，用來估計排隊要等多久
+        self.avg_service = 0.5
+
+    def expected_wait(self, position: int) -> float:
+        return math.ceil(position / self.max_concurrent) * self.avg_service
+
+    @asynccontextmanager
+    async def slot(self, on_wait=None):
+        # on_wait: async (排第幾位, 預計等待秒數)，只有真的要排隊時才會呼叫
+        await self.acquire(on_wait)
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.avg_service = self.avg_service * 0.8 + (time.monotonic() - start) * 0.2
+            self.release()
+
+    async def acquire(self, on_wait=None):
+        if self._active < self.max_concurrent and not self._waiters:
+            self._active += 1
+            self.admitted += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            self.rejected += 1
+            raise AdmissionRejected("full")
+
+        future = asyncio.get_running_loop().create_future()
+        self._waiters.append(future)
+        self.queued += 1
+        self.max_depth = max(self.max_depth, len(self._waiters))
+        start = time.monotonic()
+        try:
+            if on_wait:
+                position = len(self._waiters)
+                try:
+                    await on_wait(position, self.expected_wait(position))
+                except Exception as e:
+                    print(f"通知排隊位置失敗: {e}")
+            await asyncio.wait_for(asyncio.shield(future), timeout=max(0.0, self.max_wait - (time.monotonic() - start)))
+        except (asyncio.TimeoutError, asyncio.CancelledError) as e:
+            if future.done() and not future.cancelled():
+                # 剛好輪到又被取消：把名額讓給下一位
+                self.release()
+            else:
+                future.cancel()
+                if future in self._waiters:
+                    self._waiters.remove(future)
+            if isinstance(e, asyncio.TimeoutError):
+                self.timed_out += 1
+                raise AdmissionRejected("timeout")
+            raise
+
+        waited = time.monotonic() - start
+        self.admitted += 1
+        self.waited += 1
+        self.total_wait += waited
+        self.max_wait_seen = max(self.max_wait_seen, waited)
+
+    def release(self):
+        # 名額直接交給隊伍最前面的人，不先釋放 (避免被後來的插隊)
+        while self._waiters:
+            future = self._waiters.popleft()
+            if not future.done():
+                future.set_result(None)
+                return
+        self._active -= 1
+
+    def stats(self):
+        return {
+            "active": self._active,
+            "max_concurrent": self.max_concurrent,
+            "queue_depth": len(self._waiters),
+            "max_queue": self.max_queue,
+            "max_depth": self.max_depth,
+            "admitted": self.admitted,
+            "queued": self.queued,
+            "rejected": self.rejected,
+            "timed_out": self.timed_out,
+            "avg_wait": self.total_wait / self.waited if self.waited else 0.0,
+            "max_wait": self.max_wait_seen,
+            "avg_service": self.avg_service,
+        }
@@ -0,0 +1,103 @@
+# analytics.py (考試統計：作答 / 結果先在記憶體累加，背景定期以批次 upsert 併進統計表)
+#
+# 每題：作答次數、答錯次數 → question_stats
+# 每天：開考、通過、答錯結束的場數 → exam_daily_stats (另外累加到 exam_totals)
+# /exam_stats 只讀這幾張已經算好的表，不管累積多少紀錄查詢量都一樣。
+
+import asyncio
+import os
+from datetime import date
+
+ANALYTICS_FLUSH_INTERVAL = float(os.getenv("ANALYTICS_FLUSH_INTERVAL", "30"))
+
+
+class ExamAnalytics:
+    def __init__(self, storage, flush_interval: float = ANALYTICS_FLUSH_INTERVAL):
+        self.storage = storage
+        self.flush_interval = flush_interval
+        # (guild_id, question_id) -> [作答, 答錯]
+        self._questions = {}
+        # (guild_id, 日期) -> [開考, 通過, 失敗]
+        self._daily = {}
+        self._task = None
+        self.flushed_rows = 0
+        self._lock = asyncio.Lock()
+
+    # ---------------------------------------------------------
+    # 🔌 生命週期
+    # ---------------------------------------------------------
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        # 關機前把剩下的寫回去
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"考試統計寫回失敗: {e}")
+
+    # ---------------------------------------------------------
+    # ✏️ 記錄 (純記憶體，不碰資料庫)
+    # ---------------------------------------------------------
+    def record_start(self, guild_id: int):
+        self._day(guild_id)[0] += 1
+
+    def record_answer(self, guild_id: int, question_id: int, correct: bool):
+        counts = self._questions.get((guild_id, question_id))
+        if counts is None:
+            counts = self._questions[(guild_id, question_id)] = [0, 0]
+        counts[0] += 1
+        if not correct:
+            counts[1] += 1
+
+    def record_result(self, guild_id: int, passed: bool):
+        self._day(guild_id)[1 if passed else 2] += 1
+
+    def _day(self, guild_id: int):
+        key = (guild_id, date.today())
+        counts = self._daily.get(key)
+        if counts is None:
+            counts = self._daily[key] = [0, 0, 0]
+        return counts
+
+    # ---------------------------------------------------------
+    # 💾 批次寫回
+    # ---------------------------------------------------------
+    async def flush(self):
+        # /exam_stats 也會先 flush，用鎖避免同一批被寫兩次
+        async with self._lock:
+            if not self._questions and not self._daily:
+                return
+            questions, self._questions = self._questions, {}
+            daily, self._daily = self._daily, {}
+            question_rows = [(*key, *counts) for key, counts in questions.items()]
+            daily_rows = [(*key, *counts) for key, counts in daily.items()]
+            try:
+                await self.storage.save_analytics(question_rows, daily_rows)
+            except Exception:
+                # 寫失敗就把增量加回去，下個週期再試
+                for key, counts in questions.items():
+                    merged = self._questions.setdefault(key, [0, 0])
+                    for i, value in enumerate(counts):
+                        merged[i] += value
+                for key, counts in daily.items():
+                    merged = self._daily.setdefault(key, [0, 0, 0])
+                    for i, value in enumerate(counts):
+                        merged[i] += value
+                raise
+            self.flushed_rows += len(question_rows) + len(daily_rows)
+
+    def stats(self):
+        return {
+            "pending_rows": len(self._questions) + len(self._daily),
+            "flushed_rows": self.flushed_rows,
+        }
@@ -0,0 +1,108 @@
+# cooldowns.py (考試冷卻：記憶體為準，背景批次寫回資料庫並定期清掉過期資料；以 (guild_id, user_id) 為鍵)
+
+import asyncio
+import os
+from datetime import datetime
+
+COOLDOWN_FLUSH_INTERVAL = float(os.getenv("COOLDOWN_FLUSH_INTERVAL", "5"))
+COOLDOWN_PRUNE_INTERVAL = float(os.getenv("COOLDOWN_PRUNE_INTERVAL", "3600"))
+
+
+class CooldownStore:
+    def __init__(self, storage, flush_interval: float = COOLDOWN_FLUSH_INTERVAL, prune_interval: float = COOLDOWN_PRUNE_INTERVAL):
+        self.storage = storage
+        self.flush_interval = flush_interval
+        self.prune_interval = prune_interval
+        self._until = {}
+        # 還沒寫回資料庫的 (guild_id, user_id)；同一人在一個週期內改幾次都只寫一次
+        self._dirty = set()
+        self._tasks = []
+        self.flushed_rows = 0
+        self.pruned_rows = 0
+
+    def __len__(self):
+        return len(self._until)
+
+    # ---------------------------------------------------------
+    # 🔌 生命週期
+    # ---------------------------------------------------------
+    async def start(self, shard_ids=None, shard_count: int = None):
+        # 分片拆在多個程序時，只載入自己分片的伺服器
+        rows = await self.storage.load_cooldowns(datetime.now(), shard_ids, shard_count)
+        self._until = {(guild_id, user_id): until for guild_id, user_id, until in rows}
+        self._tasks = [
+            asyncio.create_task(self._every(self.flush_interval, self.flush)),
+            asyncio.create_task(self._every(self.prune_interval, self.prune)),
+        ]
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+        # 關機前把剩下的寫回去
+        await self.flush()
+
+    async def _every(self, seconds: float, job):
+        while True:
+            await asyncio.sleep(seconds)
+            try:
+                await job()
+            except Exception as e:
+                print(f"冷卻背景工作失敗: {e}")
+
+    # ---------------------------------------------------------
+    # ⏳ 查詢 / 設定 (純記憶體，不碰資料庫)
+    # ---------------------------------------------------------
+    def remaining_seconds(self, guild_id: int, user_id: int) -> float:
+        until = self._until.get((guild_id, user_id))
+        if until is None:
+            return 0
+        return max(0, (until - datetime.now()).total_seconds())
+
+    def set(self, guild_id: int, user_id: int, until: datetime):
+        key = (guild_id, user_id)
+        self._until[key] = until
+        self._dirty.add(key)
+
+    def move_guild(self, old_guild_id: int, new_guild_id: int):
+        # 舊資料被認領後，資料庫已經改好，這裡只把記憶體的鍵換掉
+        for key in [key for key in self._until if key[0] == old_guild_id]:
+            new_key = (new_guild_id, key[1])
+            self._until.setdefault(new_key, self._until.pop(key))
+            if key in self._dirty:
+                self._dirty.discard(key)
+                self._dirty.add(new_key)
+
+    # ---------------------------------------------------------
+    # 💾 批次寫回 / 清除過期
+    # ---------------------------------------------------------
+    async def flush(self):
+        if not self._dirty:
+            return
+        dirty, self._dirty = self._dirty, set()
+        rows = [(*key, self._until[key]) for key in dirty if key in self._until]
+        if not rows:
+            return
+
+        try:
+            await self.storage.save_cooldowns(rows)
+        except Exception:
+            # 寫失敗就放回去，下個週期再試
+            self._dirty |= dirty
+            raise
+        self.flushed_rows += len(rows)
+
+    async def prune(self):
+        now = datetime.now()
+        for key in [key for key, until in self._until.items() if until <= now and key not in self._dirty]:
+            del self._until[key]
+        self.pruned_rows += await self.storage.prune_cooldowns(now)
+
+    def stats(self):
+        return {
+            "active": len(self._until),
+            "pending_writes": len(self._dirty),
+            "flushed_rows": self.flushed_rows,
+            "pruned_rows": self.pruned_rows,
+        }
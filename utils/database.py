@@ -0,0 +1,193 @@
+# database.py (共用連線池：所有 SQL 都丟到執行緒池跑，不卡住 event loop；Postgres 與 SQLite 兩種)
+
+import asyncio
+import os
+import sqlite3
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from utils.metrics import registry as metrics
+
+DB_POOL_MIN_SIZE = int(os.getenv("DB_POOL_MIN_SIZE", "1"))
+DB_POOL_MAX_SIZE = int(os.getenv("DB_POOL_MAX_SIZE", "10"))
+
+
+class DatabasePool:
+    def __init__(self, dsn: str, min_size: int = DB_POOL_MIN_SIZE, max_size: int = DB_POOL_MAX_SIZE):
+        self.dsn = dsn
+        self.min_size = max(0, min_size)
+        self.max_size = max(1, max_size, self.min_size)
+        self._pool = None
+        # 借出過的連線的後端 pid，用來辨認 NOTIFY 是不是自己發出的
+        self.backend_pids = set()
+        # 每條 worker 執行緒同時最多只借一條連線，所以連線池永遠不會被借光
+        self._executor = None
+        # 已送出還沒完成的查詢數 (含排隊中)，超過 max_size 就代表在排隊
+        self.in_flight = 0
+        # 代表連線已斷的例外類型，open() 時才從 psycopg2 取得
+        self._connection_errors = ()
+
+    @property
+    def is_open(self) -> bool:
+        return self._pool is not None
+
+    # ---------------------------------------------------------
+    # 🔌 生命週期：Cog 載入時開啟、卸載時關閉
+    # ---------------------------------------------------------
+    async def open(self):
+        if self._pool is not None:
+            return
+        # psycopg2 只有 Postgres 用得到，SQLite 後端不需要安裝
+        import psycopg2
+        from psycopg2.pool import ThreadedConnectionPool
+
+        self._connection_errors = (psycopg2.OperationalError, psycopg2.InterfaceError)
+        self._executor = ThreadPoolExecutor(max_workers=self.max_size, thread_name_prefix="db")
+        loop = asyncio.get_running_loop()
+        self._pool = await loop.run_in_executor(
+            self._executor, ThreadedConnectionPool, self.min_size, self.max_size, self.dsn
+        )
+
+    async def close(self):
+        if self._pool is None:
+            return
+        pool, self._pool = self._pool, None
+        executor, self._executor = self._executor, None
+        loop = asyncio.get_running_loop()
+        # 等正在跑的查詢結束後再關掉全部連線
+        await loop.run_in_executor(None, executor.shutdown, True)
+        await loop.run_in_executor(None, pool.closeall)
+
+    # ---------------------------------------------------------
+    # 🧵 借連線執行：func(cur, *args) 在 worker 執行緒內跑完並 commit
+    # ---------------------------------------------------------
+    async def run(self, func, *args):
+        # 指標標籤用函式名稱，例如 fetch_all_questions、CooldownStore.flush.work
+        return await self._run(func.__qualname__.replace(".<locals>", ""), func, args)
+
+    async def _run(self, label: str, func, args):
+        if self._pool is None:
+            raise RuntimeError("資料庫連線池尚未開啟")
+        loop = asyncio.get_running_loop()
+        # [開始執行, 執行完] 由 worker 執行緒填，回到 event loop 後才記錄指標
+        timings = [0.0, 0.0]
+        queued_at = time.perf_counter()
+        self.in_flight += 1
+        try:
+            return await loop.run_in_executor(self._executor, self._run_sync, func, args, timings)
+        finally:
+            self.in_flight -= 1
+            if timings[1]:
+                metrics.observe("db_pool_wait_seconds", timings[0] - queued_at)
+                metrics.observe("db_query_seconds", timings[1] - timings[0], op=label)
+
+    def _run_sync(self, func, args, timings):
+        timings[0] = time.perf_counter()
+        conn = self._pool.getconn()
+        self.backend_pids.add(conn.info.backend_pid)
+        broken = False
+        try:
+            with conn.cursor() as cur:
+                result = func(cur, *args)
+            conn.commit()
+            return result
+        except self._connection_errors:
+            # 連線已斷 (例如被雲端資料庫閒置踢掉)，丟掉它讓下次重新連線
+            broken = True
+            raise
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            self._pool.putconn(conn, close=broken or conn.closed != 0)
+            timings[1] = time.perf_counter()
+
+    # ---------------------------------------------------------
+    # 🛠️ 常用的單一查詢捷徑
+    # ---------------------------------------------------------
+    async def execute(self, query: str, params=None) -> int:
+        def work(cur):
+            cur.execute(query, params)
+            return cur.rowcount
+        return await self._run(query_label(query), work, ())
+
+    async def fetchone(self, query: str, params=None):
+        def work(cur):
+            cur.execute(query, params)
+            return cur.fetchone()
+        return await self._run(query_label(query), work, ())
+
+    async def fetchall(self, query: str, params=None):
+        def work(cur):
+            cur.execute(query, params)
+            return cur.fetchall()
+        return await self._run(query_label(query), work, ())
+
+    def stats(self):
+        return {
+            "max_size": self.max_size,
+            "in_flight": self.in_flight,
+            "saturation": self.in_flight / self.max_size,
+        }
+
+
+def query_label(query: str) -> str:
+    # 指標只用 SQL 的第一個關鍵字分類 (SELECT / INSERT / ...)，避免標籤種類爆炸
+    parts = query.split(None, 1)
+    return parts[0].upper() if parts else "-"
+
+
+# ---------------------------------------------------------
+# 🪶 SQLite：單一檔案、WAL 模式，查詢在專用的一條執行緒上跑
+# ---------------------------------------------------------
+SQLITE_STATEMENT_CACHE = int(os.getenv("SQLITE_STATEMENT_CACHE", "256"))
+
+
+class SqlitePool(DatabasePool):
+    # 介面和 DatabasePool 相同 (run / execute / fetchone / fetchall / stats)，SQL 參數用 ?
+    def __init__(self, path: str, statement_cache: int = SQLITE_STATEMENT_CACHE):
+        super().__init__(path, min_size=1, max_size=1)
+        self.path = path
+        self.statement_cache = statement_cache
+
+    async def open(self):
+        if self._pool is not None:
+            return
+        # 一個連線只在一條執行緒上用，寫入本來就只能一個一個來
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="sqlite")
+        loop = asyncio.get_running_loop()
+        self._pool = await loop.run_in_executor(self._executor, self._connect)
+
+    def _connect(self):
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        # cached_statements：同一段 SQL 文字只編譯一次，之後重複使用 prepared statement
+        conn = sqlite3.connect(self.path, check_same_thread=False, cached_statements=self.statement_cache)
+        conn.execute("PRAGMA journal_mode = WAL;")
+        conn.execute("PRAGMA synchronous = NORMAL;")
+        conn.execute("PRAGMA busy_timeout = 5000;")
+        return conn
+
+    async def close(self):
+        if self._pool is None:
+            return
+        conn, self._pool = self._pool, None
+        executor, self._executor = self._executor, None
+        loop = asyncio.get_running_loop()
+        await loop.run_in_executor(executor, conn.close)
+        await loop.run_in_executor(None, executor.shutdown, True)
+
+    def _run_sync(self, func, args, timings):
+        timings[0] = time.perf_counter()
+        conn = self._pool
+        cur = conn.cursor()
+        try:
+            result = func(cur, *args)
+            conn.commit()
+            return result
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            cur.close()
+            timings[1] = time.perf_counter()
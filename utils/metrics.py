@@ -0,0 +1,153 @@
+# metrics.py (效能量測：指令延遲、defer 前花的時間、資料庫查詢時間、快取命中率；輸出成 Prometheus 文字格式)
+# 全部只在 event loop 執行緒上更新，所以不用鎖；一次記錄 = 一次 bisect + 幾個加法
+
+import os
+import time
+from bisect import bisect_left
+
+import discord
+from discord import app_commands
+
+METRICS_ENABLED = os.getenv("METRICS_ENABLED", "1") != "0"
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+
+def _format_labels(labels, extra: str = "") -> str:
+    parts = ['%s="%s"' % (key, str(value).replace("\\", "\\\\").replace('"', '\\"')) for key, value in labels]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Histogram:
+    __slots__ = ("name", "help", "buckets", "series")
+
+    def __init__(self, name: str, help: str, buckets=DEFAULT_BUCKETS):
+        self.name = name
+        self.help = help
+        self.buckets = tuple(buckets)
+        # labels (tuple of (key, value)) -> [各區間次數 (不累加), 總和, 次數]
+        self.series = {}
+
+    def observe(self, value: float, labels=()):
+        series = self.series.get(labels)
+        if series is None:
+            series = self.series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+        series[0][bisect_left(self.buckets, value)] += 1
+        series[1] += value
+        series[2] += 1
+
+    def quantile(self, labels, q: float) -> float:
+        # 用區間上緣估計，/bot_stats 看個大概就夠了
+        counts, _, total = self.series[labels]
+        target = q * total
+        seen = 0
+        for i, count in enumerate(counts):
+            seen += count
+            if seen >= target and count:
+                return self.buckets[i] if i < len(self.buckets) else float("inf")
+        return 0.0
+
+    def render(self, lines):
+        lines.append(f"# HELP {self.name} {self.help}")
+        lines.append(f"# TYPE {self.name} histogram")
+        for labels, (counts, total, count) in self.series.items():
+            cumulative = 0
+            for bound, bucket_count in zip(self.buckets, counts):
+                cumulative += bucket_count
+                bucket_labels = _format_labels(labels, 'le="%s"' % bound)
+                lines.append(f"{self.name}_bucket{bucket_labels} {cumulative}")
+            bucket_labels = _format_labels(labels, 'le="+Inf"')
+            plain_labels = _format_labels(labels)
+            lines.append(f"{self.name}_bucket{bucket_labels} {count}")
+            lines.append(f"{self.name}_sum{plain_labels} {total}")
+            lines.append(f"{self.name}_count{plain_labels} {count}")
+
+
+class Metrics:
+    def __init__(self, enabled: bool = METRICS_ENABLED):
+        self.enabled = enabled
+        self.histograms = {}
+        # name -> fn()，回傳 [(指標名稱, 類型, 說明, [(labels dict, 數值), ...])]
+        self._collectors = {}
+
+    def histogram(self, name: str, help: str, buckets=DEFAULT_BUCKETS) -> Histogram:
+        histogram = self.histograms.get(name)
+        if histogram is None:
+            histogram = self.histograms[name] = Histogram(name, help, buckets)
+        return histogram
+
+    def observe(self, name: str, value: float, **labels):
+        if not self.enabled:
+            return
+        histogram = self.histograms.get(name)
+        if histogram is not None:
+            histogram.observe(value, tuple(labels.items()))
+
+    def register_collector(self, name: str, fn):
+        self._collectors[name] = fn
+
+    def unregister_collector(self, name: str):
+        self._collectors.pop(name, None)
+
+    def collect(self):
+        samples = []
+        for name, fn in list(self._collectors.items()):
+            try:
+                samples.extend(fn())
+            except Exception as e:
+                print(f"收集指標 {name} 失敗: {e}")
+        return samples
+
+    def render(self) -> str:
+        lines = []
+        for histogram in self.histograms.values():
+            histogram.render(lines)
+        for name, kind, help, values in self.collect():
+            lines.append(f"# HELP {name} {help}")
+            lines.append(f"# TYPE {name} {kind}")
+            for labels, value in values:
+                lines.append(f"{name}{_format_labels(labels.items())} {value}")
+        return "\n".join(lines) + "\n"
+
+
+registry = Metrics()
+registry.histogram("discord_interaction_delivery_seconds", "Discord 建立互動到機器人收到的時間")
+registry.histogram("discord_defer_seconds", "機器人收到互動到 defer 完成的時間")
+registry.histogram("discord_command_seconds", "斜線指令從收到到執行完的時間")
+registry.histogram("db_pool_wait_seconds", "查詢在連線池排隊等 worker 執行緒的時間")
+registry.histogram("db_query_seconds", "查詢在 worker 執行緒裡實際執行的時間")
+
+
+# ---------------------------------------------------------
+# 🧭 指令計時：CommandTree 收到互動時蓋上時間戳
+# ---------------------------------------------------------
+class InstrumentedTree(app_commands.CommandTree):
+    async def interaction_check(self, interaction: discord.Interaction) -> bool:
+        interaction.extras["received_at"] = time.perf_counter()
+        if registry.enabled:
+            delivery = (discord.utils.utcnow() - interaction.created_at).total_seconds()
+            registry.observe("discord_interaction_delivery_seconds", max(0.0, delivery))
+        return True
+
+    async def on_error(self, interaction: discord.Interaction, error: app_commands.AppCommandError):
+        record_command(interaction, "error")
+        await super().on_error(interaction, error)
+
+
+def command_name(interaction: discord.Interaction) -> str:
+    return interaction.command.qualified_name if interaction.command else "-"
+
+
+def record_command(interaction: discord.Interaction, status: str):
+    start = interaction.extras.get("received_at")
+    if start is not None:
+        registry.observe("discord_command_seconds", time.perf_counter() - start, command=command_name(interaction), status=status)
+
+
+async def defer(interaction: discord.Interaction, **kwargs):
+    # 取代 interaction.response.defer，順便記錄收到互動到 defer 完成花了多久
+    await interaction.response.defer(**kwargs)
+    start = interaction.extras.get("received_at")
+    if start is not None:
+        registry.observe("discord_defer_seconds", time.perf_counter() - start, command=command_name(interaction))
@@ -0,0 +1,290 @@
+# migrations.py (資料庫結構版本：依序執行還沒跑過的遷移，已經是最新就只查一次版本號)
+#
+# 新增遷移：在檔案最後加一個 @migration(下一個版本號, "說明") 的函式，已發布的遷移不要再修改。
+# 1 ~ 9 是原本每次啟動都會跑的 init_db 拆出來的，全部可以重複執行，舊資料庫升級時會直接通過並記錄版本。
+
+import os
+
+from utils import question_search
+from utils.question_bank import QUESTIONS_CHANNEL, backfill_content_hashes
+
+# 升級成多伺服器前的舊資料要歸給哪個伺服器；不設定的話，機器人只在一個伺服器時會自動認領
+LEGACY_GUILD_ID = int(os.getenv("LEGACY_GUILD_ID", "0"))
+
+# 多個分片程序同時啟動時，只讓一個跑遷移 (pg_advisory_lock 的 key)
+MIGRATION_LOCK_ID = 0x45584D31
+
+# [(版本號, 說明, func(cur))]，依版本號排序
+MIGRATIONS = []
+
+
+def migration(version: int, description: str):
+    def register(func):
+        if MIGRATIONS and MIGRATIONS[-1][0] >= version:
+            raise ValueError(f"遷移版本號必須遞增: {version}")
+        MIGRATIONS.append((version, description, func))
+        return func
+    return register
+
+
+def latest_version() -> int:
+    return MIGRATIONS[-1][0] if MIGRATIONS else 0
+
+
+def current_version(cur) -> int:
+    cur.execute("SELECT to_regclass('schema_version') IS NOT NULL")
+    if not cur.fetchone()[0]:
+        return 0
+    cur.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version")
+    return cur.fetchone()[0]
+
+
+def run_migrations(cur):
+    # 給 DatabasePool.run 用；回傳這次套用的 [(版本號, 說明)]
+    if current_version(cur) >= latest_version():
+        return []
+
+    conn = cur.connection
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS schema_version (
+            version INT PRIMARY KEY,
+            description TEXT NOT NULL,
+            applied_at TIMESTAMP NOT NULL DEFAULT NOW()
+        );
+    """)
+    conn.commit()
+
+    applied = []
+    cur.execute("SELECT pg_advisory_lock(%s)", (MIGRATION_LOCK_ID,))
+    try:
+        # 拿到鎖之後再看一次，可能別的程序已經跑完了
+        version = current_version(cur)
+        for number, description, func in MIGRATIONS:
+            if number <= version:
+                continue
+            # 每個遷移自己一個 transaction，失敗的話前面完成的不會被還原
+            func(cur)
+            cur.execute("INSERT INTO schema_version (version, description) VALUES (%s, %s)", (number, description))
+            conn.commit()
+            applied.append((number, description))
+    except Exception:
+        conn.rollback()
+        raise
+    finally:
+        cur.execute("SELECT pg_advisory_unlock(%s)", (MIGRATION_LOCK_ID,))
+        conn.commit()
+    return applied
+
+
+# ---------------------------------------------------------
+# 📜 遷移清單
+# ---------------------------------------------------------
+@migration(1, "建立 questions / exam_settings / user_cooldowns")
+def create_base_tables(cur):
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS questions (
+            id SERIAL PRIMARY KEY,
+            guild_id BIGINT NOT NULL,
+            question TEXT NOT NULL,
+            option1 TEXT NOT NULL,
+            option2 TEXT NOT NULL,
+            option3 TEXT NOT NULL,
+            option4 TEXT NOT NULL,
+            answer INTEGER NOT NULL
+        );
+    """)
+
+    # 設定表每個伺服器一列，第一次用到時才建立 (見 Exam.load_settings)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS exam_settings (
+            guild_id BIGINT PRIMARY KEY,
+            question_amount INT NOT NULL DEFAULT 5,
+            failure_cooldown_minutes INT NOT NULL DEFAULT 0,
+            exam_room_id BIGINT,
+            add_exam_room_id BIGINT,
+            manage_exam_role_id BIGINT,
+            graduater_role_id BIGINT
+        );
+    """)
+
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS user_cooldowns (
+            guild_id BIGINT NOT NULL,
+            user_id BIGINT NOT NULL,
+            cooldown_until TIMESTAMP,
+            PRIMARY KEY (guild_id, user_id)
+        );
+    """)
+
+
+@migration(2, "exam_settings 補上頻道 / 身分組 / 冷卻欄位")
+def add_settings_columns(cur):
+    new_columns = [
+        ("exam_room_id", "BIGINT"),
+        ("add_exam_room_id", "BIGINT"),
+        ("manage_exam_role_id", "BIGINT"),
+        ("graduater_role_id", "BIGINT"),
+        ("failure_cooldown_minutes", "INT NOT NULL DEFAULT 0")
+    ]
+    for col_name, col_type in new_columns:
+        cur.execute(f"ALTER TABLE exam_settings ADD COLUMN IF NOT EXISTS {col_name} {col_type};")
+
+
+@migration(3, "題庫變更通知 trigger")
+def create_question_triggers(cur):
+    # 給 LISTEN 的記憶體題庫做增量更新
+    cur.execute(f"""
+        CREATE OR REPLACE FUNCTION notify_questions_changed() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'TRUNCATE' THEN
+                PERFORM pg_notify('{QUESTIONS_CHANNEL}', json_build_object('op', TG_OP)::text);
+            ELSIF TG_OP = 'DELETE' THEN
+                PERFORM pg_notify('{QUESTIONS_CHANNEL}', json_build_object('op', TG_OP, 'id', OLD.id, 'guild_id', OLD.guild_id)::text);
+            ELSE
+                PERFORM pg_notify('{QUESTIONS_CHANNEL}', json_build_object('op', TG_OP, 'id', NEW.id, 'guild_id', NEW.guild_id)::text);
+            END IF;
+            RETURN NULL;
+        END;
+        $$ LANGUAGE plpgsql;
+    """)
+    cur.execute("DROP TRIGGER IF EXISTS questions_changed ON questions;")
+    cur.execute("""
+        CREATE TRIGGER questions_changed AFTER INSERT OR UPDATE OR DELETE ON questions
+        FOR EACH ROW EXECUTE FUNCTION notify_questions_changed();
+    """)
+    cur.execute("DROP TRIGGER IF EXISTS questions_truncated ON questions;")
+    cur.execute("""
+        CREATE TRIGGER questions_truncated AFTER TRUNCATE ON questions
+        FOR EACH STATEMENT EXECUTE FUNCTION notify_questions_changed();
+    """)
+
+
+@migration(4, "題庫搜尋用的 trigram 索引")
+def create_search_index(cur):
+    # 雲端資料庫不一定允許裝 extension，失敗就只用 ILIKE (啟動時由 trgm_available 判斷)
+    cur.execute("SAVEPOINT search_index;")
+    try:
+        cur.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm;")
+        cur.execute(f"""
+            CREATE INDEX IF NOT EXISTS questions_search_trgm
+            ON questions USING GIN ({question_search.SEARCH_DOCUMENT} gin_trgm_ops);
+        """)
+    except Exception as e:
+        print(f"⚠️ 無法建立 pg_trgm 搜尋索引，搜尋將使用 ILIKE: {e}")
+        cur.execute("ROLLBACK TO SAVEPOINT search_index;")
+    else:
+        cur.execute("RELEASE SAVEPOINT search_index;")
+
+
+@migration(5, "重複題目偵測：content_hash 欄位")
+def add_content_hash(cur):
+    # 唯一索引在第 6 版以伺服器為單位建立
+    cur.execute("ALTER TABLE questions ADD COLUMN IF NOT EXISTS content_hash TEXT;")
+
+
+@migration(6, "多伺服器：設定 / 題目 / 冷卻以 guild_id 區分")
+def scope_by_guild(cur):
+    # 舊資料歸給 LEGACY_GUILD_ID (未設定時先記為 0，之後由 Exam.claim_legacy_data 認領)
+    cur.execute("""
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'exam_settings' AND column_name = 'id';
+    """)
+    if cur.fetchone():
+        cur.execute("ALTER TABLE exam_settings ADD COLUMN IF NOT EXISTS guild_id BIGINT;")
+        cur.execute("UPDATE exam_settings SET guild_id = %s WHERE id = 1;", (LEGACY_GUILD_ID,))
+        cur.execute("DELETE FROM exam_settings WHERE guild_id IS NULL;")
+        cur.execute("ALTER TABLE exam_settings DROP CONSTRAINT IF EXISTS exam_settings_pkey;")
+        cur.execute("ALTER TABLE exam_settings DROP COLUMN id;")
+        cur.execute("ALTER TABLE exam_settings ADD PRIMARY KEY (guild_id);")
+
+    cur.execute(f"ALTER TABLE questions ADD COLUMN IF NOT EXISTS guild_id BIGINT NOT NULL DEFAULT {LEGACY_GUILD_ID};")
+    cur.execute("ALTER TABLE questions ALTER COLUMN guild_id DROP DEFAULT;")
+    cur.execute("CREATE INDEX IF NOT EXISTS questions_guild_id ON questions (guild_id, id);")
+    cur.execute("DROP INDEX IF EXISTS questions_content_hash;")
+    cur.execute("CREATE UNIQUE INDEX IF NOT EXISTS questions_guild_content_hash ON questions (guild_id, content_hash);")
+
+    cur.execute("""
+        SELECT 1 FROM information_schema.columns
+        WHERE table_name = 'user_cooldowns' AND column_name = 'guild_id';
+    """)
+    if not cur.fetchone():
+        cur.execute(f"ALTER TABLE user_cooldowns ADD COLUMN guild_id BIGINT NOT NULL DEFAULT {LEGACY_GUILD_ID};")
+        cur.execute("ALTER TABLE user_cooldowns ALTER COLUMN guild_id DROP DEFAULT;")
+        cur.execute("ALTER TABLE user_cooldowns DROP CONSTRAINT IF EXISTS user_cooldowns_pkey;")
+        cur.execute("ALTER TABLE user_cooldowns ADD PRIMARY KEY (guild_id, user_id);")
+
+
+@migration(7, "進行中的考試 exam_sessions (重啟後接著考)")
+def create_exam_sessions(cur):
+    # 每人每個伺服器一場
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS exam_sessions (
+            id BIGSERIAL PRIMARY KEY,
+            guild_id BIGINT NOT NULL,
+            user_id BIGINT NOT NULL,
+            question_ids BIGINT[] NOT NULL,
+            question_index INT NOT NULL DEFAULT 0,
+            correct_count INT NOT NULL DEFAULT 0,
+            updated_at TIMESTAMP NOT NULL DEFAULT NOW(),
+            UNIQUE (guild_id, user_id)
+        );
+    """)
+
+
+@migration(8, "身分組發放紀錄 role_grants")
+def create_role_grants(cur):
+    # 背景發放，失敗的留給管理員查看
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS role_grants (
+            id BIGSERIAL PRIMARY KEY,
+            guild_id BIGINT NOT NULL,
+            user_id BIGINT NOT NULL,
+            role_id BIGINT NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INT NOT NULL DEFAULT 0,
+            last_error TEXT,
+            created_at TIMESTAMP NOT NULL DEFAULT NOW(),
+            updated_at TIMESTAMP NOT NULL DEFAULT NOW()
+        );
+    """)
+    cur.execute("CREATE INDEX IF NOT EXISTS role_grants_guild_status ON role_grants (guild_id, status, id);")
+
+
+@migration(9, "替舊題目補上內容雜湊")
+def fill_content_hashes(cur):
+    # 同伺服器內重複的只有最早那題拿到；之後新增的題目在寫入時就會算好雜湊
+    filled, duplicates = backfill_content_hashes(cur)
+    if filled or duplicates:
+        print(f"🧮 已補上 {filled} 題的內容雜湊，另有 {duplicates} 題與既有題目重複 (可用 /find_duplicates 查看)")
+
+
+@migration(10, "考試統計彙總表 question_stats / exam_daily_stats / exam_totals")
+def create_analytics_tables(cur):
+    # 機器人在記憶體累加後批次 upsert，/exam_stats 只讀這些表
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS question_stats (
+            guild_id BIGINT NOT NULL,
+            question_id BIGINT NOT NULL,
+            attempts BIGINT NOT NULL DEFAULT 0,
+            failures BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (guild_id, question_id)
+        );
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS exam_daily_stats (
+            guild_id BIGINT NOT NULL,
+            day DATE NOT NULL,
+            started BIGINT NOT NULL DEFAULT 0,
+            passed BIGINT NOT NULL DEFAULT 0,
+            failed BIGINT NOT NULL DEFAULT 0,
+            PRIMARY KEY (guild_id, day)
+        );
+    """)
+    cur.execute("""
+        CREATE TABLE IF NOT EXISTS exam_totals (
+            guild_id BIGINT PRIMARY KEY,
+            started BIGINT NOT NULL DEFAULT 0,
+            passed BIGINT NOT NULL DEFAULT 0,
+            failed BIGINT NOT NULL DEFAULT 0
+        );
+    """)
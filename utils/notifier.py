@@ -0,0 +1,147 @@
+# notifier.py (考試失敗通知：先排隊，每隔一段時間合併成一則摘要送到管理頻道，被限速就退避)
+
+import asyncio
+import os
+from collections import deque
+
+import discord
+
+NOTIFY_DIGEST_WINDOW = float(os.getenv("NOTIFY_DIGEST_WINDOW", "10"))
+NOTIFY_DIGEST_BATCH = int(os.getenv("NOTIFY_DIGEST_BATCH", "20"))
+NOTIFY_MAX_PENDING = int(os.getenv("NOTIFY_MAX_PENDING", "1000"))
+NOTIFY_MAX_BACKOFF = 300.0
+
+
+class FailureNotifier:
+    def __init__(self, bot, window: float = NOTIFY_DIGEST_WINDOW, batch_size: int = NOTIFY_DIGEST_BATCH, max_pending: int = NOTIFY_MAX_PENDING):
+        self.bot = bot
+        self.window = window
+        self.batch_size = batch_size
+        self.max_pending = max_pending
+        # channel_id -> deque[(mention, 題目, 可重考時間戳 或 None)]
+        self._pending = {}
+        # channel_id -> 頻道物件，只在第一次用到時查詢
+        self._channels = {}
+        self._wake = asyncio.Event()
+        self._task = None
+        self._backoff = 0.0
+        self.sent_messages = 0
+        self.sent_failures = 0
+        self.dropped = 0
+        self.rate_limited = 0
+
+    # ---------------------------------------------------------
+    # 🔌 生命週期
+    # ---------------------------------------------------------
+    async def start(self):
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+        # 關機前把還沒送出的盡量送掉
+        try:
+            await self.flush()
+        except Exception as e:
+            print(f"關機前送出失敗通知失敗: {e}")
+
+    # ---------------------------------------------------------
+    # 📨 排隊 (作答流程只呼叫這個，不會等待)
+    # ---------------------------------------------------------
+    def enqueue(self, channel_id: int, mention: str, question_text: str, retry_at: int = None):
+        queue = self._pending.setdefault(channel_id, deque())
+        if len(queue) >= self.max_pending:
+            # 送不出去時不要無限堆積，丟掉最舊的
+            queue.popleft()
+            self.dropped += 1
+        queue.append((mention, question_text, retry_at))
+        if len(queue) >= self.batch_size:
+            self._wake.set()
+
+    # ---------------------------------------------------------
+    # 🚚 背景送出
+    # ---------------------------------------------------------
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=self.window)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            try:
+                await self.flush()
+            except Exception as e:
+                print(f"送出失敗通知時發生錯誤: {e}")
+            if self._backoff:
+                await asyncio.sleep(self._backoff)
+
+    async def flush(self):
+        for channel_id in list(self._pending):
+            queue = self._pending[channel_id]
+            while queue:
+                batch = [queue.popleft() for _ in range(min(self.batch_size, len(queue)))]
+                if not await self._send(channel_id, batch):
+                    # 被限速：放回隊伍最前面，等退避時間過了再送
+                    queue.extendleft(reversed(batch))
+                    return
+            del self._pending[channel_id]
+
+    async def _resolve_channel(self, channel_id: int):
+        channel = self._channels.get(channel_id)
+        if channel is None:
+            channel = self.bot.get_channel(channel_id) or await self.bot.fetch_channel(channel_id)
+            self._channels[channel_id] = channel
+        return channel
+
+    async def _send(self, channel_id: int, batch) -> bool:
+        try:
+            channel = await self._resolve_channel(channel_id)
+            await channel.send(embed=build_digest(batch))
+        except discord.RateLimited as e:
+            self._note_rate_limit(e.retry_after)
+            return False
+        except discord.HTTPException as e:
+            if e.status == 429:
+                self._note_rate_limit(None)
+                return False
+            # 頻道被刪 / 沒權限：這批丟掉，下次重新查頻道
+            self._channels.pop(channel_id, None)
+            self.dropped += len(batch)
+            print(f"無法傳送失敗訊息: {e}")
+            return True
+
+        self._backoff = 0.0
+        self.sent_messages += 1
+        self.sent_failures += len(batch)
+        return True
+
+    def _note_rate_limit(self, retry_after):
+        self.rate_limited += 1
+        backoff = min(NOTIFY_MAX_BACKOFF, max(self.window, self._backoff * 2))
+        self._backoff = max(backoff, retry_after or 0)
+
+    def stats(self):
+        return {
+            "pending": sum(len(queue) for queue in self._pending.values()),
+            "sent_messages": self.sent_messages,
+            "sent_failures": self.sent_failures,
+            "dropped": self.dropped,
+            "rate_limited": self.rate_limited,
+            "backoff": self._backoff,
+        }
+
+
+def build_digest(batch):
+    embed = discord.Embed(title=f"😥 考試失敗通知 ({len(batch)} 人)", color=discord.Color.red())
+    lines = []
+    for mention, question_text, retry_at in batch:
+        text = question_text if len(question_text) <= 100 else question_text[:100] + "…"
+        line = f"{mention} · 錯誤題目：**{text}**"
+        if retry_at:
+            line += f" · ⏳ <t:{retry_at}:t> 才能重考"
+        lines.append(line)
+    embed.description = "\n".join(lines)[:4096]
+    embed.timestamp = discord.utils.utcnow()
+    return embed
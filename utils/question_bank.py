@@ -0,0 +1,339 @@
+# question_bank.py (整個題庫常駐記憶體：精簡的 __slots__ 題目物件 + 版本號 + LISTEN/NOTIFY 增量更新)
+
+import asyncio
+import hashlib
+import json
+import re
+import sys
+import time
+import unicodedata
+
+from utils.question_index import QuestionIndex
+
+QUESTIONS_CHANNEL = "questions_changed"
+
+_WHITESPACE = re.compile(r"\s+")
+
+
+def _normalize(text: str) -> str:
+    return _WHITESPACE.sub(" ", unicodedata.normalize("NFKC", text).casefold()).strip()
+
+
+def content_hash(question: str, options) -> str:
+    # 題目 + 排序後的選項，正規化 (全半形、大小寫、空白) 後取 SHA-1；選項順序不同也算重複
+    parts = [_normalize(question)] + sorted(_normalize(text) for text in options)
+    return hashlib.sha1("\x1f".join(parts).encode("utf-8")).hexdigest()
+
+
+class Question:
+    __slots__ = ("id", "question", "options", "answer", "version", "content_hash")
+
+    def __init__(self, question_id: int, question: str, options: tuple, answer: int, version: int = 0, question_hash: str = None):
+        self.id = question_id
+        self.question = question
+        self.options = options
+        self.answer = answer
+        self.version = version
+        # 資料庫已經存了雜湊就直接用；重複題目在資料庫裡是 NULL，才需要自己算
+        self.content_hash = question_hash or content_hash(question, options)
+
+    @classmethod
+    def from_row(cls, row, version: int = 0):
+        # row: (id, question, option1, option2, option3, option4, answer, content_hash)
+        # 選項常常重複 (是/否、以上皆是…)，intern 後共用同一份字串
+        options = tuple(sys.intern(text) for text in row[2:6])
+        return cls(row[0], row[1], options, int(row[6]), version, row[7])
+
+
+class QuestionBank:
+    def __init__(self):
+        self._questions = {}
+        self._index = QuestionIndex()
+        # content_hash -> 最早的那題 id，新增前 O(1) 檢查重複
+        self._hashes = {}
+        self.version = 0
+        self.loaded = False
+        self.last_load_seconds = 0.0
+
+    def __len__(self):
+        return len(self._questions)
+
+    def __contains__(self, question_id):
+        return question_id in self._questions
+
+    def get(self, question_id: int):
+        return self._questions.get(question_id)
+
+    # ---------------------------------------------------------
+    # 📥 整批載入 (啟動時 / LISTEN 連線斷掉重連後)
+    # ---------------------------------------------------------
+    def load(self, questions, elapsed: float = 0.0):
+        self.version += 1
+        for q in questions:
+            q.version = self.version
+        self._questions = {q.id: q for q in questions}
+        hashes = {}
+        for q in sorted(questions, key=lambda q: q.id, reverse=True):
+            hashes[q.content_hash] = q.id
+        self._hashes = hashes
+        index = QuestionIndex()
+        index.load(self._questions)
+        self._index = index
+        self.loaded = True
+        self.last_load_seconds = elapsed
+
+    # ---------------------------------------------------------
+    # ✏️ 增量更新 (管理指令 / NOTIFY)
+    # ---------------------------------------------------------
+    def upsert(self, row):
+        self.version += 1
+        q = Question.from_row(row, self.version)
+        old = self._questions.get(q.id)
+        if old is not None and self._hashes.get(old.content_hash) == q.id:
+            del self._hashes[old.content_hash]
+        self._questions[q.id] = q
+        self._hashes.setdefault(q.content_hash, q.id)
+        self._index.add(q.id)
+        return q
+
+    def remove(self, question_id: int):
+        q = self._questions.pop(question_id, None)
+        if q is None:
+            return False
+        self.version += 1
+        if self._hashes.get(q.content_hash) == question_id:
+            del self._hashes[q.content_hash]
+        self._index.remove(question_id)
+        return True
+
+    def clear(self):
+        self.version += 1
+        self._questions = {}
+        self._hashes = {}
+        self._index.clear()
+
+    def find_duplicate(self, question_hash: str):
+        return self._hashes.get(question_hash)
+
+    def duplicate_clusters(self):
+        # 一次掃過整個記憶體題庫，依 content_hash 分組，回傳有重複的 [[id, ...], ...]
+        groups = {}
+        for q in self._questions.values():
+            groups.setdefault(q.content_hash, []).append(q.id)
+        return sorted((sorted(ids) for ids in groups.values() if len(ids) > 1), key=len, reverse=True)
+
+    def draw(self, k: int):
+        return [self._questions[qid] for qid in self._index.draw(k)]
+
+    # ---------------------------------------------------------
+    # 📊 記憶體估算 (物件本身 + 字串 + 索引)；要掃過每一題，只給 /exam_status 用
+    # ---------------------------------------------------------
+    def memory_bytes(self) -> int:
+        total = sys.getsizeof(self._questions) + sys.getsizeof(self._index._ids) + sys.getsizeof(self._index._positions)
+        seen = set()
+        for q in self._questions.values():
+            total += sys.getsizeof(q) + sys.getsizeof(q.question) + sys.getsizeof(q.options) + sys.getsizeof(q.content_hash)
+            for text in q.options:
+                if id(text) not in seen:
+                    seen.add(id(text))
+                    total += sys.getsizeof(text)
+        return total
+
+    def stats(self):
+        return {
+            "questions": len(self._questions),
+            "version": self.version,
+            "last_load_seconds": self.last_load_seconds,
+        }
+
+
+# ---------------------------------------------------------
+# 🏠 多伺服器：每個伺服器一個獨立的題庫，用到才載入
+# ---------------------------------------------------------
+class GuildQuestionBanks:
+    def __init__(self, loader):
+        # loader: async (guild_id) -> (questions, elapsed)
+        # 每個伺服器各自一份，沒有共用容量，大伺服器不會把別人擠出記憶體
+        self._loader = loader
+        self._banks = {}
+        self._locks = {}
+
+    def __len__(self):
+        return len(self._banks)
+
+    async def get(self, guild_id: int) -> QuestionBank:
+        bank = self._banks.get(guild_id)
+        if bank is not None:
+            return bank
+        lock = self._locks.setdefault(guild_id, asyncio.Lock())
+        async with lock:
+            bank = self._banks.get(guild_id)
+            if bank is None:
+                bank = QuestionBank()
+                questions, elapsed = await self._loader(guild_id)
+                bank.load(questions, elapsed)
+                self._banks[guild_id] = bank
+            return bank
+
+    def peek(self, guild_id: int):
+        # 只回傳已經載入的題庫 (NOTIFY 不需要替沒載入的伺服器載題庫)
+        return self._banks.get(guild_id)
+
+    def loaded(self):
+        return self._banks.items()
+
+    def discard(self, guild_id: int):
+        self._banks.pop(guild_id, None)
+        self._locks.pop(guild_id, None)
+
+    def clear(self):
+        for bank in self._banks.values():
+            bank.clear()
+
+    def memory_bytes(self) -> int:
+        return sum(bank.memory_bytes() for bank in self._banks.values())
+
+    def stats(self):
+        # 只有計數，/metrics 每次抓都會呼叫
+        return {
+            "guilds": len(self._banks),
+            "questions": sum(len(bank) for bank in self._banks.values()),
+        }
+
+
+def fetch_all_questions(cur, guild_id: int):
+    # 在資料庫執行緒裡邊讀邊建物件，不先 fetchall 一份完整的 row 清單
+    start = time.perf_counter()
+    cur.execute("SELECT id, question, option1, option2, option3, option4, answer, content_hash FROM questions WHERE guild_id = %s", (guild_id,))
+    questions = []
+    while True:
+        rows = cur.fetchmany(2000)
+        if not rows:
+            break
+        questions.extend(Question.from_row(row) for row in rows)
+    return questions, time.perf_counter() - start
+
+
+def backfill_content_hashes(cur, batch_size: int = 2000):
+    # 替 content_hash 還是 NULL 的舊題目補上雜湊；同內容只有最早的那題拿到雜湊 (唯一索引)，
+    # 其餘保持 NULL，由 /find_duplicates 列出給管理員處理
+    from psycopg2.extras import execute_values
+
+    # 重複是以伺服器為單位判斷，不同伺服器可以有一樣的題目
+    cur.execute("SELECT guild_id, content_hash FROM questions WHERE content_hash IS NOT NULL")
+    taken = {(row[0], row[1]) for row in cur.fetchall()}
+    cur.execute("SELECT id, guild_id, question, option1, option2, option3, option4 FROM questions WHERE content_hash IS NULL ORDER BY id")
+    rows = cur.fetchall()
+
+    updates = []
+    for row in rows:
+        question_hash = content_hash(row[2], row[3:7])
+        if (row[1], question_hash) not in taken:
+            taken.add((row[1], question_hash))
+            updates.append((row[0], question_hash))
+
+    for i in range(0, len(updates), batch_size):
+        execute_values(cur, """
+            UPDATE questions AS q SET content_hash = v.content_hash
+            FROM (VALUES %s) AS v (id, content_hash)
+            WHERE q.id = v.id
+        """, updates[i:i + batch_size])
+    return len(updates), len(rows) - len(updates)
+
+
+# ---------------------------------------------------------
+# 📡 LISTEN/NOTIFY：接收在機器人以外 (或其他行程) 對 questions 的修改
+# ---------------------------------------------------------
+class QuestionChangeListener:
+    def __init__(self, dsn: str, on_change, on_reconnect, channel: str = QUESTIONS_CHANNEL):
+        # on_change(payload: dict, pid: int) 在 event loop 上同步呼叫，pid 是發出通知的後端
+        # on_reconnect() 是 coroutine，斷線期間可能漏掉通知，重連後要整批重載
+        self.dsn = dsn
+        self.channel = channel
+        self._on_change = on_change
+        self._on_reconnect = on_reconnect
+        self._conn = None
+        self._fd = None
+        self._task = None
+        self._lost = None
+        self._closing = False
+
+    async def start(self):
+        self._closing = False
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        self._closing = True
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        self._disconnect()
+
+    async def _run(self):
+        loop = asyncio.get_running_loop()
+        delay = 1
+        first = True
+        while not self._closing:
+            try:
+                self._conn = await asyncio.to_thread(self._connect)
+                self._lost = loop.create_future()
+                loop.add_reader(self._conn.fileno(), self._on_readable)
+                self._fd = self._conn.fileno()
+            except NotImplementedError:
+                # Windows 的 Proactor loop 不支援 add_reader，只靠管理指令同步
+                print("⚠️ 目前的 event loop 不支援 LISTEN，題庫只會由管理指令更新。")
+                self._disconnect()
+                return
+            except Exception as e:
+                print(f"題庫 LISTEN 連線失敗: {e}")
+                self._disconnect()
+                await asyncio.sleep(delay)
+                delay = min(delay * 2, 60)
+                continue
+
+            delay = 1
+            if not first:
+                await self._on_reconnect()
+            first = False
+            await self._lost
+            self._disconnect()
+
+    def _connect(self):
+        import psycopg2
+
+        conn = psycopg2.connect(self.dsn)
+        conn.autocommit = True
+        with conn.cursor() as cur:
+            cur.execute(f"LISTEN {self.channel};")
+        return conn
+
+    def _disconnect(self):
+        conn, self._conn = self._conn, None
+        fd, self._fd = self._fd, None
+        if fd is not None:
+            asyncio.get_running_loop().remove_reader(fd)
+        if conn is None:
+            return
+        try:
+            conn.close()
+        except Exception:
+            pass
+
+    def _on_readable(self):
+        try:
+            self._conn.poll()
+        except Exception as e:
+            print(f"題庫 LISTEN 連線中斷: {e}")
+            if self._lost and not self._lost.done():
+                self._lost.set_result(None)
+            return
+        while self._conn.notifies:
+            notify = self._conn.notifies.pop(0)
+            try:
+                self._on_change(json.loads(notify.payload), notify.pid)
+            except Exception as e:
+                print(f"處理題庫通知失敗: {e}")
@@ -0,0 +1,54 @@
+# question_export.py (用伺服器端游標分批匯出整個題庫，邊讀邊寫暫存檔，大檔自動 gzip)
+
+import csv
+import gzip
+import json
+import os
+import shutil
+import tempfile
+
+EXPORT_BATCH_SIZE = int(os.getenv("EXPORT_BATCH_SIZE", "2000"))
+EXPORT_GZIP_THRESHOLD = int(os.getenv("EXPORT_GZIP_THRESHOLD", str(1024 * 1024)))
+
+EXPORT_FIELDS = ("id", "question", "option1", "option2", "option3", "option4", "answer")
+
+
+def export_questions(cur, guild_id: int, fmt: str, batch_size: int = EXPORT_BATCH_SIZE, gzip_threshold: int = EXPORT_GZIP_THRESHOLD):
+    # Postgres：在資料庫執行緒內用伺服器端游標分批讀；回傳 (檔案路徑, 題數)，呼叫端負責刪檔
+    with cur.connection.cursor(name="questions_export") as server_cur:
+        server_cur.itersize = batch_size
+        server_cur.execute(f"SELECT {', '.join(EXPORT_FIELDS)} FROM questions WHERE guild_id = %s ORDER BY id", (guild_id,))
+        return write_export(iter(lambda: server_cur.fetchmany(batch_size), []), fmt, gzip_threshold)
+
+
+def write_export(batches, fmt: str, gzip_threshold: int = EXPORT_GZIP_THRESHOLD):
+    # batches：一批一批的 (id, question, option1..4, answer)，寫到暫存檔
+    fd, path = tempfile.mkstemp(suffix=".csv" if fmt == "csv" else ".jsonl")
+    count = 0
+    try:
+        with os.fdopen(fd, "w", newline="", encoding="utf-8") as f:
+            writer = None
+            if fmt == "csv":
+                writer = csv.writer(f)
+                writer.writerow(EXPORT_FIELDS)
+
+            for rows in batches:
+                if writer:
+                    writer.writerows(rows)
+                else:
+                    for row in rows:
+                        f.write(json.dumps(dict(zip(EXPORT_FIELDS, row)), ensure_ascii=False))
+                        f.write("\n")
+                count += len(rows)
+
+        if os.path.getsize(path) > gzip_threshold:
+            gz_path = path + ".gz"
+            with open(path, "rb") as src, gzip.open(gz_path, "wb") as dst:
+                shutil.copyfileobj(src, dst)
+            os.remove(path)
+            path = gz_path
+    except Exception:
+        if os.path.exists(path):
+            os.remove(path)
+        raise
+    return path, count
@@ -0,0 +1,247 @@
+# question_import.py (從 CSV / JSON 附件大量匯入題目：串流下載、逐筆驗證、COPY 分批寫入)
+
+import csv
+import io
+import json
+import os
+import time
+
+import aiohttp
+
+from utils.question_bank import content_hash
+
+IMPORT_BATCH_SIZE = int(os.getenv("IMPORT_BATCH_SIZE", "1000"))
+IMPORT_MAX_BYTES = int(os.getenv("IMPORT_MAX_BYTES", str(50 * 1024 * 1024)))
+
+IMPORT_FIELDS = ("question", "option1", "option2", "option3", "option4", "answer")
+MAX_QUESTION_LENGTH = 4000
+MAX_OPTION_LENGTH = 1024
+
+
+class ImportResult:
+    def __init__(self):
+        self.inserted_rows = []
+        self.skipped = 0
+        self.invalid = 0
+        # 只留前幾筆錯誤給管理員看
+        self.errors = []
+        self.elapsed = 0.0
+
+    def add_error(self, line: int, reason: str):
+        self.invalid += 1
+        if len(self.errors) < 10:
+            self.errors.append(f"第 {line} 筆：{reason}")
+
+
+# ---------------------------------------------------------
+# 📥 下載附件：分塊寫到暫存檔，不整包讀進記憶體
+# ---------------------------------------------------------
+async def download_attachment(url: str, path: str, chunk_size: int = 64 * 1024):
+    async with aiohttp.ClientSession() as session:
+        async with session.get(url) as resp:
+            resp.raise_for_status()
+            with open(path, "wb") as f:
+                async for chunk in resp.content.iter_chunked(chunk_size):
+                    f.write(chunk)
+
+
+def detect_format(filename: str):
+    name = filename.lower()
+    if name.endswith(".csv"):
+        return "csv"
+    if name.endswith((".json", ".jsonl", ".ndjson")):
+        return "json"
+    return None
+
+
+# ---------------------------------------------------------
+# 📄 逐筆讀取 (產生器，一次只在記憶體裡放一筆)
+# ---------------------------------------------------------
+def iter_csv_records(path: str):
+    with open(path, newline="", encoding="utf-8-sig") as f:
+        reader = csv.DictReader(f)
+        missing = [field for field in IMPORT_FIELDS if field not in (reader.fieldnames or [])]
+        if missing:
+            raise ValueError(f"CSV 缺少欄位：{', '.join(missing)}")
+        for record in reader:
+            yield record
+
+
+def iter_json_records(path: str, chunk_size: int = 64 * 1024):
+    # 支援 JSON Lines (一行一個物件) 和最外層是陣列的 JSON；一次只讀 chunk_size，用 raw_decode 一筆一筆解
+    decoder = json.JSONDecoder()
+    with open(path, encoding="utf-8-sig") as f:
+        buffer = ""
+        pos = 0
+        eof = False
+
+        def read_more():
+            # 丟掉已處理的部分，接上下一段
+            nonlocal buffer, pos, eof
+            more = f.read(chunk_size)
+            if not more:
+                eof = True
+            buffer = buffer[pos:] + more
+            pos = 0
+
+        def peek():
+            # 跳過空白，回傳下一個字元；檔案結束回傳 ""
+            nonlocal pos
+            while True:
+                pos = _skip_whitespace(buffer, pos)
+                if pos < len(buffer) or eof:
+                    return buffer[pos:pos + 1]
+                read_more()
+
+        def decode():
+            nonlocal pos
+            while True:
+                try:
+                    value, end = decoder.raw_decode(buffer, pos)
+                except json.JSONDecodeError:
+                    end = None
+                # 數字 / true 這類值後面要接到分隔字元才算完整 (例如 "-0.5e" 被切斷時會先解成 -0.5)，
+                # 字串、物件、陣列以引號 / 括號結尾就一定完整
+                if end is not None and (eof or (end < len(buffer) and (buffer[end - 1] in '"}]' or buffer[end] in " \t\r\n,]"))):
+                    pos = end
+                    return value
+                if eof:
+                    raise ValueError("JSON 格式錯誤或檔案不完整")
+                read_more()
+
+        if peek() != "[":
+            # JSON Lines：一個值接一個值直到檔案結束
+            while peek():
+                yield decode()
+            return
+
+        pos += 1
+        if peek() == "]":
+            pos += 1
+        else:
+            while True:
+                if not peek():
+                    raise ValueError("JSON 格式錯誤或檔案不完整")
+                yield decode()
+                separator = peek()
+                if separator == "]":
+                    pos += 1
+                    break
+                if separator != ",":
+                    raise ValueError("JSON 陣列的元素之間缺少逗號")
+                pos += 1
+                if peek() == "]":
+                    raise ValueError("JSON 陣列最後多了一個逗號")
+        if peek():
+            raise ValueError("JSON 陣列結束後還有多餘的內容")
+
+
+def _skip_whitespace(text: str, pos: int) -> int:
+    while pos < len(text) and text[pos] in " \t\r\n":
+        pos += 1
+    return pos
+
+
+# ---------------------------------------------------------
+# ✅ 驗證：回傳 (question, option1..4, answer) 或丟 ValueError
+# ---------------------------------------------------------
+def validate_record(record):
+    if not isinstance(record, dict):
+        raise ValueError("不是物件格式")
+
+    values = []
+    for field in IMPORT_FIELDS[:5]:
+        text = record.get(field)
+        text = "" if text is None else str(text).strip()
+        if not text:
+            raise ValueError(f"`{field}` 是空的")
+        limit = MAX_QUESTION_LENGTH if field == "question" else MAX_OPTION_LENGTH
+        if len(text) > limit:
+            raise ValueError(f"`{field}` 超過 {limit} 字")
+        values.append(text)
+
+    try:
+        answer = int(str(record.get("answer")).strip())
+    except (TypeError, ValueError):
+        raise ValueError("`answer` 不是數字")
+    if answer not in [1, 2, 3, 4]:
+        raise ValueError("`answer` 只能是 1~4")
+    values.append(answer)
+    return tuple(values)
+
+
+def is_blank(record) -> bool:
+    return isinstance(record, dict) and all(
+        record.get(field) is None or str(record.get(field)).strip() == "" for field in IMPORT_FIELDS
+    )
+
+
+# ---------------------------------------------------------
+# 📦 分批：逐筆驗證，每 batch_size 筆產生一批 (question, option1..4, answer, content_hash)
+# ---------------------------------------------------------
+def iter_import_batches(path: str, fmt: str, result: ImportResult, batch_size: int = IMPORT_BATCH_SIZE):
+    # 空白 / 格式錯誤的直接記在 result；各儲存後端只負責把每一批寫進去
+    records = iter_csv_records(path) if fmt == "csv" else iter_json_records(path)
+    batch = []
+    for line, record in enumerate(records, start=1):
+        if is_blank(record):
+            result.skipped += 1
+            continue
+        try:
+            values = validate_record(record)
+        except ValueError as e:
+            result.add_error(line, str(e))
+            continue
+        batch.append(values + (content_hash(values[0], values[1:5]),))
+        if len(batch) >= batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+# ---------------------------------------------------------
+# 💾 寫入 (Postgres)：在資料庫執行緒內跑，整個匯入是同一個 transaction
+# ---------------------------------------------------------
+def import_questions(cur, guild_id: int, path: str, fmt: str, batch_size: int = IMPORT_BATCH_SIZE):
+    start = time.perf_counter()
+    result = ImportResult()
+
+    cur.execute("""
+        CREATE TEMP TABLE import_staging (
+            question TEXT NOT NULL,
+            option1 TEXT NOT NULL,
+            option2 TEXT NOT NULL,
+            option3 TEXT NOT NULL,
+            option4 TEXT NOT NULL,
+            answer INTEGER NOT NULL,
+            content_hash TEXT NOT NULL
+        ) ON COMMIT DROP;
+    """)
+
+    for batch in iter_import_batches(path, fmt, result, batch_size):
+        _copy_batch(cur, guild_id, batch, result)
+
+    result.elapsed = time.perf_counter() - start
+    return result
+
+
+def _copy_batch(cur, guild_id: int, batch, result: ImportResult):
+    # 和題庫 (或同一批) 重複的題目由 content_hash 唯一索引擋下，算在「略過」
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(batch)
+    buffer.seek(0)
+    cur.copy_expert(
+        "COPY import_staging (question, option1, option2, option3, option4, answer, content_hash) FROM STDIN WITH (FORMAT csv)",
+        buffer
+    )
+    cur.execute("""
+        INSERT INTO questions (guild_id, question, option1, option2, option3, option4, answer, content_hash)
+        SELECT %s, question, option1, option2, option3, option4, answer, content_hash FROM import_staging
+        ON CONFLICT (guild_id, content_hash) DO NOTHING
+        RETURNING id, question, option1, option2, option3, option4, answer, content_hash;
+    """, (guild_id,))
+    inserted = cur.fetchall()
+    result.inserted_rows.extend(inserted)
+    result.skipped += len(batch) - len(inserted)
+    cur.execute("TRUNCATE import_staging;")
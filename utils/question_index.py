@@ -0,0 +1,49 @@
+# question_index.py (題目 id 的記憶體索引：O(k) 隨機抽題，取代 ORDER BY RANDOM())
+
+import random
+
+
+class QuestionIndex:
+    def __init__(self):
+        self._ids = []
+        # id -> 在 _ids 裡的位置，讓刪除可以 O(1) 換位移除
+        self._positions = {}
+        self.loaded = False
+
+    def __len__(self):
+        return len(self._ids)
+
+    def __contains__(self, question_id):
+        return question_id in self._positions
+
+    def load(self, question_ids):
+        self._ids = list(question_ids)
+        self._positions = {qid: i for i, qid in enumerate(self._ids)}
+        self.loaded = True
+
+    def add(self, question_id: int):
+        if question_id in self._positions:
+            return
+        self._positions[question_id] = len(self._ids)
+        self._ids.append(question_id)
+
+    def remove(self, question_id: int):
+        pos = self._positions.pop(question_id, None)
+        if pos is None:
+            return
+        last = self._ids.pop()
+        if pos < len(self._ids):
+            # 把最後一個補到被刪的位置
+            self._ids[pos] = last
+            self._positions[last] = pos
+
+    def clear(self):
+        self._ids.clear()
+        self._positions.clear()
+
+    def draw(self, k: int):
+        # k 遠小於題庫時 random.sample 走集合抽樣，成本只跟 k 有關
+        k = min(k, len(self._ids))
+        if k <= 0:
+            return []
+        return random.sample(self._ids, k)
@@ -0,0 +1,90 @@
+# question_render.py (考題畫面：每題的 embed 欄位依選項排列預先組好放進 LRU 快取，作答時只挑一個排列、補上題號)
+
+import itertools
+import os
+import random
+from collections import OrderedDict
+
+import discord
+
+RENDER_CACHE_SIZE = int(os.getenv("RENDER_CACHE_SIZE", "2048"))
+
+# 4 個選項的 24 種排列，打亂選項 = 挑一個排列，不用每次 shuffle 新的 list
+PERMUTATIONS = tuple(itertools.permutations(range(4)))
+FIELD_NAMES = tuple(f"選項 {i+1}" for i in range(4))
+# SELECT_OPTIONS[排列] ，全部考試共用這 24 組下拉選單選項
+SELECT_OPTIONS = tuple(
+    tuple(discord.SelectOption(label=FIELD_NAMES[position], value=str(original + 1)) for position, original in enumerate(permutation))
+    for permutation in PERMUTATIONS
+)
+COLOR = discord.Color.green().value
+
+
+class RenderedQuestion:
+    __slots__ = ("question", "description", "fields")
+
+    def __init__(self, question):
+        self.question = question
+        self.description = f"**{question.question}**"
+        # fields[排列] -> embed 欄位 (dict)，用到哪個排列才組哪個
+        self.fields = [None] * len(PERMUTATIONS)
+
+    def render(self, number: int, total: int):
+        # 回傳 (embed, select 選項)
+        index = random.randrange(len(PERMUTATIONS))
+        fields = self.fields[index]
+        if fields is None:
+            options = self.question.options
+            fields = self.fields[index] = tuple(
+                {"name": FIELD_NAMES[position], "value": options[original], "inline": False}
+                for position, original in enumerate(PERMUTATIONS[index])
+            )
+        # from_dict 會直接拿 fields 這個 list 來用，每次給一份新的，快取裡的不會被改到
+        embed = discord.Embed.from_dict({
+            "title": f"第 {number} / {total} 題",
+            "description": self.description,
+            "color": COLOR,
+            "fields": list(fields),
+        })
+        return embed, list(SELECT_OPTIONS[index])
+
+
+class RenderCache:
+    def __init__(self, max_size: int = RENDER_CACHE_SIZE):
+        self.max_size = max_size
+        # (題目 id, 題目版本) -> RenderedQuestion；題目被修改後版本會變，舊的自然被擠掉
+        self._entries = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self):
+        return len(self._entries)
+
+    def get(self, question) -> RenderedQuestion:
+        key = (question.id, question.version)
+        entry = self._entries.get(key)
+        # 版本號是各伺服器題庫自己數的，同一個 key 也要確認是同一個題目物件
+        if entry is not None and entry.question is question:
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry
+
+        self.misses += 1
+        entry = self._entries[key] = RenderedQuestion(question)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+        return entry
+
+    def clear(self):
+        self._entries.clear()
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "max_size": self.max_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / total if total else 0.0,
+        }
@@ -0,0 +1,39 @@
+# question_search.py (題庫全文搜尋：pg_trgm GIN 索引；沒有 pg_trgm 時退回 ILIKE)
+
+SEARCH_LIMIT = 10
+
+# 索引和查詢必須用完全相同的運算式，GIN 索引才會被用到
+SEARCH_DOCUMENT = "(question || ' ' || option1 || ' ' || option2 || ' ' || option3 || ' ' || option4)"
+
+
+def escape_like(keyword: str) -> str:
+    return keyword.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def search_questions(cur, guild_id: int, keyword: str, use_trgm: bool, limit: int = SEARCH_LIMIT):
+    # 回傳 [(id, question, score)]，完整包含關鍵字的排前面，其次依相似度
+    pattern = f"%{escape_like(keyword)}%"
+    if use_trgm:
+        cur.execute(f"""
+            SELECT id, question,
+                   CASE WHEN {SEARCH_DOCUMENT} ILIKE %s THEN 1.0
+                        ELSE word_similarity(%s, {SEARCH_DOCUMENT}) END AS score
+            FROM questions
+            WHERE guild_id = %s AND ({SEARCH_DOCUMENT} ILIKE %s OR %s <%% {SEARCH_DOCUMENT})
+            ORDER BY score DESC, id
+            LIMIT %s
+        """, (pattern, keyword, guild_id, pattern, keyword, limit))
+    else:
+        cur.execute(f"""
+            SELECT id, question, 1.0 AS score
+            FROM questions
+            WHERE guild_id = %s AND {SEARCH_DOCUMENT} ILIKE %s
+            ORDER BY id
+            LIMIT %s
+        """, (guild_id, pattern, limit))
+    return [(row[0], row[1], float(row[2])) for row in cur.fetchall()]
+
+
+def trgm_available(cur) -> bool:
+    cur.execute("SELECT 1 FROM pg_extension WHERE extname = 'pg_trgm'")
+    return cur.fetchone() is not None
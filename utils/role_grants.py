@@ -0,0 +1,126 @@
+# role_grants.py (通過考試的身分組發放：先記到 role_grants 表，背景限量併發發放，被限速 / 5xx 就退避重試)
+
+import asyncio
+import os
+
+import discord
+
+ROLE_GRANT_CONCURRENCY = int(os.getenv("ROLE_GRANT_CONCURRENCY", "2"))
+ROLE_GRANT_MAX_ATTEMPTS = int(os.getenv("ROLE_GRANT_MAX_ATTEMPTS", "6"))
+ROLE_GRANT_MAX_BACKOFF = 60.0
+
+
+class RoleGrantWorker:
+    def __init__(self, bot, storage, concurrency: int = ROLE_GRANT_CONCURRENCY, max_attempts: int = ROLE_GRANT_MAX_ATTEMPTS):
+        self.bot = bot
+        self.storage = storage
+        self.concurrency = concurrency
+        self.max_attempts = max_attempts
+        # (grant_id, guild_id, user_id, role_id, attempts)
+        self._queue = asyncio.Queue()
+        self._workers = []
+        # 等待退避重試中的 grant_id
+        self._retrying = set()
+        self.granted = 0
+        self.failed = 0
+        self.retries = 0
+
+    # ---------------------------------------------------------
+    # 🔌 生命週期
+    # ---------------------------------------------------------
+    async def start(self, shard_ids=None, shard_count: int = None):
+        # 上次關機前還沒發完的接著發 (只拿自己分片的伺服器)
+        rows = await self.storage.load_pending_grants(shard_ids, shard_count)
+        for row in rows:
+            self._queue.put_nowait(tuple(row))
+        self._workers = [asyncio.create_task(self._work()) for _ in range(self.concurrency)]
+
+    async def stop(self):
+        for task in self._workers:
+            task.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+
+    # ---------------------------------------------------------
+    # 📥 排隊
+    # ---------------------------------------------------------
+    async def submit(self, guild_id: int, user_id: int, role_id: int):
+        grant_id = await self.storage.create_grant(guild_id, user_id, role_id)
+        self._queue.put_nowait((grant_id, guild_id, user_id, role_id, 0))
+
+    def pending(self) -> int:
+        return self._queue.qsize() + len(self._retrying)
+
+    # ---------------------------------------------------------
+    # 🚚 背景發放
+    # ---------------------------------------------------------
+    async def _work(self):
+        await self.bot.wait_until_ready()
+        while True:
+            job = await self._queue.get()
+            try:
+                await self._grant(*job)
+            except Exception as e:
+                print(f"發放身分組時發生錯誤: {e}")
+            finally:
+                self._queue.task_done()
+
+    async def _grant(self, grant_id: int, guild_id: int, user_id: int, role_id: int, attempts: int):
+        attempts += 1
+        guild = self.bot.get_guild(guild_id)
+        role = guild.get_role(role_id) if guild else None
+        if role is None:
+            await self._finish(grant_id, "failed", attempts, "找不到伺服器或身分組")
+            return
+
+        try:
+            member = guild.get_member(user_id) or await guild.fetch_member(user_id)
+            if member.get_role(role_id) is None:
+                await member.add_roles(role, reason="通過考試")
+        except discord.RateLimited as e:
+            await self._retry(grant_id, guild_id, user_id, role_id, attempts, f"429: {e}", e.retry_after)
+            return
+        except (discord.Forbidden, discord.NotFound) as e:
+            # 權限不足 / 成員已離開：重試也沒用
+            await self._finish(grant_id, "failed", attempts, f"{e.status}: {e.text}")
+            return
+        except discord.HTTPException as e:
+            if e.status == 429 or e.status >= 500:
+                await self._retry(grant_id, guild_id, user_id, role_id, attempts, f"{e.status}: {e.text}")
+            else:
+                await self._finish(grant_id, "failed", attempts, f"{e.status}: {e.text}")
+            return
+
+        await self._finish(grant_id, "granted", attempts, None)
+
+    async def _retry(self, grant_id: int, guild_id: int, user_id: int, role_id: int, attempts: int, error: str, retry_after: float = None):
+        if attempts >= self.max_attempts:
+            await self._finish(grant_id, "failed", attempts, error)
+            return
+        self.retries += 1
+        await self.storage.update_grant(grant_id, "pending", attempts, error)
+        delay = max(min(ROLE_GRANT_MAX_BACKOFF, 2 ** attempts), retry_after or 0)
+        self._retrying.add(grant_id)
+
+        def requeue():
+            self._retrying.discard(grant_id)
+            self._queue.put_nowait((grant_id, guild_id, user_id, role_id, attempts))
+
+        # 不佔住 worker，時間到再放回隊伍
+        asyncio.get_running_loop().call_later(delay, requeue)
+
+    async def _finish(self, grant_id: int, status: str, attempts: int, error):
+        if status == "granted":
+            self.granted += 1
+        else:
+            self.failed += 1
+            print(f"身分組發放失敗 (#{grant_id}): {error}")
+        await self.storage.update_grant(grant_id, status, attempts, error)
+
+    def stats(self):
+        return {
+            "pending": self.pending(),
+            "granted": self.granted,
+            "failed": self.failed,
+            "retries": self.retries,
+        }
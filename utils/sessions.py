@@ -0,0 +1,194 @@
+# sessions.py (進行中的考試：每人同時只能有一場，只存題目 ID 與進度，閒置太久自動清掉；
+#              進度同步一份到 exam_sessions 表，機器人重啟後還能接著考)
+
+import asyncio
+import os
+import sys
+import time
+from array import array
+from collections import OrderedDict
+
+EXAM_SESSION_IDLE_TIMEOUT = float(os.getenv("EXAM_SESSION_IDLE_TIMEOUT", "900"))
+EXAM_SESSION_SWEEP_INTERVAL = float(os.getenv("EXAM_SESSION_SWEEP_INTERVAL", "60"))
+
+
+class ExamSession:
+    # 題目內容、身分組等都不存，要用時再從題庫 / 設定快取拿
+    __slots__ = ("session_id", "guild_id", "user_id", "question_ids", "index", "correct_count", "last_active")
+
+    def __init__(self, session_id: int, guild_id: int, user_id: int, question_ids):
+        self.session_id = session_id
+        self.guild_id = guild_id
+        self.user_id = user_id
+        self.question_ids = array("q", question_ids)
+        self.index = 0
+        self.correct_count = 0
+        self.last_active = time.monotonic()
+
+    @property
+    def finished(self) -> bool:
+        return self.index >= len(self.question_ids)
+
+    @property
+    def current_question_id(self):
+        return None if self.finished else self.question_ids[self.index]
+
+
+class ExamSessionRegistry:
+    def __init__(self, storage, idle_timeout: float = EXAM_SESSION_IDLE_TIMEOUT, sweep_interval: float = EXAM_SESSION_SWEEP_INTERVAL):
+        self.storage = storage
+        self.idle_timeout = idle_timeout
+        self.sweep_interval = sweep_interval
+        # session_id -> session，依最後活動時間排序，清理時只要從最舊的開始看
+        self._sessions = OrderedDict()
+        # (guild_id, user_id) -> session_id
+        self._by_user = {}
+        self._task = None
+        self.started = 0
+        self.completed = 0
+        self.evicted = 0
+        self.restored = 0
+
+    def __len__(self):
+        return len(self._sessions)
+
+    # ---------------------------------------------------------
+    # 🔌 生命週期
+    # ---------------------------------------------------------
+    async def start(self):
+        self._task = asyncio.create_task(self._sweep_loop())
+
+    async def stop(self):
+        if self._task:
+            self._task.cancel()
+            await asyncio.gather(self._task, return_exceptions=True)
+            self._task = None
+
+    async def _sweep_loop(self):
+        while True:
+            await asyncio.sleep(self.sweep_interval)
+            self.sweep()
+            try:
+                await self.storage.delete_stale_sessions(self.idle_timeout)
+            except Exception as e:
+                print(f"清除逾時考試失敗: {e}")
+
+    # ---------------------------------------------------------
+    # 📝 開始 / 查詢 / 結束
+    # ---------------------------------------------------------
+    def _expired(self, session: ExamSession, now: float) -> bool:
+        return now - session.last_active > self.idle_timeout
+
+    def active(self, guild_id: int, user_id: int):
+        # 只看記憶體；重啟前留下的考試由 begin 的資料庫唯一鍵擋
+        session_id = self._by_user.get((guild_id, user_id))
+        session = self._sessions.get(session_id)
+        if session is None or self._expired(session, time.monotonic()):
+            return None
+        return session
+
+    async def begin(self, guild_id: int, user_id: int, question_ids):
+        # 已經有一場還沒逾時的考試就不開新的，回傳 None
+        if self.active(guild_id, user_id) is not None:
+            return None
+
+        # 逾時的舊考試先刪掉，(guild_id, user_id) 唯一鍵保證同時只有一場
+        session_id = await self.storage.create_session(guild_id, user_id, question_ids, self.idle_timeout)
+        if session_id is None:
+            return None
+        session = ExamSession(session_id, guild_id, user_id, question_ids)
+        self._add(session)
+        self.started += 1
+        return session
+
+    async def get(self, session_id: int):
+        session = self._sessions.get(session_id)
+        if session is not None:
+            if not self._expired(session, time.monotonic()):
+                return session
+            await self.end(session_id, completed=False)
+            return None
+
+        # 記憶體沒有 = 機器人重啟過 (或已經結束)，從資料庫接回來
+        row = await self.storage.load_session(session_id, self.idle_timeout)
+        if row is None:
+            return None
+        session = self._sessions.get(session_id)
+        if session is None:
+            guild_id, user_id, question_ids, index, correct_count = row
+            session = ExamSession(session_id, guild_id, user_id, question_ids)
+            session.index = index
+            session.correct_count = correct_count
+            self._add(session)
+            self.restored += 1
+        return session
+
+    async def find(self, guild_id: int, user_id: int):
+        # 找這個人進行中的考試 (給 /exam 接著考)；記憶體沒有的話可能是重啟前開的，到資料庫找
+        session = self.active(guild_id, user_id)
+        if session is not None:
+            return session
+        session_id = await self.storage.find_session(guild_id, user_id, self.idle_timeout)
+        return await self.get(session_id) if session_id is not None else None
+
+    def touch(self, session: ExamSession):
+        session.last_active = time.monotonic()
+        if session.session_id in self._sessions:
+            self._sessions.move_to_end(session.session_id)
+
+    async def checkpoint(self, session: ExamSession):
+        # 每答一題只寫這一筆 UPDATE，其他都在記憶體
+        self.touch(session)
+        await self.storage.save_session_progress(session.session_id, session.index, session.correct_count)
+
+    async def end(self, session_id: int, completed: bool = True):
+        session = self._sessions.get(session_id)
+        if session is not None:
+            self._remove(session)
+            if completed:
+                self.completed += 1
+            else:
+                self.evicted += 1
+        await self.storage.delete_session(session_id)
+
+    def _add(self, session: ExamSession):
+        self._sessions[session.session_id] = session
+        self._by_user[(session.guild_id, session.user_id)] = session.session_id
+
+    def _remove(self, session: ExamSession):
+        self._sessions.pop(session.session_id, None)
+        if self._by_user.get((session.guild_id, session.user_id)) == session.session_id:
+            del self._by_user[(session.guild_id, session.user_id)]
+
+    def sweep(self):
+        now = time.monotonic()
+        removed = 0
+        while self._sessions:
+            session = next(iter(self._sessions.values()))
+            if not self._expired(session, now):
+                break
+            self._remove(session)
+            removed += 1
+        self.evicted += removed
+        # dict 刪除後不會縮小，清掉一大批之後重建，讓記憶體回到跟進行中場數相當
+        if removed > len(self._sessions):
+            self._sessions = OrderedDict(self._sessions)
+            self._by_user = dict(self._by_user)
+
+    # ---------------------------------------------------------
+    # 📊 統計
+    # ---------------------------------------------------------
+    def memory_bytes(self) -> int:
+        total = sys.getsizeof(self._sessions) + sys.getsizeof(self._by_user)
+        for session in self._sessions.values():
+            total += sys.getsizeof(session) + sys.getsizeof(session.question_ids)
+        return total
+
+    def stats(self):
+        return {
+            "active": len(self._sessions),
+            "started": self.started,
+            "completed": self.completed,
+            "evicted": self.evicted,
+            "restored": self.restored,
+        }
@@ -0,0 +1,78 @@
+# settings_cache.py (各伺服器 exam_settings 的記憶體快取：指令寫入時直接更新，TTL 到期再回資料庫讀)
+
+import asyncio
+import os
+import time
+
+SETTINGS_CACHE_TTL = float(os.getenv("SETTINGS_CACHE_TTL", "300"))
+
+
+class _Entry:
+    __slots__ = ("value", "expires_at", "generation", "lock")
+
+    def __init__(self):
+        self.value = None
+        self.expires_at = 0.0
+        # 每次寫入/失效都 +1，讓「寫入前就開始讀」的舊結果不會蓋掉新值
+        self.generation = 0
+        self.lock = asyncio.Lock()
+
+
+class SettingsCache:
+    def __init__(self, loader, ttl: float = SETTINGS_CACHE_TTL):
+        # loader: async (guild_id) -> dict | None，快取過期或失效時呼叫
+        self._loader = loader
+        self.ttl = ttl
+        # 每個伺服器各自一格，彼此不會互相擠掉
+        self._entries = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _entry(self, guild_id: int) -> _Entry:
+        entry = self._entries.get(guild_id)
+        if entry is None:
+            entry = self._entries[guild_id] = _Entry()
+        return entry
+
+    async def get(self, guild_id: int):
+        entry = self._entry(guild_id)
+        if entry.value is not None and time.monotonic() < entry.expires_at:
+            self.hits += 1
+            return entry.value
+
+        async with entry.lock:
+            # 等鎖期間可能已經有人讀好了
+            if entry.value is not None and time.monotonic() < entry.expires_at:
+                self.hits += 1
+                return entry.value
+
+            self.misses += 1
+            generation = entry.generation
+            value = await self._loader(guild_id)
+            if generation == entry.generation:
+                self._store(entry, value)
+            return value
+
+    def set(self, guild_id: int, value):
+        # 寫穿：資料庫 UPSERT ... RETURNING 的整列結果直接換上去 (整個 dict 替換，讀者不會看到一半的狀態)
+        entry = self._entry(guild_id)
+        entry.generation += 1
+        self._store(entry, value)
+
+    def invalidate(self, guild_id: int = None):
+        entries = self._entries.values() if guild_id is None else [self._entry(guild_id)]
+        for entry in entries:
+            entry.generation += 1
+            entry.value = None
+            entry.expires_at = 0.0
+
+    def discard(self, guild_id: int):
+        # 機器人離開伺服器時整格移除
+        self._entries.pop(guild_id, None)
+
+    def _store(self, entry: _Entry, value):
+        entry.value = value
+        entry.expires_at = time.monotonic() + self.ttl if value is not None else 0.0
+
+    def __len__(self):
+        return len(self._entries)
@@ -0,0 +1,233 @@
+# storage (資料存取介面：設定、題目、冷卻、進行中的考試、身分組發放、考試統計；Postgres 與 SQLite 兩種實作)
+#
+# STORAGE_BACKEND=postgres (預設) 使用 EXTERNAL_DATABASE_URL；
+# STORAGE_BACKEND=sqlite 使用 SQLITE_PATH 的單一檔案，適合只有一兩個伺服器的小型部署或本機測試。
+
+import os
+from abc import ABC, abstractmethod
+
+STORAGE_BACKEND = os.getenv("STORAGE_BACKEND", "postgres").strip().lower()
+SQLITE_PATH = os.getenv("SQLITE_PATH", "exam_bot.sqlite3")
+
+SETTINGS_COLUMNS = (
+    "question_amount", "failure_cooldown_minutes",
+    "exam_room_id", "add_exam_room_id",
+    "manage_exam_role_id", "graduater_role_id"
+)
+
+QUESTION_COLUMNS = "id, question, option1, option2, option3, option4, answer, content_hash"
+
+
+class Storage(ABC):
+    # 各後端都要實作的抽象方法 (少實作一個在建立時就會報錯)；全部是 coroutine，查詢都不在 event loop 上跑
+    name = "base"
+
+    # ---------------------------------------------------------
+    # 🔌 生命週期
+    # ---------------------------------------------------------
+    @abstractmethod
+    async def open(self):
+        # 開連線並把資料表升級到最新版本，回傳這次套用的 [(版本號, 說明)]
+        ...
+
+    @abstractmethod
+    async def close(self):
+        ...
+
+    @abstractmethod
+    def stats(self):
+        # {"backend", "max_size", "in_flight", "saturation"}
+        ...
+
+    def change_listener(self, on_change, on_reconnect):
+        # 接收機器人以外對題目的修改；不支援的後端回傳 None
+        return None
+
+    def owns_change(self, pid: int) -> bool:
+        # 通知是不是自己這個程序發出的 (管理指令已經直接更新過記憶體了)
+        return False
+
+    # ---------------------------------------------------------
+    # 🏠 舊資料 (升級成多伺服器前，guild_id = 0)
+    # ---------------------------------------------------------
+    async def has_legacy_data(self) -> bool:
+        return False
+
+    async def claim_legacy_data(self, guild_id: int):
+        # has_legacy_data() 是 True 才會被呼叫；沒有舊資料的後端什麼都不用做
+        return None
+
+    # ---------------------------------------------------------
+    # ⚙️ 設定：回傳 {欄位: 值}，沒有這個伺服器的設定就先建立預設值
+    # ---------------------------------------------------------
+    @abstractmethod
+    async def load_settings(self, guild_id: int):
+        ...
+
+    @abstractmethod
+    async def update_setting(self, guild_id: int, column: str, value):
+        # column 必須是 SETTINGS_COLUMNS 之一；回傳更新後的整份設定
+        ...
+
+    # ---------------------------------------------------------
+    # 📚 題目：row 一律是 (id, question, option1, option2, option3, option4, answer, content_hash)
+    # ---------------------------------------------------------
+    @abstractmethod
+    async def fetch_all_questions(self, guild_id: int):
+        # 回傳 ([Question], 耗時秒數)
+        ...
+
+    @abstractmethod
+    async def fetch_questions(self, question_ids):
+        # 回傳 [(guild_id, *row)]，給增量更新用
+        ...
+
+    @abstractmethod
+    async def add_question(self, guild_id: int, question: str, options, answer: int, question_hash: str):
+        # 新增成功回傳 row；同伺服器已有相同內容回傳 None
+        ...
+
+    @abstractmethod
+    async def find_question_by_hash(self, guild_id: int, question_hash: str):
+        ...
+
+    @abstractmethod
+    async def delete_question(self, guild_id: int, question_id: int) -> bool:
+        ...
+
+    @abstractmethod
+    async def delete_all_questions(self, guild_id: int):
+        ...
+
+    @abstractmethod
+    async def list_questions(self, guild_id: int, keyword, after_id: int, limit: int):
+        # keyset 分頁：id > after_id 的 [(id, question)]，keyword 只比對題目文字
+        ...
+
+    @abstractmethod
+    async def list_question_ids_before(self, guild_id: int, keyword, anchor: int, limit: int):
+        # 反向 keyset：id <= anchor 由大到小的 [id]
+        ...
+
+    @abstractmethod
+    async def search_questions(self, guild_id: int, keyword: str):
+        # 回傳 [(id, question, 相似度 0~1)]
+        ...
+
+    @abstractmethod
+    async def import_questions(self, guild_id: int, path: str, fmt: str):
+        # 回傳 question_import.ImportResult，整個檔案同一個 transaction
+        ...
+
+    @abstractmethod
+    async def export_questions(self, guild_id: int, fmt: str):
+        # 回傳 (暫存檔路徑, 題數)，呼叫端負責刪檔
+        ...
+
+    # ---------------------------------------------------------
+    # ⏳ 冷卻
+    # ---------------------------------------------------------
+    @abstractmethod
+    async def load_cooldowns(self, now, shard_ids=None, shard_count: int = None):
+        # 回傳還沒過期的 [(guild_id, user_id, cooldown_until)]；分片拆在多個程序時只拿自己的伺服器
+        ...
+
+    @abstractmethod
+    async def save_cooldowns(self, rows):
+        # rows：[(guild_id, user_id, cooldown_until)]，已存在就覆蓋
+        ...
+
+    @abstractmethod
+    async def prune_cooldowns(self, now) -> int:
+        ...
+
+    # ---------------------------------------------------------
+    # 📝 進行中的考試
+    # ---------------------------------------------------------
+    @abstractmethod
+    async def create_session(self, guild_id: int, user_id: int, question_ids, idle_timeout: float):
+        # 逾時的舊考試先刪掉；同一人已有一場就回傳 None，否則回傳新的 session id
+        ...
+
+    @abstractmethod
+    async def load_session(self, session_id: int, idle_timeout: float):
+        # 回傳 (guild_id, user_id, question_ids, question_index, correct_count) 或 None
+        ...
+
+    @abstractmethod
+    async def find_session(self, guild_id: int, user_id: int, idle_timeout: float):
+        # 這個人還沒逾時的考試 id，沒有就回傳 None
+        ...
+
+    @abstractmethod
+    async def save_session_progress(self, session_id: int, index: int, correct_count: int):
+        ...
+
+    @abstractmethod
+    async def delete_session(self, session_id: int):
+        ...
+
+    @abstractmethod
+    async def delete_stale_sessions(self, idle_timeout: float):
+        ...
+
+    # ---------------------------------------------------------
+    # 🏅 身分組發放
+    # ---------------------------------------------------------
+    @abstractmethod
+    async def load_pending_grants(self, shard_ids=None, shard_count: int = None):
+        # 回傳 [(id, guild_id, user_id, role_id, attempts)]
+        ...
+
+    @abstractmethod
+    async def create_grant(self, guild_id: int, user_id: int, role_id: int) -> int:
+        ...
+
+    @abstractmethod
+    async def update_grant(self, grant_id: int, status: str, attempts: int, error):
+        ...
+
+    @abstractmethod
+    async def grant_summary(self, guild_id: int, limit: int = 10):
+        # 回傳 ({狀態: 筆數}, 最近失敗的 [(user_id, role_id, attempts, last_error, updated_at)])
+        ...
+
+    # ---------------------------------------------------------
+    # 📈 考試統計 (預先彙總好的計數)
+    # ---------------------------------------------------------
+    @abstractmethod
+    async def save_analytics(self, question_rows, daily_rows):
+        # 增量累加：question_rows [(guild_id, question_id, 作答, 答錯)]，daily_rows [(guild_id, date, 開考, 通過, 失敗)]
+        ...
+
+    @abstractmethod
+    async def exam_stats(self, guild_id: int, since, hardest_limit: int = 5, min_attempts: int = 5):
+        # 回傳 {"totals": (開考, 通過, 失敗), "daily": [(date, 開考, 通過, 失敗)] (since 之後),
+        #       "hardest": [(question_id, question, 作答, 答錯)] (作答至少 min_attempts 次，答錯率由高到低)}
+        ...
+
+
+def only_own_shards(shard_ids, shard_count) -> bool:
+    # 分片拆在多個程序時，這個程序只負責其中幾個分片
+    return shard_ids is not None and shard_count is not None and len(shard_ids) < shard_count
+
+
+def totals_by_guild(daily_rows):
+    # 把每天的增量加總成每個伺服器一列，給 exam_totals 用
+    totals = {}
+    for guild_id, _, started, passed, failed in daily_rows:
+        row = totals.setdefault(guild_id, [0, 0, 0])
+        row[0] += started
+        row[1] += passed
+        row[2] += failed
+    return [(guild_id, *row) for guild_id, row in totals.items()]
+
+
+def create_storage(backend: str = STORAGE_BACKEND) -> Storage:
+    if backend == "postgres":
+        from utils.storage.postgres import PostgresStorage
+        return PostgresStorage(os.getenv("EXTERNAL_DATABASE_URL"))
+    if backend == "sqlite":
+        from utils.storage.sqlite import SqliteStorage
+        return SqliteStorage(SQLITE_PATH)
+    raise ValueError(f"不支援的 STORAGE_BACKEND: {backend} (可用 postgres / sqlite)")
@@ -0,0 +1,341 @@
+# postgres.py (Postgres 實作：連線池 + LISTEN/NOTIFY + pg_trgm 搜尋 + COPY 匯入)
+
+from psycopg2.extras import execute_values
+
+from utils import question_export, question_import, question_search
+from utils.database import DatabasePool
+from utils.migrations import run_migrations
+from utils.question_bank import QuestionChangeListener, fetch_all_questions
+from utils.storage import QUESTION_COLUMNS, SETTINGS_COLUMNS, Storage, only_own_shards, totals_by_guild
+
+
+def find_legacy_data(cur):
+    # 遷移時沒指定 LEGACY_GUILD_ID 的舊資料 (guild_id = 0) 還在等人認領嗎？
+    cur.execute("""
+        SELECT EXISTS (SELECT 1 FROM exam_settings WHERE guild_id = 0)
+            OR EXISTS (SELECT 1 FROM questions WHERE guild_id = 0)
+            OR EXISTS (SELECT 1 FROM user_cooldowns WHERE guild_id = 0);
+    """)
+    return cur.fetchone()[0]
+
+
+def claim_legacy_data(cur, guild_id: int):
+    # 同一個 transaction 裡把三張表的舊資料搬到指定伺服器；對方已有的設定 / 冷卻 / 相同題目以對方為準
+    cur.execute("""
+        UPDATE exam_settings SET guild_id = %s
+        WHERE guild_id = 0 AND NOT EXISTS (SELECT 1 FROM exam_settings WHERE guild_id = %s);
+    """, (guild_id, guild_id))
+    cur.execute("DELETE FROM exam_settings WHERE guild_id = 0;")
+    cur.execute("""
+        UPDATE questions q SET content_hash = NULL
+        WHERE q.guild_id = 0
+          AND EXISTS (SELECT 1 FROM questions o WHERE o.guild_id = %s AND o.content_hash = q.content_hash);
+    """, (guild_id,))
+    cur.execute("UPDATE questions SET guild_id = %s WHERE guild_id = 0;", (guild_id,))
+    cur.execute("""
+        DELETE FROM user_cooldowns c
+        WHERE c.guild_id = 0
+          AND EXISTS (SELECT 1 FROM user_cooldowns o WHERE o.guild_id = %s AND o.user_id = c.user_id);
+    """, (guild_id,))
+    cur.execute("UPDATE user_cooldowns SET guild_id = %s WHERE guild_id = 0;", (guild_id,))
+
+
+class PostgresStorage(Storage):
+    name = "postgres"
+
+    def __init__(self, dsn: str):
+        self.dsn = dsn
+        self.db = DatabasePool(dsn)
+        self.search_uses_trgm = False
+
+    # ---------------------------------------------------------
+    # 🔌 生命週期
+    # ---------------------------------------------------------
+    async def open(self):
+        await self.db.open()
+        # 資料庫結構已經是最新的話只會查一次版本號
+        applied = await self.db.run(run_migrations)
+        self.search_uses_trgm = await self.db.run(question_search.trgm_available)
+        return applied
+
+    async def close(self):
+        await self.db.close()
+
+    def stats(self):
+        return {"backend": self.name, **self.db.stats()}
+
+    def change_listener(self, on_change, on_reconnect):
+        return QuestionChangeListener(self.dsn, on_change, on_reconnect)
+
+    def owns_change(self, pid: int) -> bool:
+        return pid in self.db.backend_pids
+
+    async def has_legacy_data(self) -> bool:
+        return await self.db.run(find_legacy_data)
+
+    async def claim_legacy_data(self, guild_id: int):
+        await self.db.run(claim_legacy_data, guild_id)
+
+    # ---------------------------------------------------------
+    # ⚙️ 設定
+    # ---------------------------------------------------------
+    async def load_settings(self, guild_id: int):
+        row = await self.db.fetchone(f"""
+            WITH created AS (
+                INSERT INTO exam_settings (guild_id) VALUES (%s)
+                ON CONFLICT (guild_id) DO NOTHING
+                RETURNING {', '.join(SETTINGS_COLUMNS)}
+            )
+            SELECT {', '.join(SETTINGS_COLUMNS)} FROM created
+            UNION ALL
+            SELECT {', '.join(SETTINGS_COLUMNS)} FROM exam_settings WHERE guild_id = %s;
+        """, (guild_id, guild_id))
+        return dict(zip(SETTINGS_COLUMNS, row)) if row else None
+
+    async def update_setting(self, guild_id: int, column: str, value):
+        if column not in SETTINGS_COLUMNS:
+            raise ValueError(f"未知的設定欄位: {column}")
+        # 寫入後用 RETURNING 回來的整列直接更新快取
+        row = await self.db.fetchone(f"""
+            INSERT INTO exam_settings (guild_id, {column}) VALUES (%s, %s)
+            ON CONFLICT (guild_id) DO UPDATE SET {column} = EXCLUDED.{column}
+            RETURNING {', '.join(SETTINGS_COLUMNS)};
+        """, (guild_id, value))
+        return dict(zip(SETTINGS_COLUMNS, row)) if row else None
+
+    # ---------------------------------------------------------
+    # 📚 題目
+    # ---------------------------------------------------------
+    async def fetch_all_questions(self, guild_id: int):
+        return await self.db.run(fetch_all_questions, guild_id)
+
+    async def fetch_questions(self, question_ids):
+        return await self.db.fetchall(f"SELECT guild_id, {QUESTION_COLUMNS} FROM questions WHERE id = ANY(%s)", (list(question_ids),))
+
+    async def add_question(self, guild_id: int, question: str, options, answer: int, question_hash: str):
+        # 資料庫的唯一索引擋下同時新增的相同題目
+        return await self.db.fetchone(f"""
+            INSERT INTO questions (guild_id, question, option1, option2, option3, option4, answer, content_hash)
+            VALUES (%s, %s, %s, %s, %s, %s, %s, %s)
+            ON CONFLICT (guild_id, content_hash) DO NOTHING
+            RETURNING {QUESTION_COLUMNS}
+        """, (guild_id, question, *options, answer, question_hash))
+
+    async def find_question_by_hash(self, guild_id: int, question_hash: str):
+        row = await self.db.fetchone(
+            "SELECT id FROM questions WHERE guild_id = %s AND content_hash = %s",
+            (guild_id, question_hash)
+        )
+        return row[0] if row else None
+
+    async def delete_question(self, guild_id: int, question_id: int) -> bool:
+        deleted = await self.db.fetchone(
+            "DELETE FROM questions WHERE id = %s AND guild_id = %s RETURNING id",
+            (question_id, guild_id)
+        )
+        return deleted is not None
+
+    async def delete_all_questions(self, guild_id: int):
+        # 題目 ID 是全部伺服器共用的序號，不能 RESTART IDENTITY
+        await self.db.execute("DELETE FROM questions WHERE guild_id = %s;", (guild_id,))
+
+    def _filter_sql(self, guild_id: int, keyword):
+        if not keyword:
+            return " AND guild_id = %s", (guild_id,)
+        return " AND guild_id = %s AND question ILIKE %s", (guild_id, f"%{question_search.escape_like(keyword)}%")
+
+    async def list_questions(self, guild_id: int, keyword, after_id: int, limit: int):
+        where, params = self._filter_sql(guild_id, keyword)
+        return await self.db.fetchall(
+            f"SELECT id, question FROM questions WHERE id > %s{where} ORDER BY id LIMIT %s",
+            (after_id, *params, limit)
+        )
+
+    async def list_question_ids_before(self, guild_id: int, keyword, anchor: int, limit: int):
+        where, params = self._filter_sql(guild_id, keyword)
+        rows = await self.db.fetchall(
+            f"SELECT id FROM questions WHERE id <= %s{where} ORDER BY id DESC LIMIT %s",
+            (anchor, *params, limit)
+        )
+        return [row[0] for row in rows]
+
+    async def search_questions(self, guild_id: int, keyword: str):
+        return await self.db.run(question_search.search_questions, guild_id, keyword, self.search_uses_trgm)
+
+    async def import_questions(self, guild_id: int, path: str, fmt: str):
+        return await self.db.run(question_import.import_questions, guild_id, path, fmt)
+
+    async def export_questions(self, guild_id: int, fmt: str):
+        return await self.db.run(question_export.export_questions, guild_id, fmt)
+
+    # ---------------------------------------------------------
+    # ⏳ 冷卻
+    # ---------------------------------------------------------
+    async def load_cooldowns(self, now, shard_ids=None, shard_count: int = None):
+        # Discord 的分片規則：(guild_id >> 22) % shard_count
+        if only_own_shards(shard_ids, shard_count):
+            return await self.db.fetchall(
+                "SELECT guild_id, user_id, cooldown_until FROM user_cooldowns WHERE cooldown_until > %s AND (guild_id >> 22) %% %s = ANY(%s)",
+                (now, shard_count, list(shard_ids))
+            )
+        return await self.db.fetchall(
+            "SELECT guild_id, user_id, cooldown_until FROM user_cooldowns WHERE cooldown_until > %s",
+            (now,)
+        )
+
+    async def save_cooldowns(self, rows):
+        def work(cur):
+            execute_values(cur, """
+                INSERT INTO user_cooldowns (guild_id, user_id, cooldown_until)
+                VALUES %s
+                ON CONFLICT (guild_id, user_id) DO UPDATE SET cooldown_until = EXCLUDED.cooldown_until;
+            """, rows)
+
+        await self.db.run(work)
+
+    async def prune_cooldowns(self, now) -> int:
+        return await self.db.execute("DELETE FROM user_cooldowns WHERE cooldown_until <= %s", (now,))
+
+    # ---------------------------------------------------------
+    # 📝 進行中的考試
+    # ---------------------------------------------------------
+    async def create_session(self, guild_id: int, user_id: int, question_ids, idle_timeout: float):
+        def work(cur):
+            # 逾時的舊考試先刪掉，(guild_id, user_id) 唯一鍵保證同時只有一場
+            cur.execute(
+                "DELETE FROM exam_sessions WHERE guild_id = %s AND user_id = %s AND updated_at < NOW() - %s * INTERVAL '1 second'",
+                (guild_id, user_id, idle_timeout)
+            )
+            cur.execute("""
+                INSERT INTO exam_sessions (guild_id, user_id, question_ids)
+                VALUES (%s, %s, %s)
+                ON CONFLICT (guild_id, user_id) DO NOTHING
+                RETURNING id
+            """, (guild_id, user_id, list(question_ids)))
+            return cur.fetchone()
+
+        row = await self.db.run(work)
+        return row[0] if row else None
+
+    async def load_session(self, session_id: int, idle_timeout: float):
+        return await self.db.fetchone("""
+            SELECT guild_id, user_id, question_ids, question_index, correct_count
+            FROM exam_sessions
+            WHERE id = %s AND updated_at >= NOW() - %s * INTERVAL '1 second'
+        """, (session_id, idle_timeout))
+
+    async def find_session(self, guild_id: int, user_id: int, idle_timeout: float):
+        row = await self.db.fetchone(
+            "SELECT id FROM exam_sessions WHERE guild_id = %s AND user_id = %s AND updated_at >= NOW() - %s * INTERVAL '1 second'",
+            (guild_id, user_id, idle_timeout)
+        )
+        return row[0] if row else None
+
+    async def save_session_progress(self, session_id: int, index: int, correct_count: int):
+        await self.db.execute(
+            "UPDATE exam_sessions SET question_index = %s, correct_count = %s, updated_at = NOW() WHERE id = %s",
+            (index, correct_count, session_id)
+        )
+
+    async def delete_session(self, session_id: int):
+        await self.db.execute("DELETE FROM exam_sessions WHERE id = %s", (session_id,))
+
+    async def delete_stale_sessions(self, idle_timeout: float):
+        await self.db.execute(
+            "DELETE FROM exam_sessions WHERE updated_at < NOW() - %s * INTERVAL '1 second'",
+            (idle_timeout,)
+        )
+
+    # ---------------------------------------------------------
+    # 🏅 身分組發放
+    # ---------------------------------------------------------
+    async def load_pending_grants(self, shard_ids=None, shard_count: int = None):
+        if only_own_shards(shard_ids, shard_count):
+            return await self.db.fetchall(
+                "SELECT id, guild_id, user_id, role_id, attempts FROM role_grants WHERE status = 'pending' AND (guild_id >> 22) %% %s = ANY(%s) ORDER BY id",
+                (shard_count, list(shard_ids))
+            )
+        return await self.db.fetchall(
+            "SELECT id, guild_id, user_id, role_id, attempts FROM role_grants WHERE status = 'pending' ORDER BY id"
+        )
+
+    async def create_grant(self, guild_id: int, user_id: int, role_id: int) -> int:
+        row = await self.db.fetchone(
+            "INSERT INTO role_grants (guild_id, user_id, role_id) VALUES (%s, %s, %s) RETURNING id",
+            (guild_id, user_id, role_id)
+        )
+        return row[0]
+
+    async def update_grant(self, grant_id: int, status: str, attempts: int, error):
+        await self.db.execute(
+            "UPDATE role_grants SET status = %s, attempts = %s, last_error = %s, updated_at = NOW() WHERE id = %s",
+            (status, attempts, error, grant_id)
+        )
+
+    async def grant_summary(self, guild_id: int, limit: int = 10):
+        counts = dict(await self.db.fetchall(
+            "SELECT status, COUNT(*) FROM role_grants WHERE guild_id = %s GROUP BY status",
+            (guild_id,)
+        ))
+        failed = await self.db.fetchall("""
+            SELECT user_id, role_id, attempts, last_error, updated_at FROM role_grants
+            WHERE guild_id = %s AND status = 'failed'
+            ORDER BY id DESC LIMIT %s
+        """, (guild_id, limit))
+        return counts, failed
+
+    # ---------------------------------------------------------
+    # 📈 考試統計
+    # ---------------------------------------------------------
+    async def save_analytics(self, question_rows, daily_rows):
+        def work(cur):
+            # 同一批裡的鍵不會重複 (記憶體裡已經合併過)，一個 transaction 寫完三張表
+            if question_rows:
+                execute_values(cur, """
+                    INSERT INTO question_stats (guild_id, question_id, attempts, failures)
+                    VALUES %s
+                    ON CONFLICT (guild_id, question_id) DO UPDATE SET
+                        attempts = question_stats.attempts + EXCLUDED.attempts,
+                        failures = question_stats.failures + EXCLUDED.failures;
+                """, question_rows)
+            if daily_rows:
+                execute_values(cur, """
+                    INSERT INTO exam_daily_stats (guild_id, day, started, passed, failed)
+                    VALUES %s
+                    ON CONFLICT (guild_id, day) DO UPDATE SET
+                        started = exam_daily_stats.started + EXCLUDED.started,
+                        passed = exam_daily_stats.passed + EXCLUDED.passed,
+                        failed = exam_daily_stats.failed + EXCLUDED.failed;
+                """, daily_rows)
+                execute_values(cur, """
+                    INSERT INTO exam_totals (guild_id, started, passed, failed)
+                    VALUES %s
+                    ON CONFLICT (guild_id) DO UPDATE SET
+                        started = exam_totals.started + EXCLUDED.started,
+                        passed = exam_totals.passed + EXCLUDED.passed,
+                        failed = exam_totals.failed + EXCLUDED.failed;
+                """, totals_by_guild(daily_rows))
+
+        await self.db.run(work)
+
+    async def exam_stats(self, guild_id: int, since, hardest_limit: int = 5, min_attempts: int = 5):
+        def work(cur):
+            cur.execute("SELECT started, passed, failed FROM exam_totals WHERE guild_id = %s", (guild_id,))
+            totals = cur.fetchone() or (0, 0, 0)
+            cur.execute("""
+                SELECT day, started, passed, failed FROM exam_daily_stats
+                WHERE guild_id = %s AND day >= %s ORDER BY day
+            """, (guild_id, since))
+            daily = cur.fetchall()
+            # 已刪除的題目不列出來
+            cur.execute("""
+                SELECT s.question_id, q.question, s.attempts, s.failures
+                FROM question_stats s
+                JOIN questions q ON q.id = s.question_id AND q.guild_id = s.guild_id
+                WHERE s.guild_id = %s AND s.attempts >= %s AND s.failures > 0
+                ORDER BY s.failures::float / s.attempts DESC, s.attempts DESC
+                LIMIT %s
+            """, (guild_id, min_attempts, hardest_limit))
+            return {"totals": totals, "daily": daily, "hardest": cur.fetchall()}
+
+        return await self.db.run(work)
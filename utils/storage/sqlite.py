@@ -0,0 +1,462 @@
+# sqlite.py (SQLite 實作：單一檔案 + WAL，查詢在專用執行緒上跑；給小型部署、本機測試與壓力測試用)
+#
+# 和 Postgres 版的差異：
+# - 沒有 LISTEN/NOTIFY，題目只會由機器人自己的管理指令修改
+# - 搜尋只用 LIKE (沒有 pg_trgm 的相似度排序)
+# - 時間欄位存 Unix 時間戳 (REAL)，日期存 ISO 字串，考試的題目 ID 存成 int64 陣列的 BLOB
+
+import time
+from array import array
+from datetime import date, datetime
+
+from utils import question_export, question_import, question_search
+from utils.database import SqlitePool
+from utils.question_bank import Question
+from utils.storage import QUESTION_COLUMNS, SETTINGS_COLUMNS, Storage, only_own_shards, totals_by_guild
+
+# SQLite 一次查詢能帶的參數有上限，IN (...) 分批查
+SQLITE_MAX_IN = 500
+
+
+# ---------------------------------------------------------
+# 📜 資料表版本 (PRAGMA user_version)
+# ---------------------------------------------------------
+SQLITE_MIGRATIONS = [
+    (1, "建立全部資料表", (
+        """
+        CREATE TABLE IF NOT EXISTS questions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_id INTEGER NOT NULL,
+            question TEXT NOT NULL,
+            option1 TEXT NOT NULL,
+            option2 TEXT NOT NULL,
+            option3 TEXT NOT NULL,
+            option4 TEXT NOT NULL,
+            answer INTEGER NOT NULL,
+            content_hash TEXT
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS questions_guild_id ON questions (guild_id, id)",
+        "CREATE UNIQUE INDEX IF NOT EXISTS questions_guild_content_hash ON questions (guild_id, content_hash)",
+        """
+        CREATE TABLE IF NOT EXISTS exam_settings (
+            guild_id INTEGER PRIMARY KEY,
+            question_amount INTEGER NOT NULL DEFAULT 5,
+            failure_cooldown_minutes INTEGER NOT NULL DEFAULT 0,
+            exam_room_id INTEGER,
+            add_exam_room_id INTEGER,
+            manage_exam_role_id INTEGER,
+            graduater_role_id INTEGER
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS user_cooldowns (
+            guild_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            cooldown_until REAL NOT NULL,
+            PRIMARY KEY (guild_id, user_id)
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS exam_sessions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            question_ids BLOB NOT NULL,
+            question_index INTEGER NOT NULL DEFAULT 0,
+            correct_count INTEGER NOT NULL DEFAULT 0,
+            updated_at REAL NOT NULL,
+            UNIQUE (guild_id, user_id)
+        )
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS role_grants (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            guild_id INTEGER NOT NULL,
+            user_id INTEGER NOT NULL,
+            role_id INTEGER NOT NULL,
+            status TEXT NOT NULL DEFAULT 'pending',
+            attempts INTEGER NOT NULL DEFAULT 0,
+            last_error TEXT,
+            created_at REAL NOT NULL,
+            updated_at REAL NOT NULL
+        )
+        """,
+        "CREATE INDEX IF NOT EXISTS role_grants_guild_status ON role_grants (guild_id, status, id)",
+    )),
+    (2, "考試統計彙總表", (
+        """
+        CREATE TABLE IF NOT EXISTS question_stats (
+            guild_id INTEGER NOT NULL,
+            question_id INTEGER NOT NULL,
+            attempts INTEGER NOT NULL DEFAULT 0,
+            failures INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (guild_id, question_id)
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS exam_daily_stats (
+            guild_id INTEGER NOT NULL,
+            day TEXT NOT NULL,
+            started INTEGER NOT NULL DEFAULT 0,
+            passed INTEGER NOT NULL DEFAULT 0,
+            failed INTEGER NOT NULL DEFAULT 0,
+            PRIMARY KEY (guild_id, day)
+        ) WITHOUT ROWID
+        """,
+        """
+        CREATE TABLE IF NOT EXISTS exam_totals (
+            guild_id INTEGER PRIMARY KEY,
+            started INTEGER NOT NULL DEFAULT 0,
+            passed INTEGER NOT NULL DEFAULT 0,
+            failed INTEGER NOT NULL DEFAULT 0
+        )
+        """,
+    )),
+]
+
+
+def run_sqlite_migrations(cur):
+    cur.execute("PRAGMA user_version")
+    version = cur.fetchone()[0]
+    applied = []
+    for number, description, statements in SQLITE_MIGRATIONS:
+        if number <= version:
+            continue
+        for statement in statements:
+            cur.execute(statement)
+        cur.execute(f"PRAGMA user_version = {int(number)}")
+        cur.connection.commit()
+        applied.append((number, description))
+    return applied
+
+
+def _timestamp(value: datetime) -> float:
+    return value.timestamp()
+
+
+def _shard_filter(shard_ids, shard_count):
+    # Discord 的分片規則：(guild_id >> 22) % shard_count
+    if not only_own_shards(shard_ids, shard_count):
+        return "", ()
+    shard_ids = list(shard_ids)
+    return f" AND (guild_id >> 22) % ? IN ({', '.join('?' * len(shard_ids))})", (shard_count, *shard_ids)
+
+
+class SqliteStorage(Storage):
+    name = "sqlite"
+
+    def __init__(self, path: str):
+        self.path = path
+        self.db = SqlitePool(path)
+
+    # ---------------------------------------------------------
+    # 🔌 生命週期
+    # ---------------------------------------------------------
+    async def open(self):
+        await self.db.open()
+        return await self.db.run(run_sqlite_migrations)
+
+    async def close(self):
+        await self.db.close()
+
+    def stats(self):
+        return {"backend": self.name, **self.db.stats()}
+
+    # ---------------------------------------------------------
+    # ⚙️ 設定
+    # ---------------------------------------------------------
+    async def load_settings(self, guild_id: int):
+        def work(cur):
+            cur.execute("INSERT INTO exam_settings (guild_id) VALUES (?) ON CONFLICT (guild_id) DO NOTHING", (guild_id,))
+            cur.execute(f"SELECT {', '.join(SETTINGS_COLUMNS)} FROM exam_settings WHERE guild_id = ?", (guild_id,))
+            return cur.fetchone()
+
+        row = await self.db.run(work)
+        return dict(zip(SETTINGS_COLUMNS, row)) if row else None
+
+    async def update_setting(self, guild_id: int, column: str, value):
+        if column not in SETTINGS_COLUMNS:
+            raise ValueError(f"未知的設定欄位: {column}")
+        row = await self.db.fetchone(f"""
+            INSERT INTO exam_settings (guild_id, {column}) VALUES (?, ?)
+            ON CONFLICT (guild_id) DO UPDATE SET {column} = excluded.{column}
+            RETURNING {', '.join(SETTINGS_COLUMNS)}
+        """, (guild_id, value))
+        return dict(zip(SETTINGS_COLUMNS, row)) if row else None
+
+    # ---------------------------------------------------------
+    # 📚 題目
+    # ---------------------------------------------------------
+    async def fetch_all_questions(self, guild_id: int):
+        def work(cur):
+            start = time.perf_counter()
+            cur.execute(f"SELECT {QUESTION_COLUMNS} FROM questions WHERE guild_id = ?", (guild_id,))
+            questions = []
+            while True:
+                rows = cur.fetchmany(2000)
+                if not rows:
+                    break
+                questions.extend(Question.from_row(row) for row in rows)
+            return questions, time.perf_counter() - start
+
+        return await self.db.run(work)
+
+    async def fetch_questions(self, question_ids):
+        question_ids = list(question_ids)
+
+        def work(cur):
+            rows = []
+            for i in range(0, len(question_ids), SQLITE_MAX_IN):
+                chunk = question_ids[i:i + SQLITE_MAX_IN]
+                cur.execute(
+                    f"SELECT guild_id, {QUESTION_COLUMNS} FROM questions WHERE id IN ({', '.join('?' * len(chunk))})",
+                    chunk
+                )
+                rows.extend(cur.fetchall())
+            return rows
+
+        return await self.db.run(work)
+
+    async def add_question(self, guild_id: int, question: str, options, answer: int, question_hash: str):
+        return await self.db.fetchone(f"""
+            INSERT INTO questions (guild_id, question, option1, option2, option3, option4, answer, content_hash)
+            VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT (guild_id, content_hash) DO NOTHING
+            RETURNING {QUESTION_COLUMNS}
+        """, (guild_id, question, *options, answer, question_hash))
+
+    async def find_question_by_hash(self, guild_id: int, question_hash: str):
+        row = await self.db.fetchone(
+            "SELECT id FROM questions WHERE guild_id = ? AND content_hash = ?",
+            (guild_id, question_hash)
+        )
+        return row[0] if row else None
+
+    async def delete_question(self, guild_id: int, question_id: int) -> bool:
+        return await self.db.execute("DELETE FROM questions WHERE id = ? AND guild_id = ?", (question_id, guild_id)) > 0
+
+    async def delete_all_questions(self, guild_id: int):
+        await self.db.execute("DELETE FROM questions WHERE guild_id = ?", (guild_id,))
+
+    def _filter_sql(self, guild_id: int, keyword):
+        # SQLite 的 LIKE 對英文字母本來就不分大小寫
+        if not keyword:
+            return " AND guild_id = ?", (guild_id,)
+        return " AND guild_id = ? AND question LIKE ? ESCAPE '\\'", (guild_id, f"%{question_search.escape_like(keyword)}%")
+
+    async def list_questions(self, guild_id: int, keyword, after_id: int, limit: int):
+        where, params = self._filter_sql(guild_id, keyword)
+        return await self.db.fetchall(
+            f"SELECT id, question FROM questions WHERE id > ?{where} ORDER BY id LIMIT ?",
+            (after_id, *params, limit)
+        )
+
+    async def list_question_ids_before(self, guild_id: int, keyword, anchor: int, limit: int):
+        where, params = self._filter_sql(guild_id, keyword)
+        rows = await self.db.fetchall(
+            f"SELECT id FROM questions WHERE id <= ?{where} ORDER BY id DESC LIMIT ?",
+            (anchor, *params, limit)
+        )
+        return [row[0] for row in rows]
+
+    async def search_questions(self, guild_id: int, keyword: str):
+        rows = await self.db.fetchall(f"""
+            SELECT id, question FROM questions
+            WHERE guild_id = ? AND {question_search.SEARCH_DOCUMENT} LIKE ? ESCAPE '\\'
+            ORDER BY id
+            LIMIT ?
+        """, (guild_id, f"%{question_search.escape_like(keyword)}%", question_search.SEARCH_LIMIT))
+        return [(row[0], row[1], 1.0) for row in rows]
+
+    async def import_questions(self, guild_id: int, path: str, fmt: str):
+        def work(cur):
+            start = time.perf_counter()
+            result = question_import.ImportResult()
+            # 本機檔案一筆一筆 INSERT 就夠快，同一段 SQL 重複用同一個 prepared statement
+            for batch in question_import.iter_import_batches(path, fmt, result):
+                for values in batch:
+                    cur.execute(f"""
+                        INSERT INTO questions (guild_id, question, option1, option2, option3, option4, answer, content_hash)
+                        VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                        ON CONFLICT (guild_id, content_hash) DO NOTHING
+                        RETURNING {QUESTION_COLUMNS}
+                    """, (guild_id, *values))
+                    row = cur.fetchone()
+                    if row:
+                        result.inserted_rows.append(row)
+                    else:
+                        result.skipped += 1
+            result.elapsed = time.perf_counter() - start
+            return result
+
+        return await self.db.run(work)
+
+    async def export_questions(self, guild_id: int, fmt: str):
+        def work(cur):
+            batch_size = question_export.EXPORT_BATCH_SIZE
+            cur.execute(f"SELECT {', '.join(question_export.EXPORT_FIELDS)} FROM questions WHERE guild_id = ? ORDER BY id", (guild_id,))
+            return question_export.write_export(iter(lambda: cur.fetchmany(batch_size), []), fmt)
+
+        return await self.db.run(work)
+
+    # ---------------------------------------------------------
+    # ⏳ 冷卻
+    # ---------------------------------------------------------
+    async def load_cooldowns(self, now, shard_ids=None, shard_count: int = None):
+        where, params = _shard_filter(shard_ids, shard_count)
+        rows = await self.db.fetchall(
+            f"SELECT guild_id, user_id, cooldown_until FROM user_cooldowns WHERE cooldown_until > ?{where}",
+            (_timestamp(now), *params)
+        )
+        return [(guild_id, user_id, datetime.fromtimestamp(until)) for guild_id, user_id, until in rows]
+
+    async def save_cooldowns(self, rows):
+        def work(cur):
+            cur.executemany("""
+                INSERT INTO user_cooldowns (guild_id, user_id, cooldown_until) VALUES (?, ?, ?)
+                ON CONFLICT (guild_id, user_id) DO UPDATE SET cooldown_until = excluded.cooldown_until
+            """, [(guild_id, user_id, _timestamp(until)) for guild_id, user_id, until in rows])
+
+        await self.db.run(work)
+
+    async def prune_cooldowns(self, now) -> int:
+        return await self.db.execute("DELETE FROM user_cooldowns WHERE cooldown_until <= ?", (_timestamp(now),))
+
+    # ---------------------------------------------------------
+    # 📝 進行中的考試
+    # ---------------------------------------------------------
+    async def create_session(self, guild_id: int, user_id: int, question_ids, idle_timeout: float):
+        def work(cur):
+            now = time.time()
+            cur.execute(
+                "DELETE FROM exam_sessions WHERE guild_id = ? AND user_id = ? AND updated_at < ?",
+                (guild_id, user_id, now - idle_timeout)
+            )
+            cur.execute("""
+                INSERT INTO exam_sessions (guild_id, user_id, question_ids, updated_at)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT (guild_id, user_id) DO NOTHING
+                RETURNING id
+            """, (guild_id, user_id, array("q", question_ids).tobytes(), now))
+            return cur.fetchone()
+
+        row = await self.db.run(work)
+        return row[0] if row else None
+
+    async def load_session(self, session_id: int, idle_timeout: float):
+        row = await self.db.fetchone("""
+            SELECT guild_id, user_id, question_ids, question_index, correct_count
+            FROM exam_sessions
+            WHERE id = ? AND updated_at >= ?
+        """, (session_id, time.time() - idle_timeout))
+        if row is None:
+            return None
+        question_ids = array("q")
+        question_ids.frombytes(row[2])
+        return (row[0], row[1], question_ids, row[3], row[4])
+
+    async def find_session(self, guild_id: int, user_id: int, idle_timeout: float):
+        row = await self.db.fetchone(
+            "SELECT id FROM exam_sessions WHERE guild_id = ? AND user_id = ? AND updated_at >= ?",
+            (guild_id, user_id, time.time() - idle_timeout)
+        )
+        return row[0] if row else None
+
+    async def save_session_progress(self, session_id: int, index: int, correct_count: int):
+        await self.db.execute(
+            "UPDATE exam_sessions SET question_index = ?, correct_count = ?, updated_at = ? WHERE id = ?",
+            (index, correct_count, time.time(), session_id)
+        )
+
+    async def delete_session(self, session_id: int):
+        await self.db.execute("DELETE FROM exam_sessions WHERE id = ?", (session_id,))
+
+    async def delete_stale_sessions(self, idle_timeout: float):
+        await self.db.execute("DELETE FROM exam_sessions WHERE updated_at < ?", (time.time() - idle_timeout,))
+
+    # ---------------------------------------------------------
+    # 🏅 身分組發放
+    # ---------------------------------------------------------
+    async def load_pending_grants(self, shard_ids=None, shard_count: int = None):
+        where, params = _shard_filter(shard_ids, shard_count)
+        return await self.db.fetchall(
+            f"SELECT id, guild_id, user_id, role_id, attempts FROM role_grants WHERE status = 'pending'{where} ORDER BY id",
+            params
+        )
+
+    async def create_grant(self, guild_id: int, user_id: int, role_id: int) -> int:
+        now = time.time()
+        row = await self.db.fetchone(
+            "INSERT INTO role_grants (guild_id, user_id, role_id, created_at, updated_at) VALUES (?, ?, ?, ?, ?) RETURNING id",
+            (guild_id, user_id, role_id, now, now)
+        )
+        return row[0]
+
+    async def update_grant(self, grant_id: int, status: str, attempts: int, error):
+        await self.db.execute(
+            "UPDATE role_grants SET status = ?, attempts = ?, last_error = ?, updated_at = ? WHERE id = ?",
+            (status, attempts, error, time.time(), grant_id)
+        )
+
+    async def grant_summary(self, guild_id: int, limit: int = 10):
+        counts = dict(await self.db.fetchall(
+            "SELECT status, COUNT(*) FROM role_grants WHERE guild_id = ? GROUP BY status",
+            (guild_id,)
+        ))
+        failed = await self.db.fetchall("""
+            SELECT user_id, role_id, attempts, last_error, updated_at FROM role_grants
+            WHERE guild_id = ? AND status = 'failed'
+            ORDER BY id DESC LIMIT ?
+        """, (guild_id, limit))
+        return counts, [(*row[:4], datetime.fromtimestamp(row[4])) for row in failed]
+
+    # ---------------------------------------------------------
+    # 📈 考試統計
+    # ---------------------------------------------------------
+    async def save_analytics(self, question_rows, daily_rows):
+        def work(cur):
+            cur.executemany("""
+                INSERT INTO question_stats (guild_id, question_id, attempts, failures) VALUES (?, ?, ?, ?)
+                ON CONFLICT (guild_id, question_id) DO UPDATE SET
+                    attempts = attempts + excluded.attempts,
+                    failures = failures + excluded.failures
+            """, question_rows)
+            cur.executemany("""
+                INSERT INTO exam_daily_stats (guild_id, day, started, passed, failed) VALUES (?, ?, ?, ?, ?)
+                ON CONFLICT (guild_id, day) DO UPDATE SET
+                    started = started + excluded.started,
+                    passed = passed + excluded.passed,
+                    failed = failed + excluded.failed
+            """, [(guild_id, day.isoformat(), *counts) for guild_id, day, *counts in daily_rows])
+            cur.executemany("""
+                INSERT INTO exam_totals (guild_id, started, passed, failed) VALUES (?, ?, ?, ?)
+                ON CONFLICT (guild_id) DO UPDATE SET
+                    started = started + excluded.started,
+                    passed = passed + excluded.passed,
+                    failed = failed + excluded.failed
+            """, totals_by_guild(daily_rows))
+
+        await self.db.run(work)
+
+    async def exam_stats(self, guild_id: int, since, hardest_limit: int = 5, min_attempts: int = 5):
+        def work(cur):
+            cur.execute("SELECT started, passed, failed FROM exam_totals WHERE guild_id = ?", (guild_id,))
+            totals = cur.fetchone() or (0, 0, 0)
+            cur.execute("""
+                SELECT day, started, passed, failed FROM exam_daily_stats
+                WHERE guild_id = ? AND day >= ? ORDER BY day
+            """, (guild_id, since.isoformat()))
+            daily = [(date.fromisoformat(day), *counts) for day, *counts in cur.fetchall()]
+            # 已刪除的題目不列出來
+            cur.execute("""
+                SELECT s.question_id, q.question, s.attempts, s.failures
+                FROM question_stats s
+                JOIN questions q ON q.id = s.question_id AND q.guild_id = s.guild_id
+                WHERE s.guild_id = ? AND s.attempts >= ? AND s.failures > 0
+                ORDER BY CAST(s.failures AS REAL) / s.attempts DESC, s.attempts DESC
+                LIMIT ?
+            """, (guild_id, min_attempts, hardest_limit))
+            return {"totals": totals, "daily": daily, "hardest": cur.fetchall()}
+
+        return await self.db.run(work)